@@ -24,13 +24,20 @@ fi
 #------------------------------------------------------------------------------
 # mygrep CLI options
 #------------------------------------------------------------------------------
-# Recursive flag for mygrep (empty if not supported or not needed)
-# Current implementation only supports single file, so this is empty
-MYGREP_RECURSIVE_FLAG=""
+# Recursive flag for mygrep
+# Set to empty to fall back to running mygrep once per file via find -exec
+MYGREP_RECURSIVE_FLAG="-r"
 
 # Additional flags for mygrep (if any)
 MYGREP_EXTRA_FLAGS=""
 
+# Lines of context printed around each match with --mode context (-C)
+CONTEXT_LINES=3
+
+# File type searched by the extra `-t` runs of the code tree benchmark
+# (mygrep -t / ripgrep -t). Set to empty to skip them.
+CODE_TREE_FILE_TYPE="go"
+
 #------------------------------------------------------------------------------
 # Hyperfine settings
 #------------------------------------------------------------------------------
@@ -58,7 +65,7 @@ LOG_FILE_LINE_LENGTH=120
 BINARY_FILE_SIZE_MB=50
 
 #------------------------------------------------------------------------------
-# Search patterns (fixed strings only, no regex)
+# Search patterns (fixed strings, except SEARCH_PATTERN_REGEX)
 #------------------------------------------------------------------------------
 # Common pattern for benchmarking (should exist in corpus)
 SEARCH_PATTERN_COMMON="TODO"
@@ -69,6 +76,10 @@ SEARCH_PATTERN_RARE="XYZZY_UNLIKELY_PATTERN"
 # Pattern that appears frequently
 SEARCH_PATTERN_FREQUENT="the"
 
+# Extended regular expression (used with --pattern regex)
+# Matches lines in both the code tree and the log corpus
+SEARCH_PATTERN_REGEX="(TODO|FIXME):? [A-Za-z]+"
+
 #------------------------------------------------------------------------------
 # Output settings
 #------------------------------------------------------------------------------
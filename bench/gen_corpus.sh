@@ -189,6 +189,23 @@ generate_log_file() {
     local file_size
     file_size=$(du -sh "${log_file}" | cut -f1)
     log_info "Log file corpus generated: ${log_file} (${file_size})"
+
+    generate_compressed_log_files "${log_file}"
+}
+
+# Compressed copies of the log file, like rotated logs (for -z benchmarks)
+generate_compressed_log_files() {
+    local log_file="$1"
+
+    gzip -c "${log_file}" > "${log_file}.gz"
+    log_info "Compressed log file generated: ${log_file}.gz ($(du -sh "${log_file}.gz" | cut -f1))"
+
+    if command -v zstd &> /dev/null; then
+        zstd -q -c "${log_file}" > "${log_file}.zst"
+        log_info "Compressed log file generated: ${log_file}.zst ($(du -sh "${log_file}.zst" | cut -f1))"
+    else
+        log_info "zstd not found; skipping ${log_file}.zst"
+    fi
 }
 
 #------------------------------------------------------------------------------
@@ -249,7 +266,8 @@ Options:
 
 Corpus types:
     A (code):   Many small-medium source code files (~${CODE_TREE_NUM_FILES} files)
-    B (log):    Single large log file (~${LOG_FILE_NUM_LINES} lines)
+    B (log):    Single large log file (~${LOG_FILE_NUM_LINES} lines),
+                plus .gz and .zst copies of it
     C (binary): Binary file with embedded text (~${BINARY_FILE_SIZE_MB} MB)
 
 Examples:
@@ -344,6 +362,12 @@ main() {
     if [[ -f "${CORPUS_DIR}/log/access.log" ]]; then
         echo "  - Log file: $(wc -l < "${CORPUS_DIR}/log/access.log" | tr -d ' ') lines, $(du -sh "${CORPUS_DIR}/log/access.log" | cut -f1)"
     fi
+    local ext
+    for ext in gz zst; do
+        if [[ -f "${CORPUS_DIR}/log/access.log.${ext}" ]]; then
+            echo "  - Compressed log file (.${ext}): $(du -sh "${CORPUS_DIR}/log/access.log.${ext}" | cut -f1)"
+        fi
+    done
     if [[ -f "${CORPUS_DIR}/binary/random.bin" ]]; then
         echo "  - Binary file: $(du -sh "${CORPUS_DIR}/binary/random.bin" | cut -f1)"
     fi
@@ -5,27 +5,172 @@ bench/report.py - Aggregate and report benchmark results
 This script reads hyperfine JSON output files and generates a comparison report
 showing performance metrics for mygrep, ripgrep, and GNU grep.
 
+Besides hyperfine's own summary, percentiles (p50/p90/p99), a trimmed mean
+and a mean after MAD-based outlier rejection are computed from the raw
+`times` of each result, with NumPy if it is installed and the statistics
+module otherwise.
+
 Usage:
     python3 bench/report.py [OPTIONS]
 
+Results are ingested into a SQLite history store (default:
+RESULTS_DIR/history.sqlite3) and reports are queries against it. Each file is
+parsed once, keyed by the SHA-256 of its contents; files whose path, size and
+mtime are already known are not even read again, new files are parsed by a
+pool of worker processes, and with --latest only the newest file of each
+benchmark, chosen by file name, is ingested. Raw timings are read from the
+store, in one query, only when a report needs them. Deleting the store rebuilds it from the
+JSON files on the next run.
+
+Reports cover only the result files now in RESULTS_DIR, except --trend,
+which follows the whole history kept in the store. --compare reads its two
+files into an in-memory store unless --db is given, so it works from any
+directory and leaves the history untouched.
+
 Options:
     --results-dir PATH    Directory containing JSON results (default: ./bench/results)
+    --db PATH             SQLite history store (default: RESULTS_DIR/history.sqlite3,
+                          or in memory with --compare)
     --latest              Only process the most recent result for each benchmark type
-    --compare FILE1 FILE2 Compare two specific result files
+    --compare FILE1 FILE2 Compare the timings of FILE2 (new) against FILE1 (base)
+    --threshold PCT       Slowdown of mygrep beyond which --compare fails, and the
+                          smallest change --trend reports (default: 5)
+    --alpha P             Significance level of the --compare test (default: 0.05)
+    --trend BENCHMARK     Show mygrep's mean and median across all runs of BENCHMARK,
+                          with changepoints flagged, per cache mode
     --json                Output report in JSON format
     --csv                 Output report in CSV format
     -h, --help            Show this help message
+
+Exit status is 0 on success, 1 on error, and 3 when --compare finds that a
+mygrep command got significantly slower by more than the threshold.
 """
 
 import argparse
+import hashlib
 import json
-
+import math
+import random
+import re
+import sqlite3
 import sys
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+from functools import cached_property, partial
 from pathlib import Path
-from statistics import mean, median, stdev
-from typing import Optional
+from statistics import mean, median, quantiles, stdev
+from typing import Callable, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Percentiles reported from the raw timings
+PERCENTILES = (50, 90, 99)
+
+# Share of the samples cut from each end for the trimmed mean
+TRIM_PROPORTION = 0.1
+
+# Modified z-score (0.6745 * |x - median| / MAD) beyond which a sample is
+# rejected as an outlier, as recommended by Iglewicz and Hoaglin. Nothing is
+# rejected when more than half the samples are equal and the MAD is zero.
+MAD_CUTOFF = 3.5
+
+
+@dataclass
+class TimingStats:
+    """Statistics computed from the raw timing samples of a result."""
+    p50: float
+    p90: float
+    p99: float
+    trimmed_mean: float   # mean without the TRIM_PROPORTION slowest and fastest samples
+    filtered_mean: float  # mean of the samples kept by MAD outlier rejection
+    outliers: int         # number of samples rejected
+
+    @classmethod
+    def from_times(cls, times: Sequence[float]) -> Optional["TimingStats"]:
+        """Compute the statistics of times, or None if there are none."""
+        times = list(times)
+        if not times:
+            return None
+        if np is not None:
+            return cls._from_times_numpy(times)
+        return cls._from_times_stdlib(times)
+
+    @classmethod
+    def _from_times_numpy(cls, times: list[float]) -> "TimingStats":
+        samples = np.sort(np.asarray(times, dtype=float))
+        p50, p90, p99 = np.percentile(samples, PERCENTILES)
+
+        k = int(len(samples) * TRIM_PROPORTION)
+        trimmed = samples[k:len(samples) - k]
+
+        center = np.median(samples)
+        deviations = np.abs(samples - center)
+        mad = np.median(deviations)
+        kept = samples if mad == 0 else samples[0.6745 * deviations / mad <= MAD_CUTOFF]
+
+        return cls(p50=float(p50), p90=float(p90), p99=float(p99),
+                   trimmed_mean=float(trimmed.mean()),
+                   filtered_mean=float(kept.mean()),
+                   outliers=int(len(samples) - len(kept)))
+
+    @classmethod
+    def _from_times_stdlib(cls, times: list[float]) -> "TimingStats":
+        samples = sorted(times)
+        if len(samples) > 1:
+            # The "inclusive" cut points interpolate linearly, like NumPy
+            cuts = quantiles(samples, n=100, method="inclusive")
+            p50, p90, p99 = (cuts[p - 1] for p in PERCENTILES)
+        else:
+            p50 = p90 = p99 = samples[0]
+
+        k = int(len(samples) * TRIM_PROPORTION)
+        trimmed = samples[k:len(samples) - k]
+
+        center = median(samples)
+        mad = median(abs(t - center) for t in samples)
+        kept = samples if mad == 0 else [
+            t for t in samples if 0.6745 * abs(t - center) / mad <= MAD_CUTOFF
+        ]
+
+        return cls(p50=p50, p90=p90, p99=p99,
+                   trimmed_mean=mean(trimmed),
+                   filtered_mean=mean(kept),
+                   outliers=len(samples) - len(kept))
+
+
+class LazyTimes(Sequence):
+    """Raw timings of a stored result, read from the store on first use.
+
+    --trend needs only hyperfine's precomputed values, so the samples of
+    its runs are never decoded. Other reports compute statistics from every
+    result, and the first access loads the samples of all the runs loaded
+    with it at once (see StoredTimes).
+    """
+
+    def __init__(self, load: Callable[[], list[float]]):
+        self._load = load
+        self._times: Optional[list[float]] = None
+
+    def _values(self) -> list[float]:
+        if self._times is None:
+            self._times = self._load()
+            self._load = None
+        return self._times
+
+    def __getitem__(self, index):
+        return self._values()[index]
+
+    def __len__(self) -> int:
+        return len(self._values())
+
+    def __repr__(self) -> str:
+        return "LazyTimes(...)" if self._times is None else repr(self._times)
 
 
 @dataclass
@@ -37,7 +182,7 @@ class BenchmarkResult:
     median: float
     min: float
     max: float
-    times: list[float]
+    times: Sequence[float]
 
     @classmethod
     def from_hyperfine(cls, data: dict) -> "BenchmarkResult":
@@ -52,6 +197,11 @@ class BenchmarkResult:
             times=data.get("times", []),
         )
 
+    @cached_property
+    def stats(self) -> Optional[TimingStats]:
+        """Statistics of the raw timings, or None if there are none."""
+        return TimingStats.from_times(self.times)
+
 
 @dataclass
 class BenchmarkRun:
@@ -64,6 +214,7 @@ class BenchmarkRun:
     file_count: int
     cold_run: bool
     results: list[BenchmarkResult]
+    git_commit: str = ""  # commit of mygrep benchmarked, if recorded
 
     @classmethod
     def from_json_file(cls, filepath: Path) -> Optional["BenchmarkRun"]:
@@ -74,7 +225,11 @@ class BenchmarkRun:
         except (json.JSONDecodeError, IOError) as e:
             print(f"Warning: Failed to load {filepath}: {e}", file=sys.stderr)
             return None
+        return cls.from_json(data, filepath)
 
+    @classmethod
+    def from_json(cls, data: dict, filepath: Path) -> "BenchmarkRun":
+        """Create from the parsed contents of a result file."""
         metadata = data.get("metadata", {})
         results = [
             BenchmarkResult.from_hyperfine(r)
@@ -90,9 +245,492 @@ class BenchmarkRun:
             file_count=metadata.get("file_count", 1),
             cold_run=metadata.get("cold_run", False),
             results=results,
+            git_commit=metadata.get("git_commit", ""),
         )
 
 
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    hash        TEXT PRIMARY KEY,  -- SHA-256 of the result file
+    source      TEXT NOT NULL,     -- file name it was first ingested from
+    name        TEXT NOT NULL,
+    timestamp   TEXT NOT NULL,
+    pattern     TEXT NOT NULL,
+    target_path TEXT NOT NULL,
+    size_mb     REAL NOT NULL,
+    file_count  INTEGER NOT NULL,
+    cold_run    INTEGER NOT NULL,
+    git_commit  TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_hash TEXT NOT NULL REFERENCES runs(hash),
+    position INTEGER NOT NULL,     -- order of the command in the file
+    command  TEXT NOT NULL,
+    tool     TEXT NOT NULL,
+    mean     REAL,
+    stddev   REAL,
+    median   REAL,
+    min      REAL,
+    max      REAL,
+    times    TEXT NOT NULL,        -- JSON array of seconds
+    PRIMARY KEY (run_hash, position)
+);
+-- Result files already ingested, so unchanged files are not read again
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_name ON runs (name, cold_run, timestamp);
+CREATE INDEX IF NOT EXISTS runs_by_cache_mode ON runs (cold_run, timestamp);
+CREATE INDEX IF NOT EXISTS runs_by_timestamp ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS results_by_tool ON results (tool, run_hash);
+"""
+
+RUN_COLUMNS = "hash, source, name, timestamp, pattern, target_path, size_mb, file_count, cold_run, git_commit"
+
+# Fewest new result files worth starting worker processes to parse
+PARALLEL_MIN_FILES = 32
+
+# Store that lives only as long as the process
+MEMORY_STORE = ":memory:"
+
+
+def load_result_file(filepath: Path) -> tuple[Optional[str], Optional["BenchmarkRun"], Optional[str]]:
+    """Read, hash and parse a result file, in a worker process.
+
+    Returns the SHA-256 of its contents and the run it holds, or an error
+    message.
+    """
+    try:
+        content = filepath.read_bytes()
+        run = BenchmarkRun.from_json(json.loads(content), filepath)
+    except (json.JSONDecodeError, UnicodeDecodeError, IOError) as e:
+        return None, None, str(e)
+    return hashlib.sha256(content).hexdigest(), run, None
+
+
+class StoredTimes:
+    """Raw timings of a set of stored runs, read in one query the first time
+    any of them is needed, instead of one query per result."""
+
+    def __init__(self, store: "ResultStore", digests: list[str]):
+        self._store = store
+        self._digests = digests
+        self._times: Optional[dict[tuple[str, int], list[float]]] = None
+
+    def get(self, digest: str, position: int) -> list[float]:
+        if self._times is None:
+            self._times = self._store.load_times(self._digests)
+        return self._times.get((digest, position), [])
+
+
+class ResultStore:
+    """SQLite history of benchmark runs, ingested from hyperfine JSON files."""
+
+    def __init__(self, path: Union[Path, str]):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(STORE_SCHEMA)
+        # Stores created before commits were recorded lack the column
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}
+        if "git_commit" not in columns:
+            self.conn.execute("ALTER TABLE runs ADD COLUMN git_commit TEXT NOT NULL DEFAULT ''")
+
+    def close(self):
+        self.conn.close()
+
+    def ingest(self, files: list[Path]) -> list[Optional[str]]:
+        """Ingest result files; return the hash of each, or None if it could
+        not be loaded.
+
+        Files whose path, size and mtime are known are not read at all. The
+        others are read, hashed and parsed in a pool of worker processes when
+        there are enough of them to be worth it.
+        """
+        digests: list[Optional[str]] = [None] * len(files)
+        pending = []  # (index, key, stat) of files to load
+        for i, filepath in enumerate(files):
+            try:
+                st = filepath.stat()
+            except OSError as e:
+                print(f"Warning: Failed to load {filepath}: {e}", file=sys.stderr)
+                continue
+            key = str(filepath.resolve())
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, hash FROM files WHERE path = ?", (key,)
+            ).fetchone()
+            if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                digests[i] = row[2]
+            else:
+                pending.append((i, key, st))
+
+        paths = [files[i] for i, _, _ in pending]
+        if len(paths) >= PARALLEL_MIN_FILES:
+            with ProcessPoolExecutor() as pool:
+                loaded = list(pool.map(load_result_file, paths, chunksize=16))
+        else:
+            loaded = [load_result_file(path) for path in paths]
+
+        for (i, key, st), (digest, run, error) in zip(pending, loaded):
+            if error:
+                print(f"Warning: Failed to load {files[i]}: {error}", file=sys.stderr)
+                continue
+            if self._lookup(digest) is None:
+                self._insert(digest, files[i].name, run)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                (key, st.st_size, st.st_mtime_ns, digest),
+            )
+            digests[i] = digest
+        self.conn.commit()
+        return digests
+
+    def _lookup(self, digest: str) -> Optional[str]:
+        row = self.conn.execute("SELECT hash FROM runs WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def _insert(self, digest: str, source: str, run: BenchmarkRun):
+        self.conn.execute(
+            f"INSERT INTO runs ({RUN_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, source, run.name, run.timestamp, run.pattern, run.target_path,
+             run.size_mb, run.file_count, int(bool(run.cold_run)), run.git_commit or ""),
+        )
+        self.conn.executemany(
+            "INSERT INTO results (run_hash, position, command, tool, mean, stddev, median, min, max, times)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (digest, i, r.command, get_tool_name(r.command), r.mean, r.stddev,
+                 r.median, r.min, r.max, json.dumps(r.times))
+                for i, r in enumerate(run.results)
+            ],
+        )
+
+    def _select(self, digests: list[str]):
+        """Fill the temporary table `selected` with digests, which queries
+        join against instead of binding one parameter per run."""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS selected (hash TEXT PRIMARY KEY)")
+        self.conn.execute("DELETE FROM selected")
+        self.conn.executemany("INSERT OR IGNORE INTO selected (hash) VALUES (?)", [(d,) for d in digests])
+
+    def runs(self, digests: list[str]) -> list[BenchmarkRun]:
+        """Return the runs with the given hashes, once each, in file name order."""
+        self._select(digests)
+        return list(self._load("SELECT hash FROM selected", ()).values())
+
+    def latest_runs(self, digests: list[str]) -> list[BenchmarkRun]:
+        """Return the most recent of the runs with the given hashes for each
+        benchmark and cache mode."""
+        self._select(digests)
+        return list(self._load(
+            "SELECT hash FROM (SELECT hash, ROW_NUMBER() OVER ("
+            " PARTITION BY name, cold_run ORDER BY timestamp DESC, source DESC) AS n"
+            " FROM runs WHERE hash IN (SELECT hash FROM selected)) WHERE n = 1",
+            (),
+        ).values())
+
+    def runs_of(self, name: str) -> list[BenchmarkRun]:
+        """Return every run of the named benchmark, oldest first."""
+        runs = self._load("SELECT hash FROM runs WHERE name = ?", (name,)).values()
+        return sorted(runs, key=lambda run: run.timestamp)
+
+    def benchmark_names(self) -> list[str]:
+        """Return the names of the benchmarks in the store."""
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT name FROM runs ORDER BY name")]
+
+    def runs_by_hash(self, digests: list[str]) -> list[BenchmarkRun]:
+        """Return the runs with the given hashes, in that order."""
+        self._select(digests)
+        runs = self._load("SELECT hash FROM selected", ())
+        return [runs[h] for h in digests if h in runs]
+
+    def load_times(self, digests: list[str]) -> dict[tuple[str, int], list[float]]:
+        """Return the raw timings of every result of the runs with the given
+        hashes, by run hash and position."""
+        self._select(digests)
+        return {
+            (row[0], row[1]): json.loads(row[2])
+            for row in self.conn.execute(
+                "SELECT run_hash, position, times FROM results"
+                " WHERE run_hash IN (SELECT hash FROM selected)"
+            )
+        }
+
+    def _load(self, selection: str, params: tuple) -> dict[str, BenchmarkRun]:
+        """Load the runs whose hashes the selection query returns, by hash."""
+        rows = self.conn.execute(
+            f"SELECT {RUN_COLUMNS} FROM runs WHERE hash IN ({selection}) ORDER BY source, hash",
+            params,
+        ).fetchall()
+        times = StoredTimes(self, [row[0] for row in rows])
+
+        results: dict[str, list[BenchmarkResult]] = {}
+        for row in self.conn.execute(
+            "SELECT run_hash, position, command, mean, stddev, median, min, max FROM results"
+            f" WHERE run_hash IN ({selection}) ORDER BY run_hash, position",
+            params,
+        ):
+            results.setdefault(row[0], []).append(BenchmarkResult(
+                command=row[2], mean=row[3], stddev=row[4], median=row[5],
+                min=row[6], max=row[7], times=LazyTimes(partial(times.get, row[0], row[1])),
+            ))
+
+        runs = {}
+        for row in rows:
+            runs[row[0]] = BenchmarkRun(
+                name=row[2], timestamp=row[3], pattern=row[4], target_path=row[5],
+                size_mb=row[6], file_count=row[7], cold_run=bool(row[8]),
+                results=results.get(row[0], []), git_commit=row[9],
+            )
+        return runs
+
+
+# Exit status of --compare when mygrep regressed
+EXIT_REGRESSION = 3
+
+# Number of bootstrap resamples for the confidence interval of a change
+BOOTSTRAP_RESAMPLES = 2000
+
+
+@dataclass
+class Comparison:
+    """Change in one command's timings from a base run to a new run.
+
+    Changes are percentages of the base median; positive means slower.
+    """
+    command: str
+    base_median: float
+    new_median: float
+    change_pct: float
+    ci_low_pct: float
+    ci_high_pct: float
+    p_value: float
+    significant: bool
+    regression: bool
+
+
+def mann_whitney_u(a: list[float], b: list[float]) -> float:
+    """Two-sided p-value of the Mann-Whitney U test that a and b come from
+    the same distribution, by the normal approximation with tie and
+    continuity corrections."""
+    n1, n2 = len(a), len(b)
+    n = n1 + n2
+    values = sorted([(x, 0) for x in a] + [(x, 1) for x in b])
+
+    # Average ranks over ties
+    rank_sum_a = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[j + 1][0] == values[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        rank_sum_a += rank * sum(1 for k in range(i, j + 1) if values[k][1] == 0)
+        i = j + 1
+
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    mu = n1 * n2 / 2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u - mu) - 0.5) / sigma
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def bootstrap_change_ci(a: list[float], b: list[float], confidence: float = 0.95,
+                        resamples: int = BOOTSTRAP_RESAMPLES) -> tuple[float, float]:
+    """Percentile bootstrap confidence interval of the change in median from
+    a to b, in percent of the median of a."""
+    rng = random.Random(0)  # reproducible reports
+    changes = []
+    for _ in range(resamples):
+        base = median(rng.choices(a, k=len(a)))
+        new = median(rng.choices(b, k=len(b)))
+        if base > 0:
+            changes.append((new / base - 1) * 100)
+    if not changes:
+        return math.nan, math.nan
+    changes.sort()
+    tail = (1 - confidence) / 2
+    low = changes[int(tail * (len(changes) - 1))]
+    high = changes[math.ceil((1 - tail) * (len(changes) - 1))]
+    return low, high
+
+
+def compare_runs(base: BenchmarkRun, new: BenchmarkRun, threshold_pct: float,
+                 alpha: float) -> list[Comparison]:
+    """Compare the raw timings of each command present in both runs.
+
+    A mygrep command has regressed when the change is significant at alpha
+    and its median slowed down by more than threshold_pct.
+    """
+    base_results = {r.command: r for r in base.results}
+    comparisons = []
+    for result in new.results:
+        before = base_results.get(result.command)
+        if before is None or len(before.times) < 2 or len(result.times) < 2:
+            continue
+        base_median = median(before.times)
+        new_median = median(result.times)
+        change = (new_median / base_median - 1) * 100 if base_median > 0 else math.nan
+        low, high = bootstrap_change_ci(before.times, result.times)
+        p_value = mann_whitney_u(before.times, result.times)
+        significant = p_value < alpha
+        comparisons.append(Comparison(
+            command=result.command,
+            base_median=base_median,
+            new_median=new_median,
+            change_pct=change,
+            ci_low_pct=low,
+            ci_high_pct=high,
+            p_value=p_value,
+            significant=significant,
+            regression=(significant and change > threshold_pct
+                        and is_mygrep(result.command)),
+        ))
+    return comparisons
+
+
+# Confidence at which a CUSUM changepoint is reported, and the number of
+# shuffles of the series used to estimate it
+CHANGEPOINT_CONFIDENCE = 0.95
+CHANGEPOINT_RESAMPLES = 1000
+
+# Fewest runs on either side of a changepoint
+MIN_SEGMENT = 3
+
+# Most points drawn in a trend sparkline; longer series are averaged into buckets
+SPARKLINE_WIDTH = 64
+SPARKLINE_CHARS = "▁▂▃▄▅▆▇█"
+
+
+@dataclass
+class TrendPoint:
+    """mygrep's timings in one run of a benchmark."""
+    timestamp: str
+    git_commit: str
+    mean: float
+    median: float
+
+
+@dataclass
+class Changepoint:
+    """A shift in the median of a trend, first seen at points[index]."""
+    index: int
+    before_median: float  # median of the medians since the previous changepoint
+    after_median: float   # median of the medians up to the next changepoint
+    change_pct: float
+    confidence: float
+
+
+def trend_points(runs: list[BenchmarkRun]) -> list[TrendPoint]:
+    """Extract the mygrep result of each run, oldest first. The command named
+    plain "mygrep" is preferred over variants such as "mygrep-pipe"."""
+    points = []
+    for run in runs:
+        result = mygrep_result(run.results)
+        if result is None:
+            continue
+        points.append(TrendPoint(run.timestamp, run.git_commit, result.mean, result.median))
+    return points
+
+
+def cusum_range(values: list[float], center: float) -> float:
+    """Range of the cumulative sum of the deviations of values from center."""
+    total = low = high = 0.0
+    for v in values:
+        total += v - center
+        low = min(low, total)
+        high = max(high, total)
+    return high - low
+
+
+def cusum_changepoint(values: list[float], rng: random.Random) -> Optional[tuple[int, float]]:
+    """Find the most likely shift in the level of values with a CUSUM chart.
+
+    Returns the index where the new level starts and the confidence that
+    the shift is real: the share of random orderings of the same values
+    whose CUSUM range is smaller than the observed one (Taylor's method).
+    """
+    n = len(values)
+    if n < 2 * MIN_SEGMENT:
+        return None
+    center = mean(values)
+    observed = cusum_range(values, center)
+    if observed == 0:
+        return None
+
+    shuffled = list(values)
+    below = 0
+    for _ in range(CHANGEPOINT_RESAMPLES):
+        rng.shuffle(shuffled)
+        if cusum_range(shuffled, center) < observed:
+            below += 1
+
+    # The shift is where the cumulative sum is furthest from zero
+    total = 0.0
+    best, split = -1.0, MIN_SEGMENT
+    for i, v in enumerate(values[:n - MIN_SEGMENT], start=1):
+        total += v - center
+        if i >= MIN_SEGMENT and abs(total) > best:
+            best, split = abs(total), i
+    return split, below / CHANGEPOINT_RESAMPLES
+
+
+def detect_changepoints(values: list[float], min_change_pct: float) -> list[Changepoint]:
+    """Find the shifts in the level of a series by binary segmentation: the
+    most likely CUSUM changepoint is kept if it is significant and moves the
+    median by at least min_change_pct, and the segments on either side are
+    searched in turn."""
+    rng = random.Random(0)  # reproducible reports
+    splits: list[tuple[int, float]] = []
+
+    def segment(lo: int, hi: int):
+        found = cusum_changepoint(values[lo:hi], rng)
+        if found is None or found[1] < CHANGEPOINT_CONFIDENCE:
+            return
+        split = lo + found[0]
+        before, after = median(values[lo:split]), median(values[split:hi])
+        if before <= 0 or abs(after / before - 1) * 100 < min_change_pct:
+            return
+        splits.append((split, found[1]))
+        segment(lo, split)
+        segment(split, hi)
+
+    segment(0, len(values))
+    splits.sort()
+
+    bounds = [0] + [s for s, _ in splits] + [len(values)]
+    changepoints = []
+    for i, (split, confidence) in enumerate(splits, start=1):
+        before = median(values[bounds[i - 1]:split])
+        after = median(values[split:bounds[i + 1]])
+        change = (after / before - 1) * 100
+        changepoints.append(Changepoint(split, before, after, change, confidence))
+    return changepoints
+
+
+def sparkline(values: list[float], marks: list[int]) -> tuple[str, str]:
+    """Draw values as a line of block characters, with a second line marking
+    the points at the indexes in marks with "^"."""
+    buckets = max(1, math.ceil(len(values) / SPARKLINE_WIDTH))
+    points = [mean(values[i:i + buckets]) for i in range(0, len(values), buckets)]
+    low, high = min(points), max(points)
+    scale = (len(SPARKLINE_CHARS) - 1) / (high - low) if high > low else 0
+    line = "".join(SPARKLINE_CHARS[round((p - low) * scale)] for p in points)
+    marker = [" "] * len(points)
+    for i in marks:
+        marker[i // buckets] = "^"
+    return line, "".join(marker).rstrip()
+
+
+def format_commit(commit: str) -> str:
+    return commit if commit else "unknown commit"
+
+
 def format_time(seconds: float) -> str:
     """Format time in human-readable format."""
     if seconds < 0.001:
@@ -123,7 +761,11 @@ def calculate_speedup(base_time: float, compare_time: float) -> str:
 
 
 def get_tool_name(command: str) -> str:
-    """Extract tool name from command."""
+    """Extract tool name from command. A name given with hyperfine's
+    --command-name is returned as is, so variants such as "mygrep-pipe" or
+    "mygrep-indexed" stay apart from the plain "mygrep"."""
+    if re.fullmatch(r"[\w.+-]+", command):
+        return command
     cmd_lower = command.lower()
     if "mygrep" in cmd_lower:
         return "mygrep"
@@ -134,6 +776,18 @@ def get_tool_name(command: str) -> str:
     return command.split()[0]
 
 
+def is_mygrep(command: str) -> bool:
+    """Whether command runs mygrep, plain or in any variant."""
+    return get_tool_name(command).startswith("mygrep")
+
+
+def mygrep_result(results: list[BenchmarkResult]) -> Optional[BenchmarkResult]:
+    """The result of plain mygrep among results, else of its first variant."""
+    candidates = [r for r in results if is_mygrep(r.command)]
+    return next((r for r in candidates if get_tool_name(r.command) == "mygrep"),
+                candidates[0] if candidates else None)
+
+
 def print_separator(char: str = "-", width: int = 80):
     """Print a separator line."""
     print(char * width)
@@ -163,7 +817,7 @@ def print_benchmark_report(run: BenchmarkRun, verbose: bool = False):
     fastest = sorted_results[0]
 
     # Header
-    print(f"  {'Tool':<15} {'Mean':<12} {'Median':<12} {'Stddev':<12} {'Min':<12} {'Max':<12} {'Throughput':<12} {'vs Fastest':<15}")
+    print(f"  {'Tool':<17} {'Mean':<12} {'Median':<12} {'Stddev':<12} {'Min':<12} {'Max':<12} {'Throughput':<12} {'vs Fastest':<15}")
     print_separator("-")
 
     for result in sorted_results:
@@ -175,7 +829,7 @@ def print_benchmark_report(run: BenchmarkRun, verbose: bool = False):
         else:
             comparison = calculate_speedup(result.mean, fastest.mean)
 
-        print(f"  {tool_name:<15} "
+        print(f"  {tool_name:<17} "
               f"{format_time(result.mean):<12} "
               f"{format_time(result.median):<12} "
               f"{format_time(result.stddev):<12} "
@@ -186,15 +840,33 @@ def print_benchmark_report(run: BenchmarkRun, verbose: bool = False):
 
     print()
 
+    # Tail latency, from the raw timings
+    if any(r.stats for r in sorted_results):
+        print(f"  {'Tool':<17} {'p50':<12} {'p90':<12} {'p99':<12} {'Trim mean':<12} {'Mean w/o out':<14} {'Outliers':<10}")
+        print_separator("-")
+        for result in sorted_results:
+            tool_name = get_tool_name(result.command)
+            st = result.stats
+            if st is None:
+                print(f"  {tool_name:<17} {'N/A':<12}")
+                continue
+            print(f"  {tool_name:<17} "
+                  f"{format_time(st.p50):<12} "
+                  f"{format_time(st.p90):<12} "
+                  f"{format_time(st.p99):<12} "
+                  f"{format_time(st.trimmed_mean):<12} "
+                  f"{format_time(st.filtered_mean):<14} "
+                  f"{st.outliers}/{len(result.times)}")
+        print()
+
     # Summary
-    mygrep_result = next((r for r in run.results if "mygrep" in get_tool_name(r.command)), None)
-    if mygrep_result:
+    baseline = mygrep_result(run.results)
+    if baseline:
         print("  Summary:")
         for result in sorted_results:
-            tool_name = get_tool_name(result.command)
-            if tool_name != "mygrep":
-                speedup = calculate_speedup(mygrep_result.mean, result.mean)
-                print(f"    mygrep vs {tool_name}: {speedup}")
+            if result is not baseline:
+                speedup = calculate_speedup(baseline.mean, result.mean)
+                print(f"    {get_tool_name(baseline.command)} vs {get_tool_name(result.command)}: {speedup}")
 
 
 def print_summary_table(runs: list[BenchmarkRun]):
@@ -216,7 +888,7 @@ def print_summary_table(runs: list[BenchmarkRun]):
     # Header
     header = f"  {'Benchmark':<30}"
     for tool in tool_list:
-        header += f" {tool:<15}"
+        header += f" {tool:<17}"
     header += " Winner"
     print(header)
     print_separator("-")
@@ -233,9 +905,9 @@ def print_summary_table(runs: list[BenchmarkRun]):
 
         for tool in tool_list:
             if tool in result_map:
-                row += f" {format_time(result_map[tool].mean):<15}"
+                row += f" {format_time(result_map[tool].mean):<17}"
             else:
-                row += f" {'N/A':<15}"
+                row += f" {'N/A':<17}"
 
         row += f" {winner}"
         print(row)
@@ -243,19 +915,176 @@ def print_summary_table(runs: list[BenchmarkRun]):
     print()
 
 
+def comparison_verdict(c: Comparison) -> str:
+    """Describe a comparison in a word."""
+    if c.regression:
+        return "REGRESSION"
+    if not c.significant:
+        return "no change"
+    return "slower" if c.change_pct > 0 else "faster"
+
+
+def print_comparison_report(base: BenchmarkRun, new: BenchmarkRun,
+                            comparisons: list[Comparison], threshold_pct: float, alpha: float):
+    """Print the change in each command's timings between two runs."""
+    print()
+    print_separator("=")
+    print(f"Comparison: {base.name}")
+    print_separator("=")
+    print(f"  Base:        {base.timestamp} ({'cold' if base.cold_run else 'warm'})")
+    print(f"  New:         {new.timestamp} ({'cold' if new.cold_run else 'warm'})")
+    if base.name != new.name:
+        print(f"  Warning:     comparing different benchmarks ({base.name} vs {new.name})")
+    print(f"  Test:        Mann-Whitney U, alpha {alpha}; 95% bootstrap CI of the median change")
+    print(f"  Threshold:   mygrep regresses when significantly slower by more than {threshold_pct:g}%")
+    print()
+
+    if not comparisons:
+        print("  No commands with raw timings in both runs")
+        return
+
+    print(f"  {'Command':<17} {'Base':<12} {'New':<12} {'Change':<10} {'95% CI':<20} {'p-value':<10} {'Verdict':<12}")
+    print_separator("-")
+    for c in comparisons:
+        change = f"{c.change_pct:+.1f}%"
+        ci = f"[{c.ci_low_pct:+.1f}%, {c.ci_high_pct:+.1f}%]"
+        print(f"  {c.command:<17} "
+              f"{format_time(c.base_median):<12} "
+              f"{format_time(c.new_median):<12} "
+              f"{change:<10} "
+              f"{ci:<20} "
+              f"{c.p_value:<10.4f} "
+              f"{comparison_verdict(c):<12}")
+    print()
+
+
+def print_json_comparison(base: BenchmarkRun, new: BenchmarkRun, comparisons: list[Comparison]):
+    """Print a comparison in JSON format."""
+    output = {
+        "benchmark": base.name,
+        "base_timestamp": base.timestamp,
+        "new_timestamp": new.timestamp,
+        "regression": any(c.regression for c in comparisons),
+        "results": [
+            {
+                "command": c.command,
+                "tool": get_tool_name(c.command),
+                "base_median_s": c.base_median,
+                "new_median_s": c.new_median,
+                "change_pct": c.change_pct,
+                "ci_low_pct": c.ci_low_pct,
+                "ci_high_pct": c.ci_high_pct,
+                "p_value": c.p_value,
+                "verdict": comparison_verdict(c),
+            }
+            for c in comparisons
+        ],
+    }
+    print(json.dumps(output, indent=2))
+
+
+def print_csv_comparison(base: BenchmarkRun, comparisons: list[Comparison]):
+    """Print a comparison in CSV format."""
+    print("benchmark,command,tool,base_median_s,new_median_s,change_pct,ci_low_pct,ci_high_pct,p_value,verdict")
+    for c in comparisons:
+        print(f"{base.name},{c.command},{get_tool_name(c.command)},{c.base_median:.6f},{c.new_median:.6f},"
+              f"{c.change_pct:.2f},{c.ci_low_pct:.2f},{c.ci_high_pct:.2f},{c.p_value:.6f},{comparison_verdict(c)}")
+
+
+def print_trend_report(name: str, trends: list[tuple[bool, list[TrendPoint], list[Changepoint]]],
+                       threshold_pct: float):
+    """Print mygrep's timings across the history of a benchmark."""
+    for cold_run, points, changepoints in trends:
+        cache_mode = "cold" if cold_run else "warm"
+        print()
+        print_separator("=")
+        print(f"Trend: {name} ({cache_mode})")
+        print_separator("=")
+        print(f"  Runs:        {len(points)}, {points[0].timestamp} to {points[-1].timestamp}")
+        print(f"  Method:      CUSUM changepoints on the median, confidence >= {CHANGEPOINT_CONFIDENCE:.0%},"
+              f" change >= {threshold_pct:g}%")
+        print()
+
+        marks = [c.index for c in changepoints]
+        for label, values in (("median", [p.median for p in points]), ("mean", [p.mean for p in points])):
+            line, marker = sparkline(values, marks)
+            print(f"  {label:<8} {line}  {format_time(min(values))} - {format_time(max(values))},"
+                  f" latest {format_time(values[-1])}")
+            if marker:
+                print(f"  {'':<8} {marker}")
+        print()
+
+        if not changepoints:
+            print("  No changepoints")
+            continue
+        print("  Changepoints:")
+        for c in changepoints:
+            first, previous = points[c.index], points[c.index - 1]
+            kind = "slowdown" if c.change_pct > 0 else "speedup"
+            print(f"    {first.timestamp} ({format_commit(first.git_commit)}): "
+                  f"median {format_time(c.before_median)} -> {format_time(c.after_median)}, "
+                  f"{c.change_pct:+.1f}% {kind} (confidence {c.confidence:.0%})")
+            print(f"      landed after {previous.timestamp} ({format_commit(previous.git_commit)})")
+    print()
+
+
+def print_json_trend(name: str, trends: list[tuple[bool, list[TrendPoint], list[Changepoint]]]):
+    """Print a trend in JSON format."""
+    output = []
+    for cold_run, points, changepoints in trends:
+        output.append({
+            "benchmark": name,
+            "cold_run": cold_run,
+            "runs": [
+                {"timestamp": p.timestamp, "git_commit": p.git_commit, "mean_s": p.mean, "median_s": p.median}
+                for p in points
+            ],
+            "changepoints": [
+                {
+                    "timestamp": points[c.index].timestamp,
+                    "git_commit": points[c.index].git_commit,
+                    "previous_timestamp": points[c.index - 1].timestamp,
+                    "previous_git_commit": points[c.index - 1].git_commit,
+                    "before_median_s": c.before_median,
+                    "after_median_s": c.after_median,
+                    "change_pct": c.change_pct,
+                    "confidence": c.confidence,
+                }
+                for c in changepoints
+            ],
+        })
+    print(json.dumps(output, indent=2))
+
+
+def print_csv_trend(name: str, trends: list[tuple[bool, list[TrendPoint], list[Changepoint]]]):
+    """Print a trend in CSV format, one row per run."""
+    print("benchmark,cache_mode,timestamp,git_commit,mean_s,median_s,changepoint,change_pct")
+    for cold_run, points, changepoints in trends:
+        cache_mode = "cold" if cold_run else "warm"
+        changes = {c.index: c for c in changepoints}
+        for i, p in enumerate(points):
+            c = changes.get(i)
+            change = f"1,{c.change_pct:.2f}" if c else "0,"
+            print(f"{name},{cache_mode},{p.timestamp},{p.git_commit},{p.mean:.6f},{p.median:.6f},{change}")
+
+
 def print_csv_report(runs: list[BenchmarkRun]):
     """Print report in CSV format."""
     # Header
-    print("benchmark,cache_mode,pattern,size_mb,file_count,tool,mean_s,median_s,stddev_s,min_s,max_s,throughput_mbs")
+    print("benchmark,cache_mode,pattern,size_mb,file_count,tool,mean_s,median_s,stddev_s,min_s,max_s,throughput_mbs,"
+          "p50_s,p90_s,p99_s,trimmed_mean_s,filtered_mean_s,outliers")
 
     for run in runs:
         cache_mode = "cold" if run.cold_run else "warm"
         for result in run.results:
             tool_name = get_tool_name(result.command)
             throughput = run.size_mb / result.mean if result.mean > 0 else 0
+            st = result.stats
+            tail = (f"{st.p50:.6f},{st.p90:.6f},{st.p99:.6f},{st.trimmed_mean:.6f},"
+                    f"{st.filtered_mean:.6f},{st.outliers}") if st else ",,,,,"
             print(f"{run.name},{cache_mode},{run.pattern},{run.size_mb},{run.file_count},"
                   f"{tool_name},{result.mean:.6f},{result.median:.6f},{result.stddev:.6f},"
-                  f"{result.min:.6f},{result.max:.6f},{throughput:.2f}")
+                  f"{result.min:.6f},{result.max:.6f},{throughput:.2f},{tail}")
 
 
 def print_json_report(runs: list[BenchmarkRun]):
@@ -282,6 +1111,16 @@ def print_json_report(runs: list[BenchmarkRun]):
                 "max_s": result.max,
                 "throughput_mbs": run.size_mb / result.mean if result.mean > 0 else 0,
             }
+            st = result.stats
+            if st:
+                result_data.update({
+                    "p50_s": st.p50,
+                    "p90_s": st.p90,
+                    "p99_s": st.p99,
+                    "trimmed_mean_s": st.trimmed_mean,
+                    "filtered_mean_s": st.filtered_mean,
+                    "outliers": st.outliers,
+                })
             run_data["results"].append(result_data)
         output.append(run_data)
 
@@ -289,40 +1128,24 @@ def print_json_report(runs: list[BenchmarkRun]):
 
 
 def find_result_files(results_dir: Path, latest_only: bool = False) -> list[Path]:
-    """Find all JSON result files in the results directory."""
-    if not results_dir.exists():
-        print(f"Error: Results directory not found: {results_dir}", file=sys.stderr)
-        return []
+    """Find the JSON result files in the results directory.
 
+    With latest_only, files are grouped by benchmark type and cache mode
+    using their names alone (<benchmark>_<cache mode>_<date>_<time>.json),
+    and only the newest of each group is returned, so the others are never
+    opened.
+    """
     json_files = sorted(results_dir.glob("*.json"))
+    if not latest_only:
+        return json_files
 
-    if not json_files:
-        print(f"No result files found in {results_dir}", file=sys.stderr)
-        return []
-
-    if latest_only:
-        # Group by benchmark type (everything before the timestamp)
-        groups: dict[str, list[Path]] = {}
-        for f in json_files:
-            # Extract benchmark type from filename (remove timestamp suffix)
-            parts = f.stem.rsplit("_", 2)
-            if len(parts) >= 3:
-                bench_type = "_".join(parts[:-2])
-            else:
-                bench_type = f.stem
-
-            if bench_type not in groups:
-                groups[bench_type] = []
-            groups[bench_type].append(f)
-
-        # Get the latest file from each group
-        latest_files = []
-        for bench_type, files in groups.items():
-            latest_files.append(sorted(files)[-1])
-
-        return sorted(latest_files)
-
-    return json_files
+    latest: dict[str, Path] = {}
+    for f in json_files:
+        # Extract benchmark type from filename (remove timestamp suffix)
+        parts = f.stem.rsplit("_", 2)
+        bench_type = parts[0] if len(parts) == 3 else f.stem
+        latest[bench_type] = f  # sorted, so the last one is the newest
+    return sorted(latest.values())
 
 
 def main():
@@ -337,6 +1160,11 @@ def main():
         default=Path("./bench/results"),
         help="Directory containing JSON results"
     )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        help="SQLite history store (default: RESULTS_DIR/history.sqlite3, or in memory with --compare)"
+    )
     parser.add_argument(
         "--latest",
         action="store_true",
@@ -346,7 +1174,27 @@ def main():
         "--compare",
         nargs=2,
         metavar=("FILE1", "FILE2"),
-        help="Compare two specific result files"
+        help="Compare the timings of FILE2 (new) against FILE1 (base)"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=5.0,
+        metavar="PCT",
+        help="Slowdown of mygrep, in percent, beyond which --compare fails, and the smallest "
+             "change --trend reports (default: 5)"
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        metavar="P",
+        help="Significance level of the --compare test (default: 0.05)"
+    )
+    parser.add_argument(
+        "--trend",
+        metavar="BENCHMARK",
+        help="Show mygrep's mean and median across all runs of BENCHMARK, with changepoints"
     )
     parser.add_argument(
         "--json",
@@ -366,27 +1214,76 @@ def main():
 
     args = parser.parse_args()
 
-    # Find result files
+    # Ingest new result files into the store, then query it
     if args.compare:
-        result_files = [Path(f) for f in args.compare]
+        db_path = args.db or MEMORY_STORE
+    elif not args.results_dir.exists():
+        print(f"Error: Results directory not found: {args.results_dir}", file=sys.stderr)
+        sys.exit(1)
     else:
-        result_files = find_result_files(args.results_dir, args.latest)
-
-    if not result_files:
-        print("No benchmark results to process.", file=sys.stderr)
+        db_path = args.db or args.results_dir / "history.sqlite3"
+    try:
+        store = ResultStore(db_path)
+    except sqlite3.Error as e:
+        print(f"Error: Failed to open history store {db_path}: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # Load results
-    runs = []
-    for filepath in result_files:
-        run = BenchmarkRun.from_json_file(filepath)
-        if run:
-            runs.append(run)
+    # The store stays open while reporting: raw timings are read lazily
+    if args.compare:
+        digests = store.ingest([Path(f) for f in args.compare])
+        runs = store.runs_by_hash([d for d in digests if d])
+    elif args.trend:
+        # The trend follows the whole history, including deleted result files
+        store.ingest(find_result_files(args.results_dir))
+        runs = store.runs_of(args.trend)
+        if not runs:
+            print(f"No runs of benchmark {args.trend!r}; known benchmarks: "
+                  f"{', '.join(store.benchmark_names())}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        digests = [d for d in store.ingest(find_result_files(args.results_dir, args.latest)) if d]
+        runs = store.latest_runs(digests) if args.latest else store.runs(digests)
 
     if not runs:
         print("Failed to load any benchmark results.", file=sys.stderr)
         sys.exit(1)
 
+    if args.trend:
+        trends = []
+        for cold_run in (False, True):
+            points = trend_points([r for r in runs if r.cold_run == cold_run])
+            if points:
+                changepoints = detect_changepoints([p.median for p in points], args.threshold)
+                trends.append((cold_run, points, changepoints))
+        if not trends:
+            print(f"No mygrep results for benchmark: {args.trend}", file=sys.stderr)
+            sys.exit(1)
+        if args.json:
+            print_json_trend(args.trend, trends)
+        elif args.csv:
+            print_csv_trend(args.trend, trends)
+        else:
+            print_trend_report(args.trend, trends, args.threshold)
+        return
+
+    if args.compare:
+        if len(runs) != 2:
+            print("Failed to load both result files to compare.", file=sys.stderr)
+            sys.exit(1)
+        base, new = runs
+        comparisons = compare_runs(base, new, args.threshold, args.alpha)
+        if args.json:
+            print_json_comparison(base, new, comparisons)
+        elif args.csv:
+            print_csv_comparison(base, comparisons)
+        else:
+            print_comparison_report(base, new, comparisons, args.threshold, args.alpha)
+        if any(c.regression for c in comparisons):
+            if not args.json and not args.csv:
+                print("mygrep regressed beyond the threshold.", file=sys.stderr)
+            sys.exit(EXIT_REGRESSION)
+        return
+
     # Output report
     if args.json:
         print_json_report(runs)
@@ -410,6 +1307,9 @@ def main():
         print("Notes:")
         print("  - Times are wall-clock time (lower is better)")
         print("  - Throughput is calculated as size_mb / mean_time")
+        print(f"  - p50/p90/p99 are percentiles of the raw timings; 'Trim mean' drops the "
+              f"{TRIM_PROPORTION:.0%} fastest and slowest")
+        print(f"  - 'Mean w/o out' drops outliers with a modified z-score above {MAD_CUTOFF} (MAD)")
         print("  - 'warm' means OS page cache is active")
         print("  - 'cold' means page cache was cleared before each run")
         print()
@@ -14,6 +14,7 @@ TIMESTAMP=$(date +"${DATE_FORMAT}")
 RUN_COLD=false
 CORPUS_TYPE="all"
 PATTERN_TYPE="common"
+OUTPUT_MODE="lines"
 VERBOSE=false
 DRY_RUN=false
 SKIP_BINARY_CHECK=false
@@ -152,10 +153,45 @@ get_search_pattern() {
         common)   echo "${SEARCH_PATTERN_COMMON}" ;;
         rare)     echo "${SEARCH_PATTERN_RARE}" ;;
         frequent) echo "${SEARCH_PATTERN_FREQUENT}" ;;
+        regex)    echo "${SEARCH_PATTERN_REGEX}" ;;
         *)        echo "${pattern_type}" ;;  # Allow custom patterns
     esac
 }
 
+# Pattern syntax flags for each tool: fixed strings by default, extended
+# regular expressions for the "regex" pattern type
+mygrep_pattern_flags() {
+    if [[ "${PATTERN_TYPE}" == "regex" ]]; then echo "-E"; fi
+}
+
+rg_pattern_flags() {
+    if [[ "${PATTERN_TYPE}" != "regex" ]]; then echo "--fixed-strings"; fi
+}
+
+grep_pattern_flags() {
+    if [[ "${PATTERN_TYPE}" == "regex" ]]; then
+        echo "--extended-regexp"
+    else
+        echo "--fixed-strings"
+    fi
+}
+
+# Output mode flags, shared by all tools: -c (count), -l (files with
+# matches), -q (quiet) or -C (context lines)
+output_mode_flags() {
+    case "${OUTPUT_MODE}" in
+        context) echo "-C ${CONTEXT_LINES}" ;;
+        count) echo "-c" ;;
+        files) echo "-l" ;;
+        quiet) echo "-q" ;;
+    esac
+}
+
+# Suffix distinguishing benchmark names for non-default output modes
+output_mode_suffix() {
+    if [[ "${OUTPUT_MODE}" != "lines" ]]; then echo "_${OUTPUT_MODE}"; fi
+}
+
 clear_cache() {
     if [[ "${RUN_COLD}" == true ]]; then
         log_verbose "Clearing page cache..."
@@ -166,6 +202,31 @@ clear_cache() {
     fi
 }
 
+# Fill the caller's hyperfine_opts array with the options every benchmark
+# shares, then any extra options given after the JSON output file. Pass an
+# empty output file to choose it per hyperfine call.
+build_hyperfine_opts() {
+    local output_file="$1"
+    shift
+
+    hyperfine_opts=(
+        "--warmup" "${WARMUP_RUNS}"
+        "--runs" "${BENCH_RUNS}"
+        "--style" "full"
+        # grep-style tools exit 1 when nothing matches (rare patterns, -q)
+        "--ignore-failure"
+        "$@"
+    )
+    if [[ -n "${output_file}" ]]; then
+        hyperfine_opts+=("--export-json" "${output_file}")
+    fi
+
+    # Clear the page cache before each run for cold benchmarks
+    if [[ "${RUN_COLD}" == true ]]; then
+        hyperfine_opts+=("--prepare" "${CLEAR_CACHE_CMD}")
+    fi
+}
+
 get_file_size_mb() {
     local path="$1"
     if [[ -d "${path}" ]]; then
@@ -195,23 +256,14 @@ run_benchmark_single_file() {
     log_verbose "  File size: ${size_mb} MB"
 
     # Build commands
-    # All tools: fixed-string search, output to /dev/null for fair comparison
-    local cmd_mygrep="${MYGREP_BIN} '${pattern}' '${file}' > /dev/null"
-    local cmd_rg="${RG_BIN} --fixed-strings --no-filename '${pattern}' '${file}' > /dev/null"
-    local cmd_grep="${GREP_BIN} --fixed-strings '${pattern}' '${file}' > /dev/null"
+    # All tools: same pattern syntax, output to /dev/null for fair comparison
+    local cmd_mygrep="${MYGREP_BIN} $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${file}' > /dev/null"
+    local cmd_rg="${RG_BIN} $(rg_pattern_flags) $(output_mode_flags) --no-filename '${pattern}' '${file}' > /dev/null"
+    local cmd_grep="${GREP_BIN} $(grep_pattern_flags) $(output_mode_flags) '${pattern}' '${file}' > /dev/null"
 
     # Build hyperfine command
-    local hyperfine_opts=(
-        "--warmup" "${WARMUP_RUNS}"
-        "--runs" "${BENCH_RUNS}"
-        "--export-json" "${output_file}"
-        "--style" "full"
-    )
-
-    # Add prepare command for cold runs
-    if [[ "${RUN_COLD}" == true ]]; then
-        hyperfine_opts+=("--prepare" "${CLEAR_CACHE_CMD}")
-    fi
+    local hyperfine_opts=()
+    build_hyperfine_opts "${output_file}"
 
     # Build the command list
     local commands=()
@@ -246,6 +298,7 @@ run_benchmark_directory() {
     local dir="$2"
     local pattern="$3"
     local output_file="$4"
+    local file_type="${5:-}"
 
     log_info "Running benchmark: ${name}"
     log_info "  Directory: ${dir}"
@@ -259,31 +312,139 @@ run_benchmark_directory() {
     log_verbose "  Size: ${size_mb} MB, Files: ${file_count}"
 
     # Build commands for directory search
-    # mygrep: Need to iterate through files (since current impl is single-file only)
-    # Using find + xargs for mygrep as a workaround
-    local cmd_mygrep="find '${dir}' -type f -exec ${MYGREP_BIN} '${pattern}' {} \\; > /dev/null 2>&1"
+    # mygrep: native recursive search, or one process per file via find -exec
+    # when MYGREP_RECURSIVE_FLAG is empty
+    local cmd_mygrep
+    if [[ -n "${MYGREP_RECURSIVE_FLAG}" ]]; then
+        cmd_mygrep="${MYGREP_BIN} ${MYGREP_RECURSIVE_FLAG} ${MYGREP_EXTRA_FLAGS} $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null"
+    else
+        cmd_mygrep="find '${dir}' -type f -exec ${MYGREP_BIN} $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' {} \\; > /dev/null 2>&1"
+    fi
 
-    # ripgrep: native recursive search with fixed-string
-    local cmd_rg="${RG_BIN} --fixed-strings '${pattern}' '${dir}' > /dev/null"
+    # ripgrep: native recursive search
+    local cmd_rg="${RG_BIN} $(rg_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null"
 
-    # GNU grep: recursive with fixed-string
-    local cmd_grep="${GREP_BIN} --fixed-strings --recursive '${pattern}' '${dir}' > /dev/null"
+    # GNU grep: recursive search
+    local cmd_grep="${GREP_BIN} $(grep_pattern_flags) $(output_mode_flags) --recursive '${pattern}' '${dir}' > /dev/null"
 
     # Build hyperfine command
-    local hyperfine_opts=(
-        "--warmup" "${WARMUP_RUNS}"
-        "--runs" "${BENCH_RUNS}"
-        "--export-json" "${output_file}"
-        "--style" "full"
-        "--shell" "bash"
-    )
+    local hyperfine_opts=()
+    build_hyperfine_opts "${output_file}" "--shell" "bash"
 
-    if [[ "${RUN_COLD}" == true ]]; then
-        hyperfine_opts+=("--prepare" "${CLEAR_CACHE_CMD}")
+    local commands=()
+    commands+=("--command-name" "mygrep" "${cmd_mygrep}")
+
+    if [[ "${RG_AVAILABLE}" == true ]]; then
+        commands+=("--command-name" "ripgrep" "${cmd_rg}")
+    fi
+
+    if [[ "${GREP_AVAILABLE}" == true ]]; then
+        commands+=("--command-name" "gnu-grep" "${cmd_grep}")
+    fi
+
+    # With a file type, also search only files of that type, selected by
+    # name without opening the others
+    if [[ -n "${file_type}" && -n "${MYGREP_RECURSIVE_FLAG}" ]]; then
+        commands+=("--command-name" "mygrep-type" "${MYGREP_BIN} ${MYGREP_RECURSIVE_FLAG} -t ${file_type} ${MYGREP_EXTRA_FLAGS} $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null")
+        if [[ "${RG_AVAILABLE}" == true ]]; then
+            commands+=("--command-name" "ripgrep-type" "${RG_BIN} -t ${file_type} $(rg_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null")
+        fi
+    fi
+
+    if [[ "${DRY_RUN}" == true ]]; then
+        log_info "DRY RUN - would execute:"
+        echo "  hyperfine ${hyperfine_opts[*]} ${commands[*]}"
+        return
+    fi
+
+    hyperfine "${hyperfine_opts[@]}" "${commands[@]}" || {
+        log_warn "Benchmark failed or was interrupted"
+        return 1
+    }
+
+    add_metadata_to_result "${output_file}" "${name}" "${pattern}" "${size_mb}" "${dir}" "${file_count}"
+}
+
+# Benchmark searching a compressed file. mygrep and ripgrep decompress it
+# themselves (-z); GNU grep, and mygrep as a baseline, read it from a
+# decompressor through a pipe.
+run_benchmark_compressed() {
+    local name="$1"
+    local file="$2"
+    local pattern="$3"
+    local output_file="$4"
+    local decompressor="$5"
+
+    log_info "Running benchmark: ${name}"
+    log_info "  File: ${file}"
+    log_info "  Pattern: '${pattern}'"
+    log_info "  Output: ${output_file}"
+
+    local size_mb
+    size_mb=$(get_file_size_mb "${file}")
+
+    local cmd_mygrep="${MYGREP_BIN} -z $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${file}' > /dev/null"
+    local cmd_mygrep_pipe="${decompressor} '${file}' | ${MYGREP_BIN} $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' > /dev/null"
+    local cmd_rg="${RG_BIN} --search-zip $(rg_pattern_flags) $(output_mode_flags) --no-filename '${pattern}' '${file}' > /dev/null"
+    local cmd_grep="${decompressor} '${file}' | ${GREP_BIN} $(grep_pattern_flags) $(output_mode_flags) '${pattern}' > /dev/null"
+
+    local hyperfine_opts=()
+    build_hyperfine_opts "${output_file}" "--shell" "bash"
+
+    local commands=()
+    commands+=("--command-name" "mygrep" "${cmd_mygrep}")
+    commands+=("--command-name" "mygrep-pipe" "${cmd_mygrep_pipe}")
+
+    if [[ "${RG_AVAILABLE}" == true ]]; then
+        commands+=("--command-name" "ripgrep" "${cmd_rg}")
     fi
 
+    if [[ "${GREP_AVAILABLE}" == true ]]; then
+        commands+=("--command-name" "gnu-grep" "${cmd_grep}")
+    fi
+
+    if [[ "${DRY_RUN}" == true ]]; then
+        log_info "DRY RUN - would execute:"
+        echo "  hyperfine ${hyperfine_opts[*]} ${commands[*]}"
+        return
+    fi
+
+    hyperfine "${hyperfine_opts[@]}" "${commands[@]}" || {
+        log_warn "Benchmark failed or was interrupted"
+        return 1
+    }
+
+    add_metadata_to_result "${output_file}" "${name}" "${pattern}" "${size_mb}" "${file}"
+}
+
+# Benchmark searching a file piped through cat, as in `tail -f | mygrep` or
+# `zcat | mygrep`: every tool reads standard input, so none can map the file.
+# The direct search of the file is included for comparison.
+run_benchmark_pipe() {
+    local name="$1"
+    local file="$2"
+    local pattern="$3"
+    local output_file="$4"
+
+    log_info "Running benchmark: ${name}"
+    log_info "  File: ${file} (through cat)"
+    log_info "  Pattern: '${pattern}'"
+    log_info "  Output: ${output_file}"
+
+    local size_mb
+    size_mb=$(get_file_size_mb "${file}")
+
+    local cmd_mygrep="cat '${file}' | ${MYGREP_BIN} $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' > /dev/null"
+    local cmd_mygrep_file="${MYGREP_BIN} $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${file}' > /dev/null"
+    local cmd_rg="cat '${file}' | ${RG_BIN} $(rg_pattern_flags) $(output_mode_flags) '${pattern}' > /dev/null"
+    local cmd_grep="cat '${file}' | ${GREP_BIN} $(grep_pattern_flags) $(output_mode_flags) '${pattern}' > /dev/null"
+
+    local hyperfine_opts=()
+    build_hyperfine_opts "${output_file}" "--shell" "bash"
+
     local commands=()
     commands+=("--command-name" "mygrep" "${cmd_mygrep}")
+    commands+=("--command-name" "mygrep-file" "${cmd_mygrep_file}")
 
     if [[ "${RG_AVAILABLE}" == true ]]; then
         commands+=("--command-name" "ripgrep" "${cmd_rg}")
@@ -304,7 +465,7 @@ run_benchmark_directory() {
         return 1
     }
 
-    add_metadata_to_result "${output_file}" "${name}" "${pattern}" "${size_mb}" "${dir}" "${file_count}"
+    add_metadata_to_result "${output_file}" "${name}" "${pattern}" "${size_mb}" "${file}"
 }
 
 add_metadata_to_result() {
@@ -325,6 +486,10 @@ add_metadata_to_result() {
         cold_run_py="True"
     fi
 
+    # The commit benchmarked, so report.py --trend can name where a change landed
+    local git_commit
+    git_commit=$(git -C "${SCRIPT_DIR}/.." rev-parse --short HEAD 2>/dev/null || true)
+
     # Add metadata using Python (more reliable JSON handling)
     python3 << EOF
 import json
@@ -343,7 +508,8 @@ try:
         "timestamp": "${TIMESTAMP}",
         "cold_run": ${cold_run_py},
         "warmup_runs": ${WARMUP_RUNS},
-        "bench_runs": ${BENCH_RUNS}
+        "bench_runs": ${BENCH_RUNS},
+        "git_commit": "${git_commit}"
     }
 
     with open("${output_file}", "w") as f:
@@ -353,6 +519,209 @@ except Exception as e:
 EOF
 }
 
+# Record how much of the file mygrep skipped thanks to binary detection,
+# with the default binary handling and with -I (skip binary files)
+record_mygrep_binary_stats() {
+    local output_file="$1"
+    local pattern="$2"
+    local file="$3"
+
+    if [[ ! -f "${output_file}" ]]; then
+        return
+    fi
+
+    local default_stats skip_stats
+    default_stats=$("${MYGREP_BIN}" --stats "${pattern}" "${file}" 2>&1 > /dev/null || true)
+    skip_stats=$("${MYGREP_BIN}" --stats -I "${pattern}" "${file}" 2>&1 > /dev/null || true)
+
+    local default_skipped skip_skipped
+    default_skipped=$(echo "${default_stats}" | awk '/bytes skipped/ {print $1}')
+    skip_skipped=$(echo "${skip_stats}" | awk '/bytes skipped/ {print $1}')
+    default_skipped="${default_skipped:-0}"
+    skip_skipped="${skip_skipped:-0}"
+
+    log_info "  mygrep bytes skipped: ${default_skipped} (default), ${skip_skipped} (-I)"
+
+    python3 << EOF
+import json
+import sys
+
+try:
+    with open("${output_file}", "r") as f:
+        data = json.load(f)
+
+    data.setdefault("metadata", {})["mygrep_bytes_skipped"] = {
+        "default": ${default_skipped},
+        "skip_binary": ${skip_skipped}
+    }
+
+    with open("${output_file}", "w") as f:
+        json.dump(data, f, indent=2)
+except Exception as e:
+    print(f"Warning: Failed to add mygrep stats: {e}", file=sys.stderr)
+EOF
+}
+
+# Benchmark mygrep's trigram index on a directory: a full index build, an
+# incremental update with nothing changed, and the latency of the same
+# search with and without the index. The index is removed afterwards so
+# that other benchmarks do not search it.
+run_benchmark_index() {
+    local name="$1"
+    local dir="$2"
+    local pattern="$3"
+    local build_output_file="$4"
+    local query_output_file="$5"
+
+    log_info "Running benchmark: ${name}"
+    log_info "  Directory: ${dir}"
+    log_info "  Pattern: '${pattern}'"
+    log_info "  Output: ${build_output_file}, ${query_output_file}"
+
+    local index_file="${dir}/.mygrep-index"
+    local size_mb
+    size_mb=$(get_file_size_mb "${dir}")
+    local file_count
+    file_count=$(find "${dir}" -type f ! -name .mygrep-index | wc -l | tr -d ' ')
+
+    local cmd_build="rm -f '${index_file}' && ${MYGREP_BIN} index build '${dir}' > /dev/null"
+    local cmd_update="${MYGREP_BIN} index build '${dir}' > /dev/null"
+    local cmd_indexed="${MYGREP_BIN} -r $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null"
+    local cmd_unindexed="${MYGREP_BIN} -r -no-index $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null"
+
+    local hyperfine_opts=()
+    build_hyperfine_opts "" "--shell" "bash"
+
+    local build_commands=(
+        "--command-name" "index-build" "${cmd_build}"
+        "--command-name" "index-update" "${cmd_update}"
+    )
+    local query_commands=(
+        "--command-name" "mygrep-indexed" "${cmd_indexed}"
+        "--command-name" "mygrep-unindexed" "${cmd_unindexed}"
+    )
+
+    if [[ "${DRY_RUN}" == true ]]; then
+        log_info "DRY RUN - would execute:"
+        echo "  hyperfine ${hyperfine_opts[*]} --export-json ${build_output_file} ${build_commands[*]}"
+        echo "  hyperfine ${hyperfine_opts[*]} --export-json ${query_output_file} ${query_commands[*]}"
+        return
+    fi
+
+    hyperfine "${hyperfine_opts[@]}" --export-json "${build_output_file}" "${build_commands[@]}" &&
+    hyperfine "${hyperfine_opts[@]}" --export-json "${query_output_file}" "${query_commands[@]}" || {
+        log_warn "Benchmark failed or was interrupted"
+        rm -f "${index_file}"
+        return 1
+    }
+
+    add_metadata_to_result "${build_output_file}" "${name}_build" "" "${size_mb}" "${dir}" "${file_count}"
+    add_metadata_to_result "${query_output_file}" "${name}" "${pattern}" "${size_mb}" "${dir}" "${file_count}"
+    record_index_stats "${build_output_file}" "${index_file}"
+    rm -f "${index_file}"
+}
+
+# Benchmark repeated searches of a directory through a `mygrep serve`
+# daemon, whose caches are warm after the warmup runs, against running
+# mygrep directly
+run_benchmark_serve() {
+    local name="$1"
+    local dir="$2"
+    local pattern="$3"
+    local output_file="$4"
+
+    log_info "Running benchmark: ${name}"
+    log_info "  Directory: ${dir}"
+    log_info "  Pattern: '${pattern}'"
+    log_info "  Output: ${output_file}"
+
+    local size_mb
+    size_mb=$(get_file_size_mb "${dir}")
+    local file_count
+    file_count=$(find "${dir}" -type f | wc -l | tr -d ' ')
+
+    local socket_dir
+    socket_dir=$(mktemp -d)
+    local socket="${socket_dir}/mygrep.sock"
+
+    local cmd_served="MYGREP_SOCKET='${socket}' ${MYGREP_BIN} -r $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null"
+    local cmd_direct="${MYGREP_BIN} -r $(mygrep_pattern_flags) $(output_mode_flags) '${pattern}' '${dir}' > /dev/null"
+
+    local hyperfine_opts=()
+    build_hyperfine_opts "${output_file}" "--shell" "bash"
+
+    local commands=(
+        "--command-name" "mygrep-serve" "${cmd_served}"
+        "--command-name" "mygrep" "${cmd_direct}"
+    )
+
+    if [[ "${DRY_RUN}" == true ]]; then
+        log_info "DRY RUN - would execute:"
+        echo "  ${MYGREP_BIN} serve ${socket} &"
+        echo "  hyperfine ${hyperfine_opts[*]} ${commands[*]}"
+        rmdir "${socket_dir}"
+        return
+    fi
+
+    "${MYGREP_BIN}" serve "${socket}" 2> /dev/null &
+    local server_pid=$!
+    local i
+    for i in $(seq 1 50); do
+        [[ -S "${socket}" ]] && break
+        sleep 0.1
+    done
+
+    local status=0
+    hyperfine "${hyperfine_opts[@]}" "${commands[@]}" || {
+        log_warn "Benchmark failed or was interrupted"
+        status=1
+    }
+    kill "${server_pid}" 2> /dev/null || true
+    wait "${server_pid}" 2> /dev/null || true
+    rm -rf "${socket_dir}"
+
+    if [[ "${status}" -eq 0 ]]; then
+        add_metadata_to_result "${output_file}" "${name}" "${pattern}" "${size_mb}" "${dir}" "${file_count}"
+    fi
+    return "${status}"
+}
+
+# Record the size of the trigram index and the number of files in it
+record_index_stats() {
+    local output_file="$1"
+    local index_file="$2"
+
+    if [[ ! -f "${output_file}" || ! -f "${index_file}" ]]; then
+        return
+    fi
+
+    local index_bytes indexed_files
+    index_bytes=$(wc -c < "${index_file}" | tr -d ' ')
+    indexed_files=$("${MYGREP_BIN}" index build "$(dirname "${index_file}")" | awk '{print $2}')
+    indexed_files="${indexed_files:-0}"
+
+    log_info "  Index: ${index_bytes} bytes, ${indexed_files} files"
+
+    python3 << EOF
+import json
+import sys
+
+try:
+    with open("${output_file}", "r") as f:
+        data = json.load(f)
+
+    data.setdefault("metadata", {})["index"] = {
+        "size_bytes": ${index_bytes},
+        "indexed_files": ${indexed_files}
+    }
+
+    with open("${output_file}", "w") as f:
+        json.dump(data, f, indent=2)
+except Exception as e:
+    print(f"Warning: Failed to add index stats: {e}", file=sys.stderr)
+EOF
+}
+
 #------------------------------------------------------------------------------
 # Main benchmark suites
 #------------------------------------------------------------------------------
@@ -363,9 +732,41 @@ run_code_tree_benchmark() {
     local cache_mode
     if [[ "${RUN_COLD}" == true ]]; then cache_mode="cold"; else cache_mode="warm"; fi
 
-    local output_file="${RESULTS_DIR}/code_tree_${PATTERN_TYPE}_${cache_mode}_${TIMESTAMP}.json"
+    local name="code_tree_${PATTERN_TYPE}$(output_mode_suffix)"
+    local output_file="${RESULTS_DIR}/${name}_${cache_mode}_${TIMESTAMP}.json"
+
+    run_benchmark_directory "${name}" \
+        "${CORPUS_DIR}/code_tree" \
+        "${pattern}" \
+        "${output_file}" \
+        "${CODE_TREE_FILE_TYPE}"
+}
+
+run_code_tree_index_benchmark() {
+    local pattern
+    pattern=$(get_search_pattern "${PATTERN_TYPE}")
+    local cache_mode
+    if [[ "${RUN_COLD}" == true ]]; then cache_mode="cold"; else cache_mode="warm"; fi
+
+    local name="code_tree_index_${PATTERN_TYPE}$(output_mode_suffix)"
+
+    run_benchmark_index "${name}" \
+        "${CORPUS_DIR}/code_tree" \
+        "${pattern}" \
+        "${RESULTS_DIR}/code_tree_index_build_${cache_mode}_${TIMESTAMP}.json" \
+        "${RESULTS_DIR}/${name}_${cache_mode}_${TIMESTAMP}.json"
+}
+
+run_code_tree_serve_benchmark() {
+    local pattern
+    pattern=$(get_search_pattern "${PATTERN_TYPE}")
+    local cache_mode
+    if [[ "${RUN_COLD}" == true ]]; then cache_mode="cold"; else cache_mode="warm"; fi
+
+    local name="code_tree_serve_${PATTERN_TYPE}$(output_mode_suffix)"
+    local output_file="${RESULTS_DIR}/${name}_${cache_mode}_${TIMESTAMP}.json"
 
-    run_benchmark_directory "code_tree_${PATTERN_TYPE}" \
+    run_benchmark_serve "${name}" \
         "${CORPUS_DIR}/code_tree" \
         "${pattern}" \
         "${output_file}"
@@ -377,14 +778,57 @@ run_log_file_benchmark() {
     local cache_mode
     if [[ "${RUN_COLD}" == true ]]; then cache_mode="cold"; else cache_mode="warm"; fi
 
-    local output_file="${RESULTS_DIR}/log_file_${PATTERN_TYPE}_${cache_mode}_${TIMESTAMP}.json"
+    local name="log_file_${PATTERN_TYPE}$(output_mode_suffix)"
+    local output_file="${RESULTS_DIR}/${name}_${cache_mode}_${TIMESTAMP}.json"
+
+    run_benchmark_single_file "${name}" \
+        "${CORPUS_DIR}/log/access.log" \
+        "${pattern}" \
+        "${output_file}"
+}
+
+run_pipe_log_benchmark() {
+    local pattern
+    pattern=$(get_search_pattern "${PATTERN_TYPE}")
+    local cache_mode
+    if [[ "${RUN_COLD}" == true ]]; then cache_mode="cold"; else cache_mode="warm"; fi
+
+    local name="log_file_pipe_${PATTERN_TYPE}$(output_mode_suffix)"
+    local output_file="${RESULTS_DIR}/${name}_${cache_mode}_${TIMESTAMP}.json"
 
-    run_benchmark_single_file "log_file_${PATTERN_TYPE}" \
+    echo ""
+    run_benchmark_pipe "${name}" \
         "${CORPUS_DIR}/log/access.log" \
         "${pattern}" \
         "${output_file}"
 }
 
+run_compressed_log_benchmark() {
+    local pattern
+    pattern=$(get_search_pattern "${PATTERN_TYPE}")
+    local cache_mode
+    if [[ "${RUN_COLD}" == true ]]; then cache_mode="cold"; else cache_mode="warm"; fi
+
+    local ext decompressor
+    for ext in gz zst; do
+        local file="${CORPUS_DIR}/log/access.log.${ext}"
+        if [[ ! -f "${file}" ]]; then
+            log_warn "Compressed log file not found, skipping: ${file}"
+            continue
+        fi
+        case "${ext}" in
+            gz)  decompressor="gzip -dc" ;;
+            zst) decompressor="zstd -dcq" ;;
+        esac
+
+        local name="log_file_${ext}_${PATTERN_TYPE}$(output_mode_suffix)"
+        local output_file="${RESULTS_DIR}/${name}_${cache_mode}_${TIMESTAMP}.json"
+
+        echo ""
+        run_benchmark_compressed "${name}" "${file}" "${pattern}" "${output_file}" "${decompressor}"
+    done
+}
+
 run_binary_file_benchmark() {
     if [[ "${SKIP_BINARY_CHECK}" == true ]]; then
         log_warn "Skipping binary benchmark (binary files may cause issues with some tools)"
@@ -404,6 +848,10 @@ run_binary_file_benchmark() {
         "${CORPUS_DIR}/binary/random.bin" \
         "${pattern}" \
         "${output_file}"
+
+    if [[ "${DRY_RUN}" != true ]]; then
+        record_mygrep_binary_stats "${output_file}" "${pattern}" "${CORPUS_DIR}/binary/random.bin"
+    fi
 }
 
 #------------------------------------------------------------------------------
@@ -420,7 +868,8 @@ Options:
     --warm          Run warm benchmarks (OS cache active, default)
     --cold          Run cold benchmarks (clear cache before each run)
     --corpus TYPE   Corpus type: all, code, log, binary (default: all)
-    --pattern TYPE  Pattern type: common, rare, frequent, or custom string (default: common)
+    --pattern TYPE  Pattern type: common, rare, frequent, regex, or custom string (default: common)
+    --mode MODE     Output mode: lines, context (-C), count (-c), files (-l), quiet (-q) (default: lines)
     --warmup N      Number of warmup runs (default: ${WARMUP_RUNS})
     --runs N        Number of benchmark runs (default: ${BENCH_RUNS})
     --dry-run       Show commands without executing
@@ -433,6 +882,9 @@ Examples:
     $(basename "$0") --cold                 # Run all cold benchmarks
     $(basename "$0") --corpus code          # Benchmark only code tree
     $(basename "$0") --pattern "TODO"       # Search for custom pattern
+    $(basename "$0") --pattern regex        # Compare regex engines (-E)
+    $(basename "$0") --mode count           # Count matches only (-c)
+    $(basename "$0") --corpus log --mode context  # Print context lines (-C 3)
     $(basename "$0") --corpus log --cold    # Cold benchmark on log file
 
 Environment variables:
@@ -462,6 +914,16 @@ main() {
                 shift
                 PATTERN_TYPE="$1"
                 ;;
+            --mode)
+                shift
+                case "$1" in
+                    lines|context|count|files|quiet) OUTPUT_MODE="$1" ;;
+                    *)
+                        log_error "Unknown output mode: $1"
+                        exit 1
+                        ;;
+                esac
+                ;;
             --warmup)
                 shift
                 WARMUP_RUNS="$1"
@@ -508,6 +970,7 @@ main() {
     log_info "  Mode: ${cache_mode}"
     log_info "  Corpus: ${CORPUS_TYPE}"
     log_info "  Pattern: ${PATTERN_TYPE} ($(get_search_pattern "${PATTERN_TYPE}"))"
+    log_info "  Output mode: ${OUTPUT_MODE}"
     log_info "  Warmup runs: ${WARMUP_RUNS}"
     log_info "  Benchmark runs: ${BENCH_RUNS}"
     echo ""
@@ -533,15 +996,27 @@ main() {
         all)
             run_code_tree_benchmark
             echo ""
+            run_code_tree_index_benchmark
+            echo ""
+            run_code_tree_serve_benchmark
+            echo ""
             run_log_file_benchmark
+            run_pipe_log_benchmark
+            run_compressed_log_benchmark
             echo ""
             run_binary_file_benchmark
             ;;
         code)
             run_code_tree_benchmark
+            echo ""
+            run_code_tree_index_benchmark
+            echo ""
+            run_code_tree_serve_benchmark
             ;;
         log)
             run_log_file_benchmark
+            run_pipe_log_benchmark
+            run_compressed_log_benchmark
             ;;
         binary)
             run_binary_file_benchmark
@@ -0,0 +1,149 @@
+package main
+
+import "bytes"
+
+// ahoCorasick finds any of a set of fixed strings in a single pass over
+// the input, so throughput does not depend on how many patterns there
+// are.
+//
+// The automaton is compiled to a dense DFA: every state has a transition
+// for every input byte, so the search loop is one table lookup per byte
+// with no failure-link chasing. To keep the table small, bytes are mapped
+// to equivalence classes first; all bytes that appear in no pattern share
+// class 0, so the table has one column per distinct pattern byte plus
+// one.
+type ahoCorasick struct {
+	classes    [256]uint8
+	numClasses int
+
+	// trans[s*numClasses+c] is the state reached from s on class c.
+	trans []int32
+
+	// matchLen[s] is the length of a pattern that ends when state s is
+	// reached, or -1 if none does.
+	matchLen []int32
+
+	// startByte is set when every pattern begins with the same byte
+	// (e.g. request IDs sharing a "req-" prefix). In the start state the
+	// search then skips ahead to that byte with bytes.IndexByte.
+	startByte    byte
+	hasStartByte bool
+}
+
+func newAhoCorasick(patterns [][]byte) *ahoCorasick {
+	ac := &ahoCorasick{}
+
+	var used [256]bool
+	for _, p := range patterns {
+		for _, b := range p {
+			used[b] = true
+		}
+	}
+	ac.numClasses = 1
+	for b := 0; b < 256; b++ {
+		if used[b] {
+			ac.classes[b] = uint8(ac.numClasses)
+			ac.numClasses++
+		}
+	}
+	// 256 distinct bytes do not fit in a uint8 class id alongside class 0;
+	// give every byte its own class instead.
+	if ac.numClasses > 256 {
+		ac.numClasses = 256
+		for b := 0; b < 256; b++ {
+			ac.classes[b] = uint8(b)
+		}
+	}
+	k := ac.numClasses
+
+	// Build the trie. Missing transitions are -1 until the failure links
+	// are resolved below.
+	newState := func() int32 {
+		for c := 0; c < k; c++ {
+			ac.trans = append(ac.trans, -1)
+		}
+		ac.matchLen = append(ac.matchLen, -1)
+		return int32(len(ac.matchLen) - 1)
+	}
+	newState()
+	for _, p := range patterns {
+		s := int32(0)
+		for _, b := range p {
+			i := int(s)*k + int(ac.classes[b])
+			if ac.trans[i] < 0 {
+				next := newState()
+				ac.trans[i] = next
+			}
+			s = ac.trans[i]
+		}
+		if ac.matchLen[s] < 0 || int32(len(p)) < ac.matchLen[s] {
+			ac.matchLen[s] = int32(len(p))
+		}
+	}
+
+	// Resolve failure links breadth first, turning the trie into a DFA. A
+	// state inherits the match of its failure state when it has none of
+	// its own, since that pattern is a suffix of the text seen so far.
+	fail := make([]int32, len(ac.matchLen))
+	queue := make([]int32, 0, len(ac.matchLen))
+	for c := 0; c < k; c++ {
+		if next := ac.trans[c]; next < 0 {
+			ac.trans[c] = 0
+		} else {
+			queue = append(queue, next)
+		}
+	}
+	for len(queue) > 0 {
+		s := queue[0]
+		queue = queue[1:]
+		if ac.matchLen[s] < 0 {
+			ac.matchLen[s] = ac.matchLen[fail[s]]
+		}
+		for c := 0; c < k; c++ {
+			i := int(s)*k + c
+			fallback := ac.trans[int(fail[s])*k+c]
+			if next := ac.trans[i]; next < 0 {
+				ac.trans[i] = fallback
+			} else {
+				fail[next] = fallback
+				queue = append(queue, next)
+			}
+		}
+	}
+
+	if len(patterns) > 0 && len(patterns[0]) > 0 {
+		ac.startByte, ac.hasStartByte = patterns[0][0], true
+		for _, p := range patterns[1:] {
+			if len(p) == 0 || p[0] != ac.startByte {
+				ac.hasStartByte = false
+				break
+			}
+		}
+	}
+	return ac
+}
+
+// find returns the start offset of the match in b that ends first, or -1
+// if no pattern occurs in b.
+func (ac *ahoCorasick) find(b []byte) int {
+	if ac.matchLen[0] >= 0 {
+		// An empty pattern matches everywhere.
+		return 0
+	}
+	k := ac.numClasses
+	s := int32(0)
+	for i := 0; i < len(b); i++ {
+		if s == 0 && ac.hasStartByte {
+			j := bytes.IndexByte(b[i:], ac.startByte)
+			if j < 0 {
+				return -1
+			}
+			i += j
+		}
+		s = ac.trans[int(s)*k+int(ac.classes[b[i]])]
+		if n := ac.matchLen[s]; n >= 0 {
+			return i + 1 - int(n)
+		}
+	}
+	return -1
+}
@@ -0,0 +1,170 @@
+package main
+
+import (
+	"container/list"
+	"os"
+	"path/filepath"
+	"sync"
+	"time"
+)
+
+// cacheEntryOverhead is charged against the cache size for every entry on
+// top of its contents, so that many small entries are bounded too.
+const cacheEntryOverhead = 128
+
+// fileCache keeps directory listings and file contents in memory between
+// the searches run by `grep serve`, evicting the least recently used
+// entries once they add up to more than maxBytes.
+//
+// Entries are never trusted blindly: every use stats the directory or file
+// again and drops the entry if its mtime or size has changed, so a search
+// through the cache finds the same lines as one without it. Entries
+// modified within racyWindow of being read are not kept, since they could
+// change again without their mtime changing.
+//
+// A nil *fileCache is valid and reads straight from the file system.
+type fileCache struct {
+	maxBytes    int64
+	maxFileSize int64
+
+	// dir is the directory relative paths are resolved against. The
+	// server sets it before each search.
+	dir string
+
+	mu      sync.Mutex
+	used    int64
+	lru     list.List // of *cacheEntry, most recently used first
+	entries map[cacheKey]*list.Element
+}
+
+// cacheKey identifies an entry by absolute path. A directory and its
+// listing are a different entry from a file at the same path.
+type cacheKey struct {
+	path string
+	dir  bool
+}
+
+type cacheEntry struct {
+	key   cacheKey
+	size  int64
+	mtime int64
+	cost  int64
+
+	data    []byte        // contents of a file
+	listing []os.DirEntry // entries of a directory
+}
+
+func newFileCache(maxBytes, maxFileSize int64) *fileCache {
+	return &fileCache{
+		maxBytes:    maxBytes,
+		maxFileSize: maxFileSize,
+		entries:     make(map[cacheKey]*list.Element),
+	}
+}
+
+// readDir returns the entries of dir sorted by name, like os.ReadDir.
+func (c *fileCache) readDir(dir string) ([]os.DirEntry, error) {
+	if c == nil {
+		return os.ReadDir(dir)
+	}
+	// Listings are read through the absolute path so that the Info method
+	// of a cached entry still finds the file after the server has moved
+	// on to another working directory.
+	abs := c.abs(dir)
+	fi, err := os.Stat(abs)
+	if err != nil {
+		return os.ReadDir(abs)
+	}
+	key := cacheKey{path: abs, dir: true}
+	if e := c.get(key, fi); e != nil {
+		return e.listing, nil
+	}
+	listing, err := os.ReadDir(abs)
+	if err != nil {
+		return listing, err
+	}
+	cost := int64(len(abs))
+	for _, de := range listing {
+		cost += cacheEntryOverhead + int64(len(de.Name()))
+	}
+	c.put(&cacheEntry{key: key, listing: listing, cost: cost}, fi)
+	return listing, nil
+}
+
+// readFile returns the contents of the regular file at path. It reports
+// false if the file should be read as usual instead: it is too large to
+// cache, is not a regular file, or could not be read.
+func (c *fileCache) readFile(path string) ([]byte, bool) {
+	if c == nil {
+		return nil, false
+	}
+	fi, err := os.Stat(path)
+	if err != nil || !fi.Mode().IsRegular() || fi.Size() > c.maxFileSize {
+		return nil, false
+	}
+	key := cacheKey{path: c.abs(path)}
+	if e := c.get(key, fi); e != nil {
+		return e.data, true
+	}
+	data, err := os.ReadFile(path)
+	if err != nil || int64(len(data)) != fi.Size() {
+		return nil, false
+	}
+	c.put(&cacheEntry{key: key, data: data, cost: int64(len(data))}, fi)
+	return data, true
+}
+
+func (c *fileCache) abs(path string) string {
+	if filepath.IsAbs(path) {
+		return filepath.Clean(path)
+	}
+	return filepath.Join(c.dir, path)
+}
+
+// get returns the entry for key if it is still current for fi.
+func (c *fileCache) get(key cacheKey, fi os.FileInfo) *cacheEntry {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	el := c.entries[key]
+	if el == nil {
+		return nil
+	}
+	e := el.Value.(*cacheEntry)
+	if e.size != fi.Size() || e.mtime != fi.ModTime().UnixNano() {
+		c.remove(el)
+		return nil
+	}
+	c.lru.MoveToFront(el)
+	return e
+}
+
+// put adds e, read from a file or directory described by fi, and evicts
+// the least recently used entries until the cache fits in maxBytes.
+func (c *fileCache) put(e *cacheEntry, fi os.FileInfo) {
+	if fi.ModTime().After(time.Now().Add(-racyWindow)) {
+		return
+	}
+	e.size = fi.Size()
+	e.mtime = fi.ModTime().UnixNano()
+	e.cost += cacheEntryOverhead
+	if e.cost > c.maxBytes {
+		return
+	}
+
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if el := c.entries[e.key]; el != nil {
+		c.remove(el)
+	}
+	c.entries[e.key] = c.lru.PushFront(e)
+	c.used += e.cost
+	for c.used > c.maxBytes {
+		c.remove(c.lru.Back())
+	}
+}
+
+func (c *fileCache) remove(el *list.Element) {
+	e := c.lru.Remove(el).(*cacheEntry)
+	delete(c.entries, e.key)
+	c.used -= e.cost
+}
@@ -0,0 +1,136 @@
+package main
+
+import (
+	"bytes"
+	"io"
+)
+
+var contextSeparator = []byte("--\n")
+
+// withContext reports whether context lines, or at least the separators
+// between groups of lines, are printed around matches. Only full line
+// output has context; counts, file names and binary "matches" messages do
+// not.
+func (s *searcher) withContext() bool {
+	return (s.opts.context || s.opts.before > 0 || s.opts.after > 0) &&
+		s.opts.outputMode == outputLines && !s.binary
+}
+
+// searchContext is searchLines for when context lines are requested.
+//
+// Matches are still found by running the matcher across the buffer. Only
+// around a match are lines looked at individually: the before-context is
+// found by scanning back over at most s.opts.before newlines, and the
+// after-context is printed line by line until s.opts.after lines without
+// a match have gone by, after which the search jumps ahead again. Lines
+// are tracked by their offsets in the buffer, so nothing is copied or
+// allocated per line.
+//
+// As in grep, the after-context of the last match allowed by -m is still
+// printed before the search stops.
+func (s *searcher) searchContext(chunk []byte, from int, w io.Writer) error {
+	pos, err := s.printAfter(chunk, from, w)
+	for err == nil && pos < len(chunk) {
+		if s.limitReached() {
+			err = errStopSearch
+			break
+		}
+		i := s.matcher.find(chunk[pos:])
+		if i < 0 {
+			return nil
+		}
+		i += pos
+		start := bytes.LastIndexByte(chunk[:i], '\n') + 1
+		end := lineEnd(chunk, i)
+
+		if err = s.printBefore(chunk, start, w); err != nil {
+			break
+		}
+		if err = s.emit(w, chunk[start:end]); err != nil && !s.limitReached() {
+			pos = end
+			break
+		}
+		s.printedTo = s.base + int64(end)
+		s.afterLeft = s.opts.after
+		pos, err = s.printAfter(chunk, end, w)
+	}
+	if err == nil && s.limitReached() && s.afterLeft == 0 {
+		err = errStopSearch
+	}
+	if err != nil {
+		s.stoppedAt = pos
+	}
+	return err
+}
+
+// beforeContextStart returns the offset in chunk of the first of the
+// before-context lines preceding the line at start. It stops at the
+// beginning of chunk and at lines that have already been printed.
+func (s *searcher) beforeContextStart(chunk []byte, start int) int {
+	lo := 0
+	if s.printedTo > s.base {
+		lo = int(s.printedTo - s.base)
+	}
+	for i := 0; i < s.opts.before && start > lo; i++ {
+		start = bytes.LastIndexByte(chunk[:start-1], '\n') + 1
+	}
+	return start
+}
+
+// printBefore prints the before-context of the matching line at start,
+// preceded by a separator if it does not continue the previous group.
+func (s *searcher) printBefore(chunk []byte, start int, w io.Writer) error {
+	b := s.beforeContextStart(chunk, start)
+	if s.printedTo >= 0 && s.base+int64(b) > s.printedTo {
+		if _, err := w.Write(contextSeparator); err != nil {
+			return err
+		}
+	}
+	for b < start {
+		end := lineEnd(chunk, b)
+		if err := s.writeLine(w, s.contextPrefix, chunk[b:end]); err != nil {
+			return err
+		}
+		b = end
+	}
+	return nil
+}
+
+// limitReached reports whether the -m limit has been reached.
+func (s *searcher) limitReached() bool {
+	return s.matches == s.opts.maxCount
+}
+
+// printAfter prints pending after-context lines from pos and returns the
+// offset just past the last one. A line in the after-context that itself
+// matches is reported as a match and restarts the count, unless the -m
+// limit has already been reached.
+func (s *searcher) printAfter(chunk []byte, pos int, w io.Writer) (int, error) {
+	for s.afterLeft > 0 && pos < len(chunk) {
+		end := lineEnd(chunk, pos)
+		line := chunk[pos:end]
+		if !s.limitReached() && s.matcher.find(line) >= 0 {
+			if err := s.emit(w, line); err != nil && !s.limitReached() {
+				return end, err
+			}
+			s.afterLeft = s.opts.after
+		} else {
+			if err := s.writeLine(w, s.contextPrefix, line); err != nil {
+				return pos, err
+			}
+			s.afterLeft--
+		}
+		s.printedTo = s.base + int64(end)
+		pos = end
+	}
+	return pos, nil
+}
+
+// lineEnd returns the offset just past the end of the line containing
+// offset i in chunk.
+func lineEnd(chunk []byte, i int) int {
+	if j := bytes.IndexByte(chunk[i:], '\n'); j >= 0 {
+		return i + j + 1
+	}
+	return len(chunk)
+}
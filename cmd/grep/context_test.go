@@ -0,0 +1,189 @@
+package main
+
+import (
+	"bytes"
+	"io"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+	"testing/iotest"
+)
+
+// contextInput has matches for "x" at the start, next to each other and
+// at the end, with and without room for context between them.
+const contextInput = "a\nx\nb\nc\nd\nx\nx\ne\nf\ng\nx\n"
+
+// contextGolden is the output of GNU grep -H for contextInput, a file
+// named f. "|" stands for a newline.
+var contextGolden = []struct {
+	name string
+	opts searchOptions
+	want string
+}{
+	{"-C 1", searchOptions{before: 1, after: 1},
+		"f-a|f:x|f-b|--|f-d|f:x|f:x|f-e|--|f-g|f:x|"},
+	// The second of two adjacent matches is in the after-context of the
+	// first: it is printed as a match and restarts the count.
+	{"-A 1", searchOptions{after: 1},
+		"f:x|f-b|--|f:x|f:x|f-e|--|f:x|"},
+	{"-B 2", searchOptions{before: 2},
+		"f-a|f:x|--|f-c|f-d|f:x|f:x|--|f-f|f-g|f:x|"},
+	// Groups that touch are merged, without a separator.
+	{"-B 3", searchOptions{before: 3},
+		"f-a|f:x|f-b|f-c|f-d|f:x|f:x|f-e|f-f|f-g|f:x|"},
+	// The after-context of the last match allowed by -m is printed, with
+	// a matching line in it printed as context.
+	{"-m 2 -A 2", searchOptions{maxCount: 2, after: 2},
+		"f:x|f-b|f-c|--|f:x|f-x|f-e|"},
+	{"-m 1 -C 1", searchOptions{maxCount: 1, before: 1, after: 1},
+		"f-a|f:x|f-b|"},
+	{"-C 0", searchOptions{context: true},
+		"f:x|--|f:x|f:x|--|f:x|"},
+	{"-A 0 -B 1", searchOptions{context: true, before: 1},
+		"f-a|f:x|--|f-d|f:x|f:x|--|f-g|f:x|"},
+}
+
+// contextReaders are the ways the tests feed a file to the searcher. One
+// byte at a time, every line is split across reads and its before-context
+// must be carried over from the previous buffer.
+var contextReaders = []struct {
+	name   string
+	mapped bool
+	reader func(io.Reader) io.Reader
+}{
+	{name: "mmap", mapped: true},
+	{name: "read", reader: func(r io.Reader) io.Reader { return r }},
+	{name: "half", reader: iotest.HalfReader},
+	{name: "byte", reader: iotest.OneByteReader},
+}
+
+// searchContextOutput searches haystack for pattern as a file named name,
+// either in memory or through reader, and returns the output.
+func searchContextOutput(t *testing.T, name, pattern string, opts searchOptions, haystack []byte, mapped bool, reader func(io.Reader) io.Reader) string {
+	t.Helper()
+	opts.withFilename = true
+	s := newTestSearcher(t, []string{pattern}, false, opts)
+	s.reset(name, false)
+	var out bytes.Buffer
+	var err error
+	if mapped {
+		err = s.searchData(haystack, &out)
+	} else {
+		err = s.search(reader(bytes.NewReader(haystack)), &out)
+	}
+	if err != nil && err != errStopSearch {
+		t.Fatal(err)
+	}
+	return out.String()
+}
+
+func TestContextGolden(t *testing.T) {
+	for _, c := range contextGolden {
+		want := strings.ReplaceAll(c.want, "|", "\n")
+		for _, rd := range contextReaders {
+			got := searchContextOutput(t, "f", "x", c.opts, []byte(contextInput), rd.mapped, rd.reader)
+			if got != want {
+				t.Errorf("%s (%s):\ngot  %q\nwant %q", c.name, rd.name, got, want)
+			}
+		}
+	}
+}
+
+// contextLines is a plain implementation of grep's context output for
+// haystack, which must end in a newline: every line within before lines
+// ahead of or after lines behind one of the first maxCount matching lines
+// is printed, and groups that do not touch are separated by "--".
+func contextLines(name string, haystack []byte, pattern string, before, after, maxCount int) string {
+	lines := bytes.SplitAfter(haystack, newline)
+	lines = lines[:len(lines)-1] // the empty string after the last newline
+	show := make([]bool, len(lines))
+	match := make([]bool, len(lines))
+	matches := 0
+	for i, line := range lines {
+		if maxCount >= 0 && matches == maxCount {
+			break
+		}
+		if !bytes.Contains(line, []byte(pattern)) {
+			continue
+		}
+		matches++
+		match[i] = true
+		for j := max(0, i-before); j <= min(len(lines)-1, i+after); j++ {
+			show[j] = true
+		}
+	}
+
+	var b strings.Builder
+	printed := false
+	for i, line := range lines {
+		if !show[i] {
+			continue
+		}
+		if printed && !show[i-1] {
+			b.WriteString("--\n")
+		}
+		b.WriteString(name)
+		if match[i] {
+			b.WriteByte(':')
+		} else {
+			b.WriteByte('-')
+		}
+		b.Write(line)
+		printed = true
+	}
+	return b.String()
+}
+
+// TestContextLines checks context output on a larger file, with matches
+// both frequent and far apart, against contextLines.
+func TestContextLines(t *testing.T) {
+	haystack := benchHaystack()[:64<<10]
+	haystack = haystack[:bytes.LastIndexByte(haystack, '\n')+1]
+	for _, pattern := range []string{"TODO", "FATAL", "req-0"} {
+		for _, c := range []struct{ before, after, maxCount int }{
+			{0, 0, -1}, {2, 0, -1}, {0, 3, -1}, {2, 2, -1}, {10, 1, -1},
+			{1, 1, 5}, {0, 4, 1}, {3, 0, 20},
+		} {
+			opts := searchOptions{context: true, before: c.before, after: c.after, maxCount: c.maxCount}
+			want := contextLines("access.log", haystack, pattern, c.before, c.after, c.maxCount)
+			for _, rd := range contextReaders {
+				got := searchContextOutput(t, "access.log", pattern, opts, haystack, rd.mapped, rd.reader)
+				if got != want {
+					t.Errorf("%s -B %d -A %d -m %d (%s): got %d bytes of output, want %d",
+						pattern, c.before, c.after, c.maxCount, rd.name, len(got), len(want))
+				}
+			}
+		}
+	}
+}
+
+// TestContextFiles checks that, as in grep, the groups of different files
+// are separated by "--" too, and that binary files do not start a group.
+func TestContextFiles(t *testing.T) {
+	dir := t.TempDir()
+	files := map[string]string{"a": contextInput, "b": "x\x00\n", "c": "x\ny\n"}
+	for name, content := range files {
+		if err := os.WriteFile(filepath.Join(dir, name), []byte(content), 0o644); err != nil {
+			t.Fatal(err)
+		}
+	}
+	a, b, c := filepath.Join(dir, "a"), filepath.Join(dir, "b"), filepath.Join(dir, "c")
+	for _, tc := range []struct {
+		args []string
+		want string
+	}{
+		{[]string{"-C", "0", "x", a, c},
+			a + ":x|--|" + a + ":x|" + a + ":x|--|" + a + ":x|--|" + c + ":x|"},
+		{[]string{"-A", "1", "-m", "1", "x", a, b, c},
+			a + ":x|" + a + "-b|Binary file " + b + " matches|--|" + c + ":x|" + c + "-y|"},
+		{[]string{"-c", "-C", "1", "x", a, c},
+			a + ":4|" + c + ":1|"},
+	} {
+		var stdout, stderr bytes.Buffer
+		run(append([]string{"-sort"}, tc.args...), &stdout, &stderr, nil)
+		if want := strings.ReplaceAll(tc.want, "|", "\n"); stdout.String() != want {
+			t.Errorf("%q:\ngot  %q\nwant %q", tc.args, stdout.String(), want)
+		}
+	}
+}
@@ -0,0 +1,51 @@
+//go:build darwin || freebsd || dragonfly
+
+package main
+
+import (
+	"net"
+	"syscall"
+	"unsafe"
+)
+
+// Socket option, at level SOL_LOCAL, that reads the credentials of the
+// peer of a Unix socket into a struct xucred.
+const (
+	solLocal       = 0
+	localPeerCred  = 1
+	xucredVersion  = 0
+	xucredMaxBytes = 128
+)
+
+// xucred is the start of struct xucred. The kernel copies out no more than
+// the buffer holds, and the fields after cr_uid differ between systems.
+type xucred struct {
+	version uint32
+	uid     uint32
+	_       [xucredMaxBytes - 8]byte
+}
+
+// peerUID returns the user id of the process at the other end of conn.
+func peerUID(conn *net.UnixConn) (int, error) {
+	raw, err := conn.SyscallConn()
+	if err != nil {
+		return 0, err
+	}
+	var cred xucred
+	n := uint32(unsafe.Sizeof(cred))
+	var errno syscall.Errno
+	err = raw.Control(func(fd uintptr) {
+		_, _, errno = syscall.Syscall6(syscall.SYS_GETSOCKOPT, fd, solLocal, localPeerCred,
+			uintptr(unsafe.Pointer(&cred)), uintptr(unsafe.Pointer(&n)), 0)
+	})
+	if err != nil {
+		return 0, err
+	}
+	if errno != 0 {
+		return 0, errno
+	}
+	if cred.version != xucredVersion {
+		return 0, syscall.EINVAL
+	}
+	return int(cred.uid), nil
+}
@@ -0,0 +1,13 @@
+//go:build !(linux || darwin || freebsd || dragonfly)
+
+package main
+
+import (
+	"errors"
+	"net"
+)
+
+// peerUID cannot tell who is at the other end of conn on this platform.
+func peerUID(conn *net.UnixConn) (int, error) {
+	return 0, errors.ErrUnsupported
+}
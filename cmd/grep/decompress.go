@@ -0,0 +1,160 @@
+package main
+
+import (
+	"bytes"
+	"compress/bzip2"
+	"compress/gzip"
+	"fmt"
+	"io"
+	"os"
+	"os/exec"
+)
+
+// compression is a compressed file format recognized by -z.
+type compression struct {
+	// magic is the sequence of bytes every file in the format starts
+	// with.
+	magic []byte
+
+	// newReader decompresses the format in process. It is nil for formats
+	// the standard library cannot read, which are decompressed by running
+	// command instead.
+	newReader func(io.Reader) (io.Reader, error)
+	command   []string
+}
+
+var compressions = []compression{
+	{
+		magic:     []byte{0x1f, 0x8b},
+		newReader: func(r io.Reader) (io.Reader, error) { return gzip.NewReader(r) },
+	},
+	{
+		magic:     []byte("BZh"),
+		newReader: func(r io.Reader) (io.Reader, error) { return bzip2.NewReader(r), nil },
+	},
+	{
+		magic:   []byte{0x28, 0xb5, 0x2f, 0xfd},
+		command: []string{"zstd", "-dcq"},
+	},
+	{
+		magic:   []byte{0xfd, '7', 'z', 'X', 'Z', 0x00},
+		command: []string{"xz", "-dcq"},
+	},
+}
+
+// magicSize is the number of bytes read to recognize a compressed file.
+const magicSize = 6
+
+// openDecompressed returns a reader over the decompressed contents of f if
+// f starts with the magic bytes of a format in compressions. The caller
+// must close it. regular says whether f is a regular file.
+//
+// If f is not compressed, openDecompressed returns nil and f can be read
+// as usual, unless f is not a regular file: the bytes sniffed from a pipe
+// cannot be put back, so it is returned wrapped in a reader that replays
+// them.
+//
+// Decompression runs concurrently with the search, either on its own
+// goroutine or in an external process, so that one block is being
+// decompressed while the previous one is searched.
+func openDecompressed(f *os.File, regular bool) (io.ReadCloser, error) {
+	var magic [magicSize]byte
+	var n int
+	var err error
+	if regular {
+		n, err = f.ReadAt(magic[:], 0)
+	} else {
+		n, err = io.ReadFull(f, magic[:])
+	}
+	if err != nil && err != io.EOF && err != io.ErrUnexpectedEOF {
+		return nil, err
+	}
+	var src io.Reader = f
+	if !regular {
+		src = io.MultiReader(bytes.NewReader(magic[:n]), f)
+	}
+
+	for _, c := range compressions {
+		if !bytes.HasPrefix(magic[:n], c.magic) {
+			continue
+		}
+		if c.newReader == nil {
+			return startDecompressor(c.command, f.Name(), src)
+		}
+		dr, err := c.newReader(src)
+		if err != nil {
+			return nil, err
+		}
+		return pipeline(f.Name(), dr), nil
+	}
+	if regular {
+		return nil, nil
+	}
+	return io.NopCloser(src), nil
+}
+
+// pipeline copies r to the returned reader from a new goroutine, in blocks
+// the size of the read buffer. Closing the reader stops the goroutine.
+// Errors are reported as errors reading the file called name.
+func pipeline(name string, r io.Reader) io.ReadCloser {
+	pr, pw := io.Pipe()
+	go func() {
+		buf := make([]byte, readBufferSize)
+		_, err := io.CopyBuffer(pw, r, buf)
+		if err != nil {
+			err = fmt.Errorf("%s: %w", name, err)
+		}
+		pw.CloseWithError(err)
+	}()
+	return pr
+}
+
+// commandReader reads the standard output of a decompression command.
+type commandReader struct {
+	name   string
+	cmd    *exec.Cmd
+	stdout io.ReadCloser
+	done   bool
+}
+
+// startDecompressor runs command with src, the contents of the file called
+// name, as its standard input.
+func startDecompressor(command []string, name string, src io.Reader) (io.ReadCloser, error) {
+	cmd := exec.Command(command[0], command[1:]...)
+	cmd.Stdin = src
+	cmd.Stderr = os.Stderr
+	stdout, err := cmd.StdoutPipe()
+	if err != nil {
+		return nil, err
+	}
+	if err := cmd.Start(); err != nil {
+		return nil, fmt.Errorf("%s: %w", name, err)
+	}
+	return &commandReader{name: name, cmd: cmd, stdout: stdout}, nil
+}
+
+// Read reads decompressed data. At the end of the output it waits for the
+// command and reports its failure, so a corrupt file is an error rather
+// than a short read.
+func (r *commandReader) Read(p []byte) (int, error) {
+	n, err := r.stdout.Read(p)
+	if err == io.EOF && !r.done {
+		r.done = true
+		if werr := r.cmd.Wait(); werr != nil {
+			return n, fmt.Errorf("%s: %s: %v", r.name, r.cmd.Args[0], werr)
+		}
+	}
+	return n, err
+}
+
+// Close stops the command if the search ended before its output did.
+func (r *commandReader) Close() error {
+	if r.done {
+		return nil
+	}
+	r.done = true
+	r.stdout.Close()
+	r.cmd.Process.Kill()
+	r.cmd.Wait()
+	return nil
+}
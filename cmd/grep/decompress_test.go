@@ -0,0 +1,139 @@
+package main
+
+import (
+	"bytes"
+	"compress/gzip"
+	"io"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+)
+
+// decompressText is the content of the compressed test files.
+const decompressText = "alpha\nbeta\nalpha beta\n"
+
+// bzip2Text is decompressText compressed by bzip2 -9. The standard
+// library has no bzip2 writer.
+const bzip2Text = "\x42\x5a\x68\x39\x31\x41\x59\x26\x53\x59\x9a\x0b\x2c\x48\x00\x00" +
+	"\x04\x51\x80\x00\x10\x40\x00\x32\x44\x44\x00\x20\x00\x20\xaa\x9a" +
+	"\x68\xd3\xd4\x20\xc9\x88\xd9\x18\xb7\x2b\xa8\xc4\x47\xc5\xdc\x91" +
+	"\x4e\x14\x24\x26\x82\xcb\x12\x00"
+
+func gzipData(t *testing.T, data []byte) []byte {
+	t.Helper()
+	var buf bytes.Buffer
+	zw := gzip.NewWriter(&buf)
+	if _, err := zw.Write(data); err != nil {
+		t.Fatal(err)
+	}
+	if err := zw.Close(); err != nil {
+		t.Fatal(err)
+	}
+	return buf.Bytes()
+}
+
+// TestDecompress checks that -z searches the contents of gzip and bzip2
+// files, and leaves other files and searches without -z alone.
+func TestDecompress(t *testing.T) {
+	checkRunTests(t, map[string]string{
+		"a.gz":     string(gzipData(t, []byte(decompressText))),
+		"a.bz2":    bzip2Text,
+		"a.txt":    decompressText,
+		"empty.gz": string(gzipData(t, nil)),
+	}, []runTest{
+		{[]string{"-z", "alpha", "./a.gz"}, "alpha|alpha beta|", exitMatch},
+		{[]string{"-z", "alpha", "./a.bz2"}, "alpha|alpha beta|", exitMatch},
+		{[]string{"-z", "-c", "beta", "./a.gz", "./a.bz2", "./a.txt"}, "./a.gz:2|./a.bz2:2|./a.txt:2|", exitMatch},
+		{[]string{"-z", "-m", "1", "beta", "./a.bz2"}, "beta|", exitMatch},
+		{[]string{"-z", "-c", "alpha", "./empty.gz"}, "0|", exitNoMatch},
+		{[]string{"-z", "-r", "-l", "alpha", "./"}, "./a.bz2|./a.gz|./a.txt|", exitMatch},
+		// Without -z the compressed bytes are searched.
+		{[]string{"alpha", "./a.gz", "./a.bz2"}, "", exitNoMatch},
+	})
+}
+
+// TestDecompressLarge checks a file that decompresses to many read
+// buffers against the same search of the uncompressed file.
+func TestDecompressLarge(t *testing.T) {
+	dir := t.TempDir()
+	data := benchHaystack()[:2<<20]
+	plain, compressed := filepath.Join(dir, "access.log"), filepath.Join(dir, "access.log.gz")
+	if err := os.WriteFile(plain, data, 0o644); err != nil {
+		t.Fatal(err)
+	}
+	if err := os.WriteFile(compressed, gzipData(t, data), 0o644); err != nil {
+		t.Fatal(err)
+	}
+	for _, args := range [][]string{{"-c", "TODO"}, {"FATAL"}, {"-A", "1", "-m", "50", "Retry"}} {
+		var want, got bytes.Buffer
+		run(append(args, plain), &want, io.Discard, nil)
+		status := run(append(append([]string{"-z"}, args...), compressed), &got, io.Discard, nil)
+		if status != exitMatch || !bytes.Equal(got.Bytes(), want.Bytes()) {
+			t.Errorf("%q: exit status %d, %d bytes of output; want %d bytes", args, status, got.Len(), want.Len())
+		}
+	}
+}
+
+// TestDecompressPipe checks that a compressed stream is recognized on a
+// pipe, and that the bytes sniffed from an uncompressed one are replayed.
+func TestDecompressPipe(t *testing.T) {
+	for name, input := range map[string][]byte{
+		"gzip":  gzipData(t, []byte(decompressText)),
+		"bzip2": []byte(bzip2Text),
+		"plain": []byte(decompressText),
+		"short": []byte("abc"),
+	} {
+		r, w, err := os.Pipe()
+		if err != nil {
+			t.Fatal(err)
+		}
+		go func() {
+			w.Write(input)
+			w.Close()
+		}()
+		dr, err := openDecompressed(r, false)
+		if err != nil {
+			t.Fatal(err)
+		}
+		got, err := io.ReadAll(dr)
+		dr.Close()
+		r.Close()
+		want := decompressText
+		if name == "short" {
+			want = "abc"
+		}
+		if err != nil || string(got) != want {
+			t.Errorf("%s: read %q, %v; want %q", name, got, err, want)
+		}
+	}
+}
+
+// TestDecompressCorrupt checks that a damaged compressed file is reported
+// as an error, with exit status 2, rather than searched as a short file.
+func TestDecompressCorrupt(t *testing.T) {
+	data := gzipData(t, benchHaystack()[:256<<10])
+	damaged := append([]byte(nil), data...)
+	for i := len(damaged) / 2; i < len(damaged)/2+64; i++ {
+		damaged[i] ^= 0xff
+	}
+	badBzip2 := []byte(bzip2Text)
+	badBzip2[40] ^= 0xff
+
+	dir := t.TempDir()
+	for name, content := range map[string][]byte{
+		"damaged.gz":   damaged,
+		"truncated.gz": data[:len(data)/2],
+		"damaged.bz2":  badBzip2,
+	} {
+		path := filepath.Join(dir, name)
+		if err := os.WriteFile(path, content, 0o644); err != nil {
+			t.Fatal(err)
+		}
+		var stderr bytes.Buffer
+		status := run([]string{"-z", "-c", "TODO", path}, io.Discard, &stderr, nil)
+		if status != exitError || !strings.Contains(stderr.String(), "Error reading file") {
+			t.Errorf("%s: exit status %d, stderr %q; want %d and an error", name, status, stderr.String(), exitError)
+		}
+	}
+}
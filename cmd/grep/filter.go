@@ -0,0 +1,107 @@
+package main
+
+import (
+	"fmt"
+	"sort"
+	"strings"
+)
+
+// fileTypes maps the names accepted by -t to the globs of the file names
+// of that type.
+var fileTypes = map[string][]string{
+	"c":        {"*.c", "*.h"},
+	"cpp":      {"*.cc", "*.cpp", "*.cxx", "*.hh", "*.hpp", "*.hxx", "*.h"},
+	"css":      {"*.css", "*.scss", "*.sass", "*.less"},
+	"go":       {"*.go"},
+	"html":     {"*.html", "*.htm"},
+	"java":     {"*.java"},
+	"js":       {"*.js", "*.jsx", "*.mjs", "*.cjs"},
+	"json":     {"*.json"},
+	"make":     {"Makefile", "makefile", "GNUmakefile", "*.mk", "*.mak"},
+	"markdown": {"*.md", "*.markdown"},
+	"py":       {"*.py", "*.pyi"},
+	"rust":     {"*.rs"},
+	"sh":       {"*.sh", "*.bash", "*.zsh"},
+	"ts":       {"*.ts", "*.tsx", "*.mts", "*.cts"},
+	"yaml":     {"*.yaml", "*.yml"},
+}
+
+// fileTypeNames returns the names of fileTypes in order, for usage text.
+func fileTypeNames() string {
+	names := make([]string, 0, len(fileTypes))
+	for name := range fileTypes {
+		names = append(names, name)
+	}
+	sort.Strings(names)
+	return strings.Join(names, ", ")
+}
+
+// nameFilter selects the files a recursive search reads by their names
+// alone, as given by -include, -exclude and -t, so the walker can decide
+// from a directory entry without a stat or an open. The include globs and
+// the globs of every selected type are compiled together into one ruleSet,
+// as are the exclude globs, so each name is matched once against each set
+// rather than glob by glob.
+type nameFilter struct {
+	include *ruleSet // nil if every name is included
+	exclude *ruleSet // nil if no name is excluded
+}
+
+// newNameFilter returns the filter for the given globs and type names, or
+// nil if there are none.
+func newNameFilter(include, exclude, types []string) (*nameFilter, error) {
+	for _, name := range types {
+		globs, ok := fileTypes[name]
+		if !ok {
+			return nil, fmt.Errorf("unknown file type %q (known types: %s)", name, fileTypeNames())
+		}
+		include = append(include[:len(include):len(include)], globs...)
+	}
+	if len(include) == 0 && len(exclude) == 0 {
+		return nil, nil
+	}
+	var f nameFilter
+	var err error
+	if f.include, err = compileNameGlobs(include); err != nil {
+		return nil, err
+	}
+	if f.exclude, err = compileNameGlobs(exclude); err != nil {
+		return nil, err
+	}
+	return &f, nil
+}
+
+// compileNameGlobs compiles globs matched against a file's name, or
+// returns nil if there are none.
+func compileNameGlobs(globs []string) (*ruleSet, error) {
+	if len(globs) == 0 {
+		return nil, nil
+	}
+	rules := make([]ignoreRule, len(globs))
+	for i, glob := range globs {
+		if err := checkGlob(glob); err != nil {
+			return nil, fmt.Errorf("%v %q", err, glob)
+		}
+		rules[i] = ignoreRule{glob: glob}
+	}
+	return compileRules(rules), nil
+}
+
+// match reports whether a file named name should be searched. A nil
+// filter matches every name.
+func (f *nameFilter) match(name string) bool {
+	if f == nil {
+		return true
+	}
+	if f.include != nil {
+		if _, ok := f.include.match(name, name); !ok {
+			return false
+		}
+	}
+	if f.exclude != nil {
+		if _, ok := f.exclude.match(name, name); ok {
+			return false
+		}
+	}
+	return true
+}
@@ -0,0 +1,128 @@
+package main
+
+import (
+	"bytes"
+	"io"
+	"strings"
+	"testing"
+)
+
+func TestNameFilter(t *testing.T) {
+	for _, c := range []struct {
+		include, exclude, types []string
+		match, skip             []string
+	}{
+		{
+			include: []string{"*.go"},
+			match:   []string{"a.go", "x.test.go", ".go"},
+			skip:    []string{"a.txt", "a.go.orig", "Makefile"},
+		},
+		{
+			include: []string{"*.go", "*.txt"},
+			match:   []string{"a.go", "a.txt"},
+			skip:    []string{"a.md"},
+		},
+		// An exclude glob wins over an include glob, whichever is given
+		// first.
+		{
+			include: []string{"*.go"},
+			exclude: []string{"*.test.go"},
+			match:   []string{"a.go"},
+			skip:    []string{"x.test.go", "a.txt"},
+		},
+		{
+			include: []string{"*.go"},
+			exclude: []string{"*.go"},
+			skip:    []string{"a.go", "a.txt"},
+		},
+		{
+			exclude: []string{"*.min.js", "[Mm]akefile"},
+			match:   []string{"a.js", "a.go", "GNUmakefile"},
+			skip:    []string{"a.min.js", "Makefile", "makefile"},
+		},
+		// The globs of a type are added to the include globs.
+		{
+			types: []string{"make"},
+			match: []string{"Makefile", "GNUmakefile", "rules.mk"},
+			skip:  []string{"Makefile.in", "a.go"},
+		},
+		{
+			include: []string{"*.txt"},
+			types:   []string{"go", "c"},
+			exclude: []string{"*_test.go"},
+			match:   []string{"a.txt", "a.go", "a.h"},
+			skip:    []string{"a_test.go", "a.cc"},
+		},
+	} {
+		f, err := newNameFilter(c.include, c.exclude, c.types)
+		if err != nil || f == nil {
+			t.Fatalf("newNameFilter(%q, %q, %q) = %v, %v", c.include, c.exclude, c.types, f, err)
+		}
+		for _, name := range c.match {
+			if !f.match(name) {
+				t.Errorf("include %q, exclude %q, types %q: %q is skipped", c.include, c.exclude, c.types, name)
+			}
+		}
+		for _, name := range c.skip {
+			if f.match(name) {
+				t.Errorf("include %q, exclude %q, types %q: %q is searched", c.include, c.exclude, c.types, name)
+			}
+		}
+	}
+
+	f, err := newNameFilter(nil, nil, nil)
+	if f != nil || err != nil || !f.match("a.go") {
+		t.Errorf("newNameFilter with no globs = %v, %v; want a nil filter that matches everything", f, err)
+	}
+	// A type's globs are not added to the caller's include slice.
+	include := make([]string, 1, 4)
+	include[0] = "*.txt"
+	if _, err := newNameFilter(include, nil, []string{"go"}); err != nil || include[:2][1] != "" {
+		t.Errorf("newNameFilter changed the include globs to %q, %v", include[:2], err)
+	}
+	for _, c := range []struct {
+		include, types []string
+		err            string
+	}{
+		{types: []string{"go", "bogus"}, err: `unknown file type "bogus"`},
+		{types: []string{"Go"}, err: `unknown file type "Go"`},
+		{include: []string{"[z-a].go"}, err: `invalid glob "[z-a].go"`},
+	} {
+		if f, err := newNameFilter(c.include, nil, c.types); f != nil || err == nil || !strings.Contains(err.Error(), c.err) {
+			t.Errorf("newNameFilter(%q, nil, %q) = %v, %v; want an error containing %s", c.include, c.types, f, err, c.err)
+		}
+	}
+}
+
+// TestNameFilterSearch checks -include, -exclude and -t in a recursive
+// search against GNU grep 3.8's --include and --exclude, except that GNU
+// lets the last of the two options that matches a name decide. Globs are
+// matched against the base name of each file, never its path, so a glob
+// with a slash matches no file and a directory name excludes nothing.
+func TestNameFilterSearch(t *testing.T) {
+	checkRunTests(t, map[string]string{
+		"a.go":         "needle\n",
+		"b.txt":        "needle\n",
+		"x.test.go":    "needle\n",
+		"Makefile":     "needle\n",
+		"sub/c.go":     "needle\n",
+		"sub/d.txt":    "needle\n",
+		"sub/deep/e.c": "needle\n",
+	}, []runTest{
+		{[]string{"-r", "-l", "-include", "*.go", "needle", "./"}, "./a.go|./sub/c.go|./x.test.go|", exitMatch},
+		{[]string{"-r", "-l", "-include", "*.go", "-exclude", "*.test.go", "needle", "./"}, "./a.go|./sub/c.go|", exitMatch},
+		{[]string{"-r", "-l", "-exclude", "*.go", "-include", "*.go", "needle", "./"}, "", exitNoMatch},
+		{[]string{"-r", "-l", "-include", "c.go", "needle", "./"}, "./sub/c.go|", exitMatch},
+		{[]string{"-r", "-l", "-include", "sub/*.go", "needle", "./"}, "", exitNoMatch},
+		{[]string{"-r", "-l", "-include", "*/c.go", "needle", "./"}, "", exitNoMatch},
+		{[]string{"-r", "-l", "-exclude", "sub", "-include", "*.go", "needle", "./"}, "./a.go|./sub/c.go|./x.test.go|", exitMatch},
+		{[]string{"-r", "-l", "-t", "make", "-t", "c", "needle", "./"}, "./Makefile|./sub/deep/e.c|", exitMatch},
+		{[]string{"-r", "-c", "-t", "go", "-exclude", "c.go", "needle", "./"}, "./a.go:1|./x.test.go:1|", exitMatch},
+	})
+
+	var stderr bytes.Buffer
+	status := run([]string{"-r", "-t", "bogus", "needle", t.TempDir()}, io.Discard, &stderr, nil)
+	if status != exitError || !strings.Contains(stderr.String(), `Error in file filter: unknown file type "bogus"`) {
+		t.Errorf("-t bogus: exit status %d, stderr %q; want %d and an error", status, stderr.String(), exitError)
+	}
+}
@@ -0,0 +1,348 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"io"
+	"os"
+	"path/filepath"
+	"regexp"
+	"strings"
+)
+
+// skippedDirs are directories the walker never enters unless -no-ignore
+// is given: version control metadata, vendored dependencies and common
+// build output directories.
+var skippedDirs = map[string]bool{
+	".git":         true,
+	".hg":          true,
+	".svn":         true,
+	"vendor":       true,
+	"node_modules": true,
+	"build":        true,
+	"dist":         true,
+	"target":       true,
+}
+
+// ignoreFiles are read in every directory, in increasing order of
+// precedence. .git/info/exclude is read, with the lowest precedence, in
+// directories that contain a .git directory.
+var ignoreFiles = []string{".gitignore", ".ignore"}
+
+// ignoreRule is one line of an ignore file.
+type ignoreRule struct {
+	glob     string // with any leading "!" and "/" and trailing "/" removed
+	negate   bool   // the line started with "!": re-include what matches
+	dirOnly  bool   // the line ended with "/": only match directories
+	anchored bool   // the glob contains a "/": match the whole relative path
+}
+
+// ignoreLevel holds the rules of the ignore files of one directory, and
+// links to those of its parent. Rules in a deeper directory take
+// precedence over those above it.
+type ignoreLevel struct {
+	parent *ignoreLevel
+
+	// prefix is the directory's path followed by a separator, to be
+	// stripped from a path below it to get the path relative to it.
+	prefix string
+
+	files, dirs *ruleSet
+}
+
+// ignored reports whether the file or directory at path, named name,
+// is excluded by the rules of l or of its ancestors.
+func (l *ignoreLevel) ignored(path, name string, isDir bool) bool {
+	for ; l != nil; l = l.parent {
+		set := l.files
+		if isDir {
+			set = l.dirs
+		}
+		rel := filepath.ToSlash(strings.TrimPrefix(path, l.prefix))
+		if ignore, ok := set.match(rel, name); ok {
+			return ignore
+		}
+	}
+	return false
+}
+
+// readIgnoreLevel reads the ignore files among the entries of dir and
+// returns the level below parent that holds their rules, or parent if
+// there are none. read reads a file. Malformed patterns are reported to
+// stderr and left out.
+func readIgnoreLevel(parent *ignoreLevel, dir string, entries []os.DirEntry, read func(string) ([]byte, error), stderr io.Writer) *ignoreLevel {
+	hasGit := false
+	has := make([]bool, len(ignoreFiles))
+	found := false
+	for _, e := range entries {
+		if e.Name() == ".git" && e.IsDir() {
+			hasGit, found = true, true
+			continue
+		}
+		for i, name := range ignoreFiles {
+			if e.Name() == name && !e.IsDir() {
+				has[i], found = true, true
+			}
+		}
+	}
+	if !found {
+		return parent
+	}
+
+	var rules []ignoreRule
+	readRules := func(path string) {
+		data, err := read(path)
+		if err != nil {
+			return
+		}
+		parsed, errs := parseIgnore(data)
+		for _, err := range errs {
+			fmt.Fprintf(stderr, "Ignoring pattern in %s: %v\n", path, err)
+		}
+		rules = append(rules, parsed...)
+	}
+	if hasGit {
+		readRules(filepath.Join(dir, ".git", "info", "exclude"))
+	}
+	for i, name := range ignoreFiles {
+		if has[i] {
+			readRules(filepath.Join(dir, name))
+		}
+	}
+	if len(rules) == 0 {
+		return parent
+	}
+
+	prefix := filepath.Clean(dir)
+	switch {
+	case prefix == ".":
+		prefix = ""
+	case !strings.HasSuffix(prefix, string(filepath.Separator)):
+		prefix += string(filepath.Separator)
+	}
+	var fileRules []ignoreRule
+	for _, r := range rules {
+		if !r.dirOnly {
+			fileRules = append(fileRules, r)
+		}
+	}
+	return &ignoreLevel{
+		parent: parent,
+		prefix: prefix,
+		files:  compileRules(fileRules),
+		dirs:   compileRules(rules),
+	}
+}
+
+// parseIgnore parses the lines of an ignore file in gitignore syntax.
+// Lines whose glob cannot be matched, such as "[z-a]", are left out and
+// returned as errors.
+func parseIgnore(data []byte) ([]ignoreRule, []error) {
+	var rules []ignoreRule
+	var errs []error
+	for n, line := range bytes.Split(data, newline) {
+		s := strings.TrimSuffix(string(line), "\r")
+		// Trailing spaces are dropped unless escaped with a backslash.
+		for strings.HasSuffix(s, " ") && !strings.HasSuffix(s, "\\ ") {
+			s = s[:len(s)-1]
+		}
+		if s == "" || s[0] == '#' {
+			continue
+		}
+		var r ignoreRule
+		if s[0] == '!' {
+			r.negate = true
+			s = s[1:]
+		} else if strings.HasPrefix(s, "\\!") || strings.HasPrefix(s, "\\#") {
+			s = s[1:]
+		}
+		if strings.HasSuffix(s, "/") {
+			r.dirOnly = true
+			s = strings.TrimRight(s, "/")
+		}
+		if strings.Contains(s, "/") {
+			r.anchored = true
+			s = strings.TrimPrefix(s, "/")
+		}
+		if s == "" {
+			continue
+		}
+		if err := checkGlob(s); err != nil {
+			errs = append(errs, fmt.Errorf("line %d: %q: %v", n+1, line, err))
+			continue
+		}
+		r.glob = s
+		rules = append(rules, r)
+	}
+	return rules, errs
+}
+
+// ruleMatch is the rule of a set that matched, identified by its position
+// in the ignore files so that the last matching rule wins.
+type ruleMatch struct {
+	index  int
+	negate bool
+}
+
+// ruleSet is the rules of one directory level compiled so that a path is
+// matched against all of them at once, rather than glob by glob:
+//
+//   - Rules that are plain names, such as "node_modules", are looked up in
+//     a map by the entry's name.
+//   - Rules of the form "*.ext" are looked up in a map by each of the
+//     name's suffixes that starts with a dot.
+//   - All other rules are translated to regular expressions and joined
+//     into a single alternation, last rule first, so that the alternative
+//     the regex engine picks is the rule that takes precedence.
+type ruleSet struct {
+	names    map[string]ruleMatch
+	suffixes map[string]ruleMatch
+	re       *regexp.Regexp
+	reRules  []ruleMatch // of each capture group of re
+}
+
+// compileRules compiles rules, whose globs must have passed checkGlob.
+func compileRules(rules []ignoreRule) *ruleSet {
+	set := &ruleSet{
+		names:    make(map[string]ruleMatch),
+		suffixes: make(map[string]ruleMatch),
+	}
+	var exprs []string
+	for i, r := range rules {
+		m := ruleMatch{index: i, negate: r.negate}
+		switch {
+		case !r.anchored && !hasGlobMeta(r.glob):
+			set.names[r.glob] = m
+		case !r.anchored && strings.HasPrefix(r.glob, "*.") && !hasGlobMeta(r.glob[1:]):
+			set.suffixes[r.glob[1:]] = m
+		default:
+			expr := globToRegexp(r.glob)
+			if !r.anchored {
+				expr = "(?:.*/)?" + expr
+			}
+			exprs = append(exprs, "("+expr+")")
+			set.reRules = append(set.reRules, m)
+		}
+	}
+	if len(exprs) > 0 {
+		// Reverse the alternatives so that the last rule comes first.
+		for i, j := 0, len(exprs)-1; i < j; i, j = i+1, j-1 {
+			exprs[i], exprs[j] = exprs[j], exprs[i]
+			set.reRules[i], set.reRules[j] = set.reRules[j], set.reRules[i]
+		}
+		set.re = regexp.MustCompile("^(?:" + strings.Join(exprs, "|") + ")$")
+	}
+	return set
+}
+
+// match reports whether the entry at rel, the path relative to the
+// directory of the rules, named name, is ignored. ok is false if no rule
+// matches.
+func (set *ruleSet) match(rel, name string) (ignore, ok bool) {
+	best := ruleMatch{index: -1}
+	if m, found := set.names[name]; found {
+		best = m
+	}
+	for i := strings.IndexByte(name, '.'); i >= 0; {
+		if m, found := set.suffixes[name[i:]]; found && m.index > best.index {
+			best = m
+		}
+		j := strings.IndexByte(name[i+1:], '.')
+		if j < 0 {
+			break
+		}
+		i += j + 1
+	}
+	if set.re != nil && set.re.MatchString(rel) {
+		groups := set.re.FindStringSubmatchIndex(rel)
+		for g := 1; 2*g < len(groups); g++ {
+			if groups[2*g] >= 0 {
+				if m := set.reRules[g-1]; m.index > best.index {
+					best = m
+				}
+				break
+			}
+		}
+	}
+	if best.index < 0 {
+		return false, false
+	}
+	return !best.negate, true
+}
+
+func hasGlobMeta(s string) bool {
+	return strings.ContainsAny(s, "*?[\\")
+}
+
+// checkGlob returns an error if glob has no regular expression
+// equivalent, as with a character class such as "[z-a]" or "[!]".
+func checkGlob(glob string) error {
+	if !hasGlobMeta(glob) {
+		return nil
+	}
+	if _, err := regexp.Compile(globToRegexp(glob)); err != nil {
+		return fmt.Errorf("invalid glob")
+	}
+	return nil
+}
+
+// globToRegexp translates a gitignore glob to a regular expression that
+// matches the same paths. "*" and "?" do not match "/"; "**" matches any
+// number of directories when it makes up a whole path component.
+func globToRegexp(glob string) string {
+	var b strings.Builder
+	for i := 0; i < len(glob); i++ {
+		c := glob[i]
+		switch {
+		case strings.HasPrefix(glob[i:], "**/") && (i == 0 || glob[i-1] == '/'):
+			b.WriteString("(?:.*/)?")
+			i += 2
+		case glob[i:] == "**" && i > 0 && glob[i-1] == '/':
+			b.WriteString(".*")
+			i++
+		case c == '*':
+			b.WriteString("[^/]*")
+		case c == '?':
+			b.WriteString("[^/]")
+		case c == '\\' && i+1 < len(glob):
+			i++
+			b.WriteString(regexp.QuoteMeta(glob[i : i+1]))
+		case c == '[':
+			end := strings.IndexByte(glob[i+1:], ']')
+			if end == 0 {
+				// "[]...]" starts a class containing "]".
+				if next := strings.IndexByte(glob[i+2:], ']'); next >= 0 {
+					end = next + 1
+				} else {
+					end = -1
+				}
+			}
+			if end < 0 {
+				b.WriteString(`\[`)
+				continue
+			}
+			class := glob[i+1 : i+1+end]
+			i += end + 1
+			b.WriteByte('[')
+			if strings.HasPrefix(class, "!") {
+				b.WriteByte('^')
+				class = class[1:]
+			}
+			b.WriteString(strings.ReplaceAll(class, `\`, `\\`))
+			b.WriteByte(']')
+		default:
+			b.WriteString(regexp.QuoteMeta(string(c)))
+		}
+	}
+	return b.String()
+}
+
+// readIgnoreFile reads an ignore file, through the cache if there is one.
+func readIgnoreFile(cache *fileCache) func(string) ([]byte, error) {
+	return func(path string) ([]byte, error) {
+		if data, ok := cache.readFile(path); ok {
+			return data, nil
+		}
+		return os.ReadFile(path)
+	}
+}
@@ -0,0 +1,237 @@
+package main
+
+import (
+	"bytes"
+	"io"
+	"os"
+	"path/filepath"
+	"sort"
+	"strings"
+	"testing"
+)
+
+// ignoreTestRules exercise every kind of rule. Plain names and "*.ext"
+// rules are looked up in maps, the others are joined into one regex, and
+// the rules for names starting with "a" and ending in "q" check that the
+// last matching rule wins within the regex.
+var ignoreTestRules = strings.Join([]string{
+	`# comment`,
+	`*.log`,
+	`!keep.log`,
+	`build.out`,
+	`**/tmp`,
+	`a/**/b`,
+	`docs/**`,
+	`/root.txt`,
+	`sub/x.txt`,
+	`cache/`,
+	`[abc].c`,
+	`[!a]x.c`,
+	`[]]y`,
+	`\#hash`,
+	`\!bang`,
+	`trailing\ `,
+	`?.md`,
+	`*.tar.gz`,
+	`a*q`,
+	`!ab*q`,
+	`abc*q`,
+	`z[a-c]?`,
+}, "\n")
+
+// ignoreTests are the answers of git check-ignore for ignoreTestRules in
+// the .gitignore at the root of a repository.
+var ignoreTests = []struct {
+	path  string
+	isDir bool
+	want  bool
+}{
+	{"app.log", false, true},
+	{"keep.log", false, false},
+	{"d/app.log", false, true},
+	{"d/keep.log", false, false},
+	{"build.out", false, true},
+	{"d/build.out", false, true},
+	{"tmp", true, true},
+	{"d/tmp", true, true},
+	{"d/e/tmp", false, true},
+	{"a/b", false, true},
+	{"a/x/b", true, true},
+	{"a/x/y/b", false, true},
+	{"x/a/b", false, false},
+	{"docs/readme", false, true},
+	{"docs/x/y", false, true},
+	{"root.txt", false, true},
+	{"d/root.txt", false, false},
+	{"sub/x.txt", false, true},
+	{"d/sub/x.txt", false, false},
+	{"cache", true, true},
+	{"d/cache", true, true},
+	{"e/cache", false, false},
+	{"cachefile", false, false},
+	{"a.c", false, true},
+	{"d.c", false, false},
+	{"ax.c", false, false},
+	{"bx.c", false, true},
+	{"]y", false, true},
+	{"#hash", false, true},
+	{"!bang", false, true},
+	{"trailing ", false, true},
+	{"trailing", false, false},
+	{"r.md", false, true},
+	{"rr.md", false, false},
+	{"x.tar.gz", false, true},
+	{"x.gz", false, false},
+	{"aq", false, true},
+	{"abq", false, false},
+	{"abcq", false, true},
+	{"abdq", false, false},
+	{"zb1", false, true},
+	{"zd1", false, false},
+	{"zb12", false, false},
+}
+
+// readTestIgnoreLevel writes the ignore files in files to dir and returns
+// the level read from them, with what was reported to stderr.
+func readTestIgnoreLevel(t *testing.T, dir string, parent *ignoreLevel, files map[string]string) (*ignoreLevel, string) {
+	t.Helper()
+	for name, content := range files {
+		if err := os.WriteFile(filepath.Join(dir, name), []byte(content), 0o644); err != nil {
+			t.Fatal(err)
+		}
+	}
+	entries, err := os.ReadDir(dir)
+	if err != nil {
+		t.Fatal(err)
+	}
+	var stderr bytes.Buffer
+	return readIgnoreLevel(parent, dir, entries, os.ReadFile, &stderr), stderr.String()
+}
+
+func TestIgnoreRules(t *testing.T) {
+	dir := t.TempDir()
+	l, warnings := readTestIgnoreLevel(t, dir, nil, map[string]string{".gitignore": ignoreTestRules})
+	if warnings != "" {
+		t.Errorf("unexpected warnings: %s", warnings)
+	}
+	for _, c := range ignoreTests {
+		path := filepath.Join(dir, filepath.FromSlash(c.path))
+		if got := l.ignored(path, filepath.Base(path), c.isDir); got != c.want {
+			t.Errorf("%q (dir %v): ignored = %v, want %v", c.path, c.isDir, got, c.want)
+		}
+	}
+}
+
+// TestIgnoreLevels checks the precedence between ignore files and between
+// directories: .ignore over .gitignore over .git/info/exclude, and a
+// subdirectory's rules over its parent's.
+func TestIgnoreLevels(t *testing.T) {
+	root := t.TempDir()
+	sub := filepath.Join(root, "sub")
+	if err := os.MkdirAll(filepath.Join(root, ".git", "info"), 0o755); err != nil {
+		t.Fatal(err)
+	}
+	if err := os.Mkdir(sub, 0o755); err != nil {
+		t.Fatal(err)
+	}
+	if err := os.WriteFile(filepath.Join(root, ".git", "info", "exclude"), []byte("*.tmp\nlocal.txt\n"), 0o644); err != nil {
+		t.Fatal(err)
+	}
+	top, _ := readTestIgnoreLevel(t, root, nil, map[string]string{
+		".gitignore": "*.log\n!local.txt\n/only-top.txt\n",
+		".ignore":    "*.txt\n!keep.txt\n",
+	})
+	below, _ := readTestIgnoreLevel(t, sub, top, map[string]string{
+		".gitignore": "!*.log\n*.go\n",
+	})
+
+	for _, c := range []struct {
+		level *ignoreLevel
+		path  string
+		want  bool
+	}{
+		{top, "x.tmp", true},        // .git/info/exclude
+		{top, "x.log", true},        // .gitignore
+		{top, "local.txt", true},    // .ignore re-excludes what .gitignore re-included
+		{top, "keep.txt", false},    // .ignore negation
+		{top, "main.go", false},     // no rule
+		{below, "sub/x.log", false}, // negated below
+		{below, "sub/x.tmp", true},  // parent rule still applies
+		{below, "sub/main.go", true},
+		{below, "sub/only-top.txt", true}, // "*.txt" from .ignore; "/only-top.txt" is anchored to the top
+		{below, "sub/keep.txt", false},
+	} {
+		path := filepath.Join(root, filepath.FromSlash(c.path))
+		if got := c.level.ignored(path, filepath.Base(path), false); got != c.want {
+			t.Errorf("%q: ignored = %v, want %v", c.path, got, c.want)
+		}
+	}
+}
+
+// TestIgnoreInvalidGlob checks that a malformed pattern is reported and
+// left out without losing the other rules.
+func TestIgnoreInvalidGlob(t *testing.T) {
+	dir := t.TempDir()
+	l, warnings := readTestIgnoreLevel(t, dir, nil, map[string]string{
+		".gitignore": "a*.log\n[z-a]x\nb?.txt\n[!]\n",
+	})
+	for _, want := range []string{`line 2: "[z-a]x"`, `line 4: "[!]"`} {
+		if !strings.Contains(warnings, want) {
+			t.Errorf("warnings %q do not mention %s", warnings, want)
+		}
+	}
+	for name, want := range map[string]bool{"ab.log": true, "bc.txt": true, "zx": false, "ax": false} {
+		if got := l.ignored(filepath.Join(dir, name), name, false); got != want {
+			t.Errorf("%q: ignored = %v, want %v", name, got, want)
+		}
+	}
+}
+
+// TestIgnoreWalk checks the files a recursive search lists in a small
+// repository against git ls-files --cached --others --exclude-standard,
+// plus the .ignore file and default skipped directories git does not know.
+func TestIgnoreWalk(t *testing.T) {
+	root := t.TempDir()
+	files := map[string]string{
+		".gitignore":          "*.log\nout/\n/gen.go\n",
+		".ignore":             "secret.txt\n",
+		".git/info/exclude":   "local.txt\n",
+		"main.go":             "needle",
+		"gen.go":              "needle",
+		"app.log":             "needle",
+		"local.txt":           "needle",
+		"secret.txt":          "needle",
+		"out/result.txt":      "needle",
+		"vendor/lib.go":       "needle",
+		"pkg/gen.go":          "needle",
+		"pkg/debug.log":       "needle",
+		"pkg/.gitignore":      "!debug.log\n*.tmp\n",
+		"pkg/cache.tmp":       "needle",
+		"pkg/out/keep.go":     "needle",
+		"pkg/deep/out.txt":    "needle",
+		"pkg/deep/.ignore":    "!secret.txt\n",
+		"pkg/deep/secret.txt": "needle",
+	}
+	for name, content := range files {
+		path := filepath.Join(root, filepath.FromSlash(name))
+		if err := os.MkdirAll(filepath.Dir(path), 0o755); err != nil {
+			t.Fatal(err)
+		}
+		if err := os.WriteFile(path, []byte(content), 0o644); err != nil {
+			t.Fatal(err)
+		}
+	}
+
+	var stdout bytes.Buffer
+	run([]string{"-r", "-l", "-no-index", "needle", root}, &stdout, io.Discard, nil)
+	var got []string
+	for _, line := range strings.Split(strings.TrimSpace(stdout.String()), "\n") {
+		rel, _ := filepath.Rel(root, line)
+		got = append(got, filepath.ToSlash(rel))
+	}
+	sort.Strings(got)
+	want := []string{"main.go", "pkg/debug.log", "pkg/deep/out.txt", "pkg/deep/secret.txt", "pkg/gen.go"}
+	if strings.Join(got, " ") != strings.Join(want, " ") {
+		t.Errorf("searched %q, want %q", got, want)
+	}
+}
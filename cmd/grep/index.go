@@ -0,0 +1,649 @@
+package main
+
+import (
+	"bytes"
+	"encoding/binary"
+	"errors"
+	"fmt"
+	"io"
+	"io/fs"
+	"os"
+	"path/filepath"
+	"regexp/syntax"
+	"sort"
+	"strings"
+	"sync"
+	"time"
+)
+
+// indexFileName is the name of the trigram index that `grep index build
+// DIR` writes at the top of DIR. The walker never searches it.
+const indexFileName = ".mygrep-index"
+
+// indexMagic starts every index file. Its last byte is the format version.
+const indexMagic = "MYGREPI\x01"
+
+// maxIndexedFileSize is the largest file that is indexed. Larger files are
+// left out of the index, which means they are always searched.
+const maxIndexedFileSize = 1 << 30
+
+// racyWindow is how recently a file may have been modified and still be
+// indexed. A file modified just before the build could be modified again
+// without its mtime changing on file systems with coarse timestamps, so it
+// is left out and searched every time until the next build.
+const racyWindow = 2 * time.Second
+
+// tableEntrySize is the size of an entry in the trigram table: a 4-byte
+// trigram and the 4-byte offset of its posting list.
+const tableEntrySize = 8
+
+var errBadIndex = errors.New("malformed index")
+
+// indexedFile is a file recorded in a trigram index. size and mtime
+// identify the version of the file that was indexed; once either changes
+// the file is searched regardless of what the index says.
+type indexedFile struct {
+	// path is relative to the directory the index was built for, with
+	// slash separators.
+	path  string
+	size  int64
+	mtime int64 // nanoseconds since the Unix epoch
+}
+
+// trigramIndex maps every trigram, a sequence of three bytes within a
+// line, to the files that contain it. A file can only contain a literal if
+// it contains every trigram of the literal, so a search for a literal of
+// three bytes or more only needs to read the files in the intersection of
+// their posting lists.
+//
+// On disk the index is laid out as:
+//
+//	magic
+//	uvarint file count, then for each file in path order:
+//	    uvarint path length, path, varint size, varint mtime
+//	uvarint trigram count, then for each trigram in increasing order:
+//	    4-byte trigram, 4-byte offset of its posting list
+//	posting lists: increasing file numbers, delta-encoded as uvarints
+//
+// The trigram table has fixed-size entries so that a query can binary
+// search it in place without decoding the rest of the index.
+type trigramIndex struct {
+	files    []indexedFile
+	table    []byte
+	postings []byte
+}
+
+// loadIndex maps the index at the top of root into memory. release must
+// be called once the index is no longer used.
+func loadIndex(root string) (ix *trigramIndex, release func(), err error) {
+	f, err := os.Open(filepath.Join(root, indexFileName))
+	if err != nil {
+		return nil, nil, err
+	}
+	defer f.Close()
+	fi, err := f.Stat()
+	if err != nil {
+		return nil, nil, err
+	}
+
+	data, err := mmapFile(f, fi.Size())
+	release = func() { munmapFile(data) }
+	if err != nil {
+		if data, err = io.ReadAll(f); err != nil {
+			return nil, nil, err
+		}
+		release = func() {}
+	}
+	if ix, err = parseIndex(data); err != nil {
+		release()
+		return nil, nil, fmt.Errorf("%s: %w", f.Name(), err)
+	}
+	return ix, release, nil
+}
+
+func parseIndex(data []byte) (*trigramIndex, error) {
+	if !bytes.HasPrefix(data, []byte(indexMagic)) {
+		return nil, errBadIndex
+	}
+	d := indexDecoder{data: data[len(indexMagic):]}
+	n := d.uvarint()
+	if n > uint64(len(d.data)) {
+		return nil, errBadIndex
+	}
+	ix := &trigramIndex{files: make([]indexedFile, n)}
+	for i := range ix.files {
+		path := d.next(d.uvarint())
+		ix.files[i] = indexedFile{path: string(path), size: d.varint(), mtime: d.varint()}
+	}
+	ix.table = d.next(d.uvarint() * tableEntrySize)
+	ix.postings = d.data
+	if d.err != nil {
+		return nil, d.err
+	}
+	return ix, nil
+}
+
+// indexDecoder reads the variable-length parts of an index, remembering
+// the first error.
+type indexDecoder struct {
+	data []byte
+	err  error
+}
+
+func (d *indexDecoder) uvarint() uint64 {
+	v, n := binary.Uvarint(d.data)
+	if n <= 0 {
+		d.fail()
+		return 0
+	}
+	d.data = d.data[n:]
+	return v
+}
+
+func (d *indexDecoder) varint() int64 {
+	v, n := binary.Varint(d.data)
+	if n <= 0 {
+		d.fail()
+		return 0
+	}
+	d.data = d.data[n:]
+	return v
+}
+
+func (d *indexDecoder) next(n uint64) []byte {
+	if n > uint64(len(d.data)) {
+		d.fail()
+		return nil
+	}
+	b := d.data[:n]
+	d.data = d.data[n:]
+	return b
+}
+
+func (d *indexDecoder) fail() {
+	if d.err == nil {
+		d.err = errBadIndex
+	}
+	d.data = nil
+}
+
+// findFile returns the position of the file at path in files, which is
+// sorted by path, or -1.
+func findFile(files []indexedFile, path string) int {
+	i := sort.Search(len(files), func(i int) bool { return files[i].path >= path })
+	if i < len(files) && files[i].path == path {
+		return i
+	}
+	return -1
+}
+
+func (ix *trigramIndex) numTrigrams() int {
+	return len(ix.table) / tableEntrySize
+}
+
+func (ix *trigramIndex) trigramAt(i int) uint32 {
+	return binary.BigEndian.Uint32(ix.table[i*tableEntrySize:])
+}
+
+// postingAt returns the encoded posting list of the i'th trigram.
+func (ix *trigramIndex) postingAt(i int) []byte {
+	start := int(binary.BigEndian.Uint32(ix.table[i*tableEntrySize+4:]))
+	end := len(ix.postings)
+	if i+1 < ix.numTrigrams() {
+		end = int(binary.BigEndian.Uint32(ix.table[(i+1)*tableEntrySize+4:]))
+	}
+	if start > end || end > len(ix.postings) {
+		return nil
+	}
+	return ix.postings[start:end]
+}
+
+// posting returns the encoded posting list of trigram t, or nil if no
+// file contains it.
+func (ix *trigramIndex) posting(t uint32) []byte {
+	n := ix.numTrigrams()
+	i := sort.Search(n, func(i int) bool { return ix.trigramAt(i) >= t })
+	if i == n || ix.trigramAt(i) != t {
+		return nil
+	}
+	return ix.postingAt(i)
+}
+
+// decodePosting appends the file numbers in the posting list p to ids.
+func decodePosting(p []byte, ids []uint32) []uint32 {
+	var id uint64
+	for len(p) > 0 {
+		delta, n := binary.Uvarint(p)
+		if n <= 0 {
+			break
+		}
+		p = p[n:]
+		id += delta
+		ids = append(ids, uint32(id))
+	}
+	return ids
+}
+
+// intersectPosting keeps the file numbers in ids, which is sorted, that
+// also appear in the posting list p.
+func intersectPosting(ids []uint32, p []byte) []uint32 {
+	out := ids[:0]
+	var id uint64
+	i := 0
+	for len(p) > 0 && i < len(ids) {
+		delta, n := binary.Uvarint(p)
+		if n <= 0 {
+			break
+		}
+		p = p[n:]
+		id += delta
+		for i < len(ids) && uint64(ids[i]) < id {
+			i++
+		}
+		if i < len(ids) && uint64(ids[i]) == id {
+			out = append(out, ids[i])
+			i++
+		}
+	}
+	return out
+}
+
+// candidates reports, for each file in the index, whether it may contain
+// at least one of literals. It returns nil if the index cannot rule out
+// any file, because some literal has no trigram.
+func (ix *trigramIndex) candidates(literals [][]byte) []bool {
+	if len(literals) == 0 {
+		return nil
+	}
+	lists := make([][][]byte, len(literals))
+	for i, lit := range literals {
+		trigrams := literalTrigrams(lit)
+		if len(trigrams) == 0 {
+			return nil
+		}
+		for _, t := range trigrams {
+			lists[i] = append(lists[i], ix.posting(t))
+		}
+	}
+
+	candidate := make([]bool, len(ix.files))
+	var ids []uint32
+	for _, postings := range lists {
+		// Start from the shortest list so the intersection stays small.
+		sort.Slice(postings, func(i, j int) bool { return len(postings[i]) < len(postings[j]) })
+		ids = decodePosting(postings[0], ids[:0])
+		for _, p := range postings[1:] {
+			if len(ids) == 0 {
+				break
+			}
+			ids = intersectPosting(ids, p)
+		}
+		for _, id := range ids {
+			if int(id) < len(candidate) {
+				candidate[id] = true
+			}
+		}
+	}
+	return candidate
+}
+
+// literalTrigrams returns the trigrams of lit. Trigrams spanning a newline
+// are never indexed, so they are left out.
+func literalTrigrams(lit []byte) []uint32 {
+	var trigrams []uint32
+	for i := 0; i+3 <= len(lit); i++ {
+		if bytes.IndexByte(lit[i:i+3], '\n') >= 0 {
+			continue
+		}
+		trigrams = append(trigrams, uint32(lit[i])<<16|uint32(lit[i+1])<<8|uint32(lit[i+2]))
+	}
+	return trigrams
+}
+
+// indexLiterals returns literals at least one of which occurs in every
+// line matched by patterns, or nil if there is no such set. It is the
+// query used to narrow a search with a trigram index.
+func indexLiterals(patterns [][]byte, extended bool) [][]byte {
+	if !extended {
+		return patterns
+	}
+	exprs := make([]string, len(patterns))
+	for i, p := range patterns {
+		exprs[i] = "(?:" + string(p) + ")"
+	}
+	re, err := syntax.Parse(strings.Join(exprs, "|"), syntax.Perl)
+	if err != nil {
+		return nil
+	}
+	return requiredLiterals(re.Simplify())
+}
+
+// indexFilter skips the files beneath root that its trigram index shows
+// cannot match. Files that are not in the index, or that have changed
+// since it was built, are never skipped.
+type indexFilter struct {
+	root      string
+	files     []indexedFile
+	candidate []bool
+}
+
+// openIndexFilter returns the filter for a search for literals beneath
+// root, or nil if root has no index or the index cannot narrow the
+// search. A damaged index is reported to stderr and ignored.
+func openIndexFilter(root string, literals [][]byte, stderr io.Writer) *indexFilter {
+	if literals == nil {
+		return nil
+	}
+	ix, release, err := loadIndex(root)
+	if err != nil {
+		if !errors.Is(err, fs.ErrNotExist) {
+			fmt.Fprintln(stderr, "Ignoring index:", err)
+		}
+		return nil
+	}
+	defer release()
+	candidate := ix.candidates(literals)
+	if candidate == nil {
+		return nil
+	}
+	return &indexFilter{root: root, files: ix.files, candidate: candidate}
+}
+
+// skip reports whether the file at path, found by the walker as e, can be
+// left unsearched. Only files the index rules out are stat'ed, to check
+// that they have not changed since they were indexed.
+func (f *indexFilter) skip(path string, e fs.DirEntry) bool {
+	i := findFile(f.files, relPath(f.root, path))
+	if i < 0 || f.candidate[i] {
+		return false
+	}
+	fi, err := e.Info()
+	if err != nil {
+		return false
+	}
+	return fi.Size() == f.files[i].size && fi.ModTime().UnixNano() == f.files[i].mtime
+}
+
+// indexBuildStats summarizes an index build.
+type indexBuildStats struct {
+	files    int   // files in the index
+	reused   int   // files unchanged since the previous build
+	skipped  int   // binary, very large or recently modified files left out
+	trigrams int   // distinct trigrams
+	size     int64 // size of the index file
+}
+
+func (st indexBuildStats) String() string {
+	return fmt.Sprintf("%d files indexed (%d unchanged, %d skipped), %d trigrams, %d bytes",
+		st.files, st.reused, st.skipped, st.trigrams, st.size)
+}
+
+// indexedContents is the result of reading one file for the index.
+type indexedContents struct {
+	file     indexedFile
+	ok       bool     // false if the file is left out of the index
+	oldID    int      // number of the file in the previous index, or -1
+	trigrams []uint32 // when oldID < 0
+}
+
+// buildIndex writes the trigram index of the files beneath root to
+// root/.mygrep-index, reading them on parallelism goroutines. Files that
+// cannot be read are reported to stderr and left out.
+//
+// An existing index is updated incrementally: files whose size and mtime
+// have not changed are not read again, their trigrams are taken from the
+// old posting lists.
+func buildIndex(root string, parallelism int, stderr io.Writer) (indexBuildStats, error) {
+	var st indexBuildStats
+	start := time.Now()
+	if fi, err := os.Stat(root); err != nil {
+		return st, err
+	} else if !fi.IsDir() {
+		return st, fmt.Errorf("%s: not a directory", root)
+	}
+
+	old, release, err := loadIndex(root)
+	if err == nil {
+		defer release()
+	} else if !errors.Is(err, fs.ErrNotExist) {
+		fmt.Fprintln(stderr, "Rebuilding index:", err)
+	}
+
+	// List the files first so they can be numbered in path order.
+	jobs := make(chan fileJob, parallelism)
+	go walk([]string{root}, walkOptions{parallelism: parallelism}, jobs, nil)
+	var paths []string
+	for job := range jobs {
+		if job.err != nil {
+			fmt.Fprintln(stderr, "Error reading file:", job.err)
+			continue
+		}
+		paths = append(paths, relPath(root, job.path))
+	}
+	sort.Strings(paths)
+
+	results := make([]indexedContents, len(paths))
+	ids := make(chan int, parallelism)
+	var wg sync.WaitGroup
+	for i := 0; i < parallelism; i++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			set := newTrigramSet()
+			for id := range ids {
+				results[id] = readIndexedFile(root, paths[id], old, start, set)
+			}
+		}()
+	}
+	for id := range paths {
+		ids <- id
+	}
+	close(ids)
+	wg.Wait()
+
+	// Number the files that made it into the index and gather their
+	// posting lists, from the old index for unchanged files.
+	postings := make(map[uint32][]uint32)
+	var files []indexedFile
+	var oldToNew []int32
+	if old != nil {
+		oldToNew = make([]int32, len(old.files))
+		for i := range oldToNew {
+			oldToNew[i] = -1
+		}
+	}
+	for _, r := range results {
+		if !r.ok {
+			st.skipped++
+			continue
+		}
+		id := uint32(len(files))
+		files = append(files, r.file)
+		if r.oldID >= 0 {
+			oldToNew[r.oldID] = int32(id)
+			st.reused++
+			continue
+		}
+		for _, t := range r.trigrams {
+			postings[t] = append(postings[t], id)
+		}
+	}
+	if st.reused > 0 {
+		var ids []uint32
+		for i := 0; i < old.numTrigrams(); i++ {
+			t := old.trigramAt(i)
+			ids = decodePosting(old.postingAt(i), ids[:0])
+			for _, id := range ids {
+				if int(id) < len(oldToNew) && oldToNew[id] >= 0 {
+					postings[t] = append(postings[t], uint32(oldToNew[id]))
+				}
+			}
+		}
+	}
+
+	data, err := encodeIndex(files, postings)
+	if err != nil {
+		return st, err
+	}
+	if err := writeFileAtomic(filepath.Join(root, indexFileName), data); err != nil {
+		return st, err
+	}
+	st.files = len(files)
+	st.trigrams = len(postings)
+	st.size = int64(len(data))
+	return st, nil
+}
+
+// readIndexedFile reads the file at rel beneath root for the index,
+// reusing its entry in old if it has not changed. set is scratch space for
+// the trigrams.
+func readIndexedFile(root, rel string, old *trigramIndex, start time.Time, set *trigramSet) indexedContents {
+	r := indexedContents{oldID: -1}
+	f, err := os.Open(filepath.Join(root, filepath.FromSlash(rel)))
+	if err != nil {
+		return r
+	}
+	defer f.Close()
+	fi, err := f.Stat()
+	if err != nil || !fi.Mode().IsRegular() || fi.Size() > maxIndexedFileSize {
+		return r
+	}
+	if fi.ModTime().After(start.Add(-racyWindow)) {
+		return r
+	}
+	r.file = indexedFile{path: rel, size: fi.Size(), mtime: fi.ModTime().UnixNano()}
+
+	if old != nil {
+		if i := findFile(old.files, rel); i >= 0 && old.files[i] == r.file {
+			r.ok, r.oldID = true, i
+			return r
+		}
+	}
+
+	data, err := io.ReadAll(f)
+	if err != nil || int64(len(data)) != r.file.size {
+		return r
+	}
+	if bytes.IndexByte(data[:min(len(data), binarySniffSize)], 0) >= 0 {
+		return r
+	}
+	set.reset()
+	set.add(data)
+	r.ok = true
+	r.trigrams = append([]uint32(nil), set.list...)
+	return r
+}
+
+// relPath returns path relative to root with slash separators, as it is
+// recorded in the index.
+func relPath(root, path string) string {
+	rel, err := filepath.Rel(root, path)
+	if err != nil {
+		return filepath.ToSlash(path)
+	}
+	return filepath.ToSlash(rel)
+}
+
+// trigramSet collects the distinct trigrams of a file. Membership is kept
+// in a bitmap over all 2^24 trigrams, so adding is a bit test and only the
+// trigrams actually seen need clearing between files.
+type trigramSet struct {
+	seen []uint64
+	list []uint32
+}
+
+func newTrigramSet() *trigramSet {
+	return &trigramSet{seen: make([]uint64, 1<<24/64)}
+}
+
+// add adds the trigrams of every line of data.
+func (s *trigramSet) add(data []byte) {
+	var t uint32
+	n := 0
+	for _, b := range data {
+		if b == '\n' {
+			n = 0
+			continue
+		}
+		t = (t<<8 | uint32(b)) & 0xffffff
+		if n++; n < 3 {
+			continue
+		}
+		if s.seen[t/64]&(1<<(t%64)) == 0 {
+			s.seen[t/64] |= 1 << (t % 64)
+			s.list = append(s.list, t)
+		}
+	}
+}
+
+func (s *trigramSet) reset() {
+	for _, t := range s.list {
+		s.seen[t/64] = 0
+	}
+	s.list = s.list[:0]
+}
+
+// encodeIndex lays out an index in the format described at trigramIndex.
+func encodeIndex(files []indexedFile, postings map[uint32][]uint32) ([]byte, error) {
+	data := []byte(indexMagic)
+	data = binary.AppendUvarint(data, uint64(len(files)))
+	for _, f := range files {
+		data = binary.AppendUvarint(data, uint64(len(f.path)))
+		data = append(data, f.path...)
+		data = binary.AppendVarint(data, f.size)
+		data = binary.AppendVarint(data, f.mtime)
+	}
+
+	trigrams := make([]uint32, 0, len(postings))
+	for t := range postings {
+		trigrams = append(trigrams, t)
+	}
+	sort.Slice(trigrams, func(i, j int) bool { return trigrams[i] < trigrams[j] })
+	data = binary.AppendUvarint(data, uint64(len(trigrams)))
+
+	table := make([]byte, len(trigrams)*tableEntrySize)
+	var lists []byte
+	for i, t := range trigrams {
+		if len(lists) > 1<<32-1 {
+			return nil, errors.New("index too large")
+		}
+		binary.BigEndian.PutUint32(table[i*tableEntrySize:], t)
+		binary.BigEndian.PutUint32(table[i*tableEntrySize+4:], uint32(len(lists)))
+		ids := postings[t]
+		sort.Slice(ids, func(i, j int) bool { return ids[i] < ids[j] })
+		prev := uint32(0)
+		for _, id := range ids {
+			lists = binary.AppendUvarint(lists, uint64(id-prev))
+			prev = id
+		}
+	}
+	data = append(data, table...)
+	return append(data, lists...), nil
+}
+
+// writeFileAtomic replaces the file at path with data, so that concurrent
+// searches see either the old index or the new one.
+func writeFileAtomic(path string, data []byte) error {
+	f, err := os.CreateTemp(filepath.Dir(path), filepath.Base(path)+".tmp*")
+	if err != nil {
+		return err
+	}
+	_, err = f.Write(data)
+	if err == nil {
+		err = f.Chmod(0o644)
+	}
+	if err != nil {
+		f.Close()
+		os.Remove(f.Name())
+		return err
+	}
+	if err := f.Close(); err != nil {
+		os.Remove(f.Name())
+		return err
+	}
+	if err := os.Rename(f.Name(), path); err != nil {
+		os.Remove(f.Name())
+		return err
+	}
+	return nil
+}
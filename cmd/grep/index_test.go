@@ -0,0 +1,266 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"os"
+	"path/filepath"
+	"reflect"
+	"sort"
+	"strings"
+	"testing"
+	"time"
+)
+
+func trigramOf(s string) uint32 {
+	return literalTrigrams([]byte(s))[0]
+}
+
+func TestIndexRoundTrip(t *testing.T) {
+	files := []indexedFile{
+		{path: "a.txt", size: 12, mtime: 1700000000123456789},
+		{path: "b/c.txt", size: 0, mtime: -1},
+		{path: "d.txt", size: 1 << 40, mtime: 0},
+	}
+	postings := map[uint32][]uint32{
+		trigramOf("abc"): {2, 0},
+		trigramOf("bcd"): {1},
+		trigramOf("xyz"): {0, 1, 2},
+		0xffffff:         {2},
+	}
+	data, err := encodeIndex(files, postings)
+	if err != nil {
+		t.Fatal(err)
+	}
+	ix, err := parseIndex(data)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if !reflect.DeepEqual(ix.files, files) {
+		t.Errorf("files = %v, want %v", ix.files, files)
+	}
+	if ix.numTrigrams() != len(postings) {
+		t.Errorf("%d trigrams, want %d", ix.numTrigrams(), len(postings))
+	}
+	for tri, want := range postings {
+		want = append([]uint32(nil), want...)
+		sort.Slice(want, func(i, j int) bool { return want[i] < want[j] })
+		if got := decodePosting(ix.posting(tri), nil); !reflect.DeepEqual(got, want) {
+			t.Errorf("posting %#06x = %v, want %v", tri, got, want)
+		}
+	}
+	if p := ix.posting(trigramOf("zzz")); p != nil {
+		t.Errorf("posting of an absent trigram = %v, want nil", p)
+	}
+
+	for _, c := range []struct {
+		literals []string
+		want     []bool
+	}{
+		{[]string{"abcd"}, []bool{false, false, false}}, // "abc" and "bcd" are in no file together
+		{[]string{"abc"}, []bool{true, false, true}},
+		{[]string{"bcd", "xyz"}, []bool{true, true, true}},
+		{[]string{"zzz"}, []bool{false, false, false}},
+		{[]string{"xyz", "ab"}, nil}, // "ab" has no trigram
+		{[]string{"a\nbc"}, nil},     // nor does a literal split by a newline
+	} {
+		var literals [][]byte
+		for _, lit := range c.literals {
+			literals = append(literals, []byte(lit))
+		}
+		if got := ix.candidates(literals); !reflect.DeepEqual(got, c.want) {
+			t.Errorf("candidates(%q) = %v, want %v", c.literals, got, c.want)
+		}
+	}
+
+	// Every truncation that cuts into the file list or the trigram table
+	// is detected. The posting lists take up the rest of the file, so
+	// cutting those short cannot be.
+	for n := 0; n < len(data)-len(ix.postings); n++ {
+		if _, err := parseIndex(data[:n]); err == nil {
+			t.Errorf("index cut to %d of %d bytes parsed", n, len(data))
+		}
+	}
+	if _, err := parseIndex(append([]byte("not an index"), data...)); err == nil {
+		t.Error("index with a bad magic parsed")
+	}
+
+	empty, err := encodeIndex(nil, nil)
+	if err != nil {
+		t.Fatal(err)
+	}
+	if ix, err := parseIndex(empty); err != nil || len(ix.files) != 0 || ix.numTrigrams() != 0 {
+		t.Errorf("empty index: %v, %v", ix, err)
+	}
+}
+
+// indexTestSearches are the searches TestIndexSearch runs with and
+// without the index.
+var indexTestSearches = [][]string{
+	{"alpha"},
+	{"beta gamma"},
+	{"-e", "delta", "-e", "omega"},
+	{"-l", "alpha"},
+	{"-E", "alph[a]|delt(a)"},
+	{"-E", "gam+a"},
+	{"-E", "file 1"},
+	{"-E", "^file"},
+}
+
+// indexTestFile returns the content of the i'th file of the tree
+// TestIndexSearch starts from.
+func indexTestFile(i int) string {
+	s := fmt.Sprintf("file %d\n", i)
+	if i%3 == 0 {
+		s += "alpha\n"
+	}
+	if i%5 == 0 {
+		s += "beta gamma\n"
+	}
+	if i%7 == 0 {
+		s += "delta\n"
+	}
+	return s
+}
+
+// TestIndexSearch builds an index, changes the tree beneath it and checks
+// that searches give the same output with and without the index, both
+// before and after the index is rebuilt, and that an incremental rebuild
+// writes the same index as a build from scratch.
+func TestIndexSearch(t *testing.T) {
+	root := t.TempDir()
+	path := func(i int) string {
+		return filepath.Join(root, fmt.Sprintf("d%d", i%3), fmt.Sprintf("f%02d.txt", i))
+	}
+	// Files modified within racyWindow of a build are left out of the
+	// index, so the tree is dated well in the past.
+	old := time.Now().Add(-time.Hour)
+	write := func(path, content string, mtime time.Time) {
+		t.Helper()
+		if err := os.MkdirAll(filepath.Dir(path), 0o755); err != nil {
+			t.Fatal(err)
+		}
+		if err := os.WriteFile(path, []byte(content), 0o644); err != nil {
+			t.Fatal(err)
+		}
+		if err := os.Chtimes(path, mtime, mtime); err != nil {
+			t.Fatal(err)
+		}
+	}
+	const numFiles = 30
+	for i := 0; i < numFiles; i++ {
+		write(path(i), indexTestFile(i), old)
+	}
+
+	search := func(args ...string) (string, string) {
+		var stdout, stderr bytes.Buffer
+		run(append([]string{"-r", "-sort", "-stats"}, append(args, root)...), &stdout, &stderr, nil)
+		return stdout.String(), stderr.String()
+	}
+	compare := func(when string) {
+		t.Helper()
+		for _, args := range indexTestSearches {
+			got, _ := search(args...)
+			want, _ := search(append([]string{"-no-index"}, args...)...)
+			if got != want {
+				t.Errorf("%s: %q:\nwith the index    %q\nwithout the index %q", when, args, got, want)
+			}
+		}
+	}
+	build := func() (indexBuildStats, []byte) {
+		t.Helper()
+		var stderr bytes.Buffer
+		st, err := buildIndex(root, 4, &stderr)
+		if err != nil || stderr.Len() > 0 {
+			t.Fatalf("building the index: %v %s", err, stderr.String())
+		}
+		data, err := os.ReadFile(filepath.Join(root, indexFileName))
+		if err != nil {
+			t.Fatal(err)
+		}
+		return st, data
+	}
+
+	if st, _ := build(); st.files != numFiles || st.reused != 0 {
+		t.Fatalf("first build: %v", st)
+	}
+	compare("first build")
+	// The index must actually narrow the search for the comparisons to
+	// mean anything.
+	_, withIndex := search("delta")
+	_, withoutIndex := search("-no-index", "delta")
+	if !strings.HasPrefix(withIndex, "5 files searched\n") || !strings.HasPrefix(withoutIndex, "30 files searched\n") {
+		t.Fatalf("the index did not narrow the search:\n%s\n%s", withIndex, withoutIndex)
+	}
+
+	steps := []struct {
+		name          string
+		apply         func()
+		reused, files int
+	}{
+		// The index rules both files out of searches for "alpha" and
+		// "delta": they must be searched once they have changed.
+		{"new size", func() { write(path(1), "file 1\nalpha\n", old) }, 29, 30},
+		{"same size, new mtime", func() { write(path(2), "delta\n\n", old.Add(time.Second)) }, 29, 30},
+		{"new file", func() { write(filepath.Join(root, "d1", "a-new.txt"), "alpha\nbeta gamma\ndelta\n", old) }, 30, 31},
+		{"new directory", func() { write(filepath.Join(root, "e", "f", "g.txt"), "omega\n", old) }, 31, 32},
+		{"deleted files", func() {
+			for _, i := range []int{0, 9, 10, 29} {
+				if err := os.Remove(path(i)); err != nil {
+					t.Fatal(err)
+				}
+			}
+		}, 28, 28},
+		// A file modified just now is left out of the index until it has
+		// been left alone for racyWindow, and searched meanwhile.
+		{"recent change", func() { write(path(4), "alpha\n", time.Now()) }, 27, 27},
+	}
+	for _, step := range steps {
+		step.apply()
+		compare(step.name)
+
+		st, data := build()
+		if st.reused != step.reused || st.files != step.files {
+			t.Errorf("%s: rebuild %v, want %d files indexed (%d unchanged)", step.name, st, step.files, step.reused)
+		}
+		compare(step.name + ", rebuilt")
+
+		// Renumbering the files the rebuild reused must give the posting
+		// lists a fresh build computes.
+		if err := os.Remove(filepath.Join(root, indexFileName)); err != nil {
+			t.Fatal(err)
+		}
+		if _, fresh := build(); !bytes.Equal(data, fresh) {
+			t.Errorf("%s: incremental rebuild differs from a fresh build", step.name)
+		}
+	}
+}
+
+// TestIndexDamaged checks that a search ignores an index it cannot read,
+// and that a build replaces it.
+func TestIndexDamaged(t *testing.T) {
+	root := t.TempDir()
+	file := filepath.Join(root, "a.txt")
+	if err := os.WriteFile(file, []byte("needle\n"), 0o644); err != nil {
+		t.Fatal(err)
+	}
+	index := filepath.Join(root, indexFileName)
+	if err := os.WriteFile(index, []byte(indexMagic+"\xff"), 0o644); err != nil {
+		t.Fatal(err)
+	}
+
+	var stdout, stderr bytes.Buffer
+	run([]string{"-r", "needle", root}, &stdout, &stderr, nil)
+	if stdout.String() != file+":needle\n" || !strings.Contains(stderr.String(), "Ignoring index:") {
+		t.Errorf("search with a damaged index: stdout %q, stderr %q", stdout.String(), stderr.String())
+	}
+	stderr.Reset()
+	if _, err := buildIndex(root, 1, &stderr); err != nil || !strings.Contains(stderr.String(), "Rebuilding index:") {
+		t.Errorf("rebuilding a damaged index: %v, stderr %q", err, stderr.String())
+	}
+	_, release, err := loadIndex(root)
+	if err != nil {
+		t.Fatal(err)
+	}
+	release()
+}
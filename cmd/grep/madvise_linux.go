@@ -0,0 +1,9 @@
+package main
+
+import "syscall"
+
+// adviseSequential tells the kernel that data will be read front to back,
+// so it can read ahead aggressively when the file is not cached.
+func adviseSequential(data []byte) {
+	_ = syscall.Madvise(data, syscall.MADV_SEQUENTIAL)
+}
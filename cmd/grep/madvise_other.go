@@ -0,0 +1,5 @@
+//go:build darwin || freebsd || netbsd || openbsd || dragonfly
+
+package main
+
+func adviseSequential(data []byte) {}
@@ -1,32 +1,299 @@
 package main
 
 import (
+	"bytes"
+	"errors"
+	"flag"
 	"fmt"
+	"io"
 	"os"
+	"runtime"
 	"strings"
 )
 
+func usage(flags *flag.FlagSet) {
+	w := flags.Output()
+	fmt.Fprintln(w, "Usage: grep [options] <pattern> [<file>...]")
+	fmt.Fprintln(w, "       grep [options] -e <pattern>... | -f <file> [<file>...]")
+	fmt.Fprintln(w, "       grep index build <dir>...")
+	fmt.Fprintln(w, "       grep serve [options] [socket]")
+	fmt.Fprintln(w, "With no file, or \"-\", read standard input; with -r and no file, search \".\".")
+	flags.PrintDefaults()
+}
+
+// binaryModes maps -binary-files values to modes.
+var binaryModes = map[string]binaryMode{
+	"":              binaryAuto,
+	"binary":        binaryMatches,
+	"without-match": binarySkip,
+	"text":          binaryText,
+}
+
+// stringList is a flag that may be given more than once.
+type stringList []string
+
+func (l *stringList) String() string     { return strings.Join(*l, ",") }
+func (l *stringList) Set(v string) error { *l = append(*l, v); return nil }
+
 func main() {
-	if len(os.Args) != 3 {
-		fmt.Println("Usage: grep <pattern> <file>")
-		os.Exit(1)
+	args := os.Args[1:]
+	if len(args) > 0 && args[0] == "serve" {
+		os.Exit(runServe(args[1:], os.Stderr))
+	}
+	if socket := os.Getenv(socketEnv); socket != "" {
+		if status, ok := runRemote(socket, args, os.Stdout, os.Stderr); ok {
+			os.Exit(status)
+		}
 	}
+	os.Exit(run(args, os.Stdout, os.Stderr, nil))
+}
+
+// run runs the command with args, writing results to stdout and messages
+// to stderr, and returns its exit status. cache, if not nil, holds
+// directory listings and file contents kept between runs by `grep serve`.
+func run(args []string, stdout, stderr io.Writer, cache *fileCache) int {
+	if len(args) > 0 && args[0] == "index" {
+		return runIndex(args[1:], stdout, stderr)
+	}
+
+	flags := flag.NewFlagSet("grep", flag.ContinueOnError)
+	flags.SetOutput(stderr)
+	flags.Usage = func() { usage(flags) }
 
-	// pattern := os.Args[1]
-	file := os.Args[2]
+	recursive := flags.Bool("r", false, "search directories recursively")
+	sorted := flags.Bool("sort", false, "print results in path order instead of as files complete")
+	lineBuffered := flags.Bool("line-buffered", false, "flush output after every line")
+	extended := flags.Bool("E", false, "interpret patterns as regular expressions")
+	binaryFiles := flags.String("binary-files", "", "treat files containing NUL bytes as `type` binary, without-match or text\n(default: binary for named files, without-match for files found by -r)")
+	text := flags.Bool("a", false, "search binary files as text (same as -binary-files text)")
+	skipBinary := flags.Bool("I", false, "skip binary files (same as -binary-files without-match)")
+	decompress := flags.Bool("z", false, "search the contents of gzip, bzip2, zstd and xz compressed files")
+	noIgnore := flags.Bool("no-ignore", false, "also search files excluded by .gitignore and .ignore files, and\n.git, vendor, node_modules, build, dist and target directories")
+	noIndex := flags.Bool("no-index", false, "do not use trigram indexes built with 'grep index build'")
+	showStats := flags.Bool("stats", false, "print search statistics to stderr")
+	count := flags.Bool("c", false, "print only a count of matching lines per file")
+	filesWithMatches := flags.Bool("l", false, "print only the names of files with matches")
+	quiet := flags.Bool("q", false, "print nothing; exit with status 0 on the first match")
+	maxCount := flags.Int("m", -1, "stop reading a file after `num` matching lines")
+	after := flags.Int("A", -1, "print `num` lines of context after each match")
+	before := flags.Int("B", -1, "print `num` lines of context before each match")
+	context := flags.Int("C", -1, "print `num` lines of context around each match")
+	var exprs, patternFiles, includes, excludes, types stringList
+	flags.Var(&exprs, "e", "search for `pattern` (may be repeated)")
+	flags.Var(&patternFiles, "f", "read patterns from `file`, one per line (may be repeated)")
+	flags.Var(&includes, "include", "search only files whose names match `glob` (may be repeated)")
+	flags.Var(&excludes, "exclude", "skip files whose names match `glob` (may be repeated)")
+	flags.Var(&types, "t", "search only files of `type` (may be repeated): "+fileTypeNames())
+	if err := flags.Parse(args); err != nil {
+		if errors.Is(err, flag.ErrHelp) {
+			return exitMatch
+		}
+		return exitError
+	}
+
+	args = flags.Args()
+	if len(exprs) == 0 && len(patternFiles) == 0 {
+		if len(args) == 0 {
+			flags.Usage()
+			return exitError
+		}
+		exprs, args = stringList{args[0]}, args[1:]
+	}
+	paths := args
+	if len(paths) == 0 {
+		switch {
+		case *recursive:
+			paths = []string{"."}
+		case cache != nil:
+			// Standard input is the client's, not the server's.
+			return exitLocal
+		default:
+			paths = []string{stdinName}
+		}
+	}
 
-	content, err := os.ReadFile(file)
+	patterns, err := loadPatterns(exprs, patternFiles)
 	if err != nil {
-		fmt.Println("Error reading file:", err)
-		os.Exit(1)
+		fmt.Fprintln(stderr, "Error reading pattern file:", err)
+		return exitError
+	}
+	var m matcher
+	if *extended {
+		if m, err = newRegexMatcher(patterns); err != nil {
+			fmt.Fprintln(stderr, "Invalid regular expression:", err)
+			return exitError
+		}
+	} else {
+		m = newMatcher(patterns)
+	}
+
+	opts := searchOptions{
+		parallelism: runtime.GOMAXPROCS(0),
+		maxCount:    *maxCount,
+		cache:       cache,
+		decompress:  *decompress,
+		context:     *context >= 0 || *before >= 0 || *after >= 0,
+	}
+	if *context >= 0 {
+		opts.before, opts.after = *context, *context
+	}
+	if *before >= 0 {
+		opts.before = *before
+	}
+	if *after >= 0 {
+		opts.after = *after
+	}
+	switch {
+	case *text:
+		opts.binaryMode = binaryText
+	case *skipBinary:
+		opts.binaryMode = binarySkip
+	default:
+		mode, ok := binaryModes[*binaryFiles]
+		if !ok {
+			fmt.Fprintf(stderr, "Unknown binary-files type: %q\n", *binaryFiles)
+			return exitError
+		}
+		opts.binaryMode = mode
+	}
+	switch {
+	case *quiet:
+		opts.outputMode = outputQuiet
+	case *filesWithMatches:
+		opts.outputMode = outputFilesWithMatches
+	case *count:
+		opts.outputMode = outputCount
+	}
+	if *showStats {
+		opts.stats = new(searchStats)
 	}
 
-	contentString := string(content)
-	lines := strings.Split(contentString, "\n")
-	for _, line := range lines {
-		pattern := os.Args[1]
-		if strings.Contains(line, pattern) {
-			fmt.Println(line)
+	filter, err := newNameFilter(includes, excludes, types)
+	if err != nil {
+		fmt.Fprintln(stderr, "Error in file filter:", err)
+		return exitError
+	}
+
+	out := newOutput(stdout, *lineBuffered || watchedPipe(paths, stdout))
+	var matched, ok bool
+	if !*recursive && len(paths) == 1 {
+		matched, ok = searchSingle(m, paths[0], opts, out, stderr)
+	} else {
+		opts.withFilename = len(paths) > 1 || paths[0] != stdinName && isDir(paths[0])
+		wopts := walkOptions{ordered: *sorted, noIgnore: *noIgnore, filter: filter, cache: cache, stderr: stderr}
+		// An index is built from the raw bytes of each file, and -c
+		// reports files without matches too.
+		if !*noIndex && !opts.decompress && opts.outputMode != outputCount {
+			wopts.indexLiterals = indexLiterals(patterns, *extended)
+		}
+		matched, ok = searchPaths(m, paths, opts, wopts, runtime.GOMAXPROCS(0), out, stderr)
+	}
+	if opts.stats != nil {
+		opts.stats.print(stderr)
+	}
+	if err := out.Flush(); err != nil {
+		fmt.Fprintln(stderr, "Error writing output:", err)
+		return exitError
+	}
+	return exitStatus(matched, ok, *quiet)
+}
+
+// runIndex runs `grep index build DIR...`, which writes a trigram index of
+// the files beneath each DIR. Later recursive searches of DIR only read the
+// files the index shows may match, and files changed since the build.
+func runIndex(args []string, stdout, stderr io.Writer) int {
+	if len(args) < 2 || args[0] != "build" {
+		fmt.Fprintln(stderr, "Usage: grep index build <dir>...")
+		return exitError
+	}
+	for _, dir := range args[1:] {
+		st, err := buildIndex(dir, runtime.GOMAXPROCS(0), stderr)
+		if err != nil {
+			fmt.Fprintln(stderr, "Error building index:", err)
+			return exitError
+		}
+		fmt.Fprintf(stdout, "%s: %v\n", dir, st)
+	}
+	return exitMatch
+}
+
+// Exit statuses, as in grep.
+const (
+	exitMatch   = 0
+	exitNoMatch = 1
+	exitError   = 2
+)
+
+// exitStatus is 0 if a line matched and 1 if none did, or 2 if an error
+// occurred, unless -q found a match regardless.
+func exitStatus(matched, ok, quiet bool) int {
+	switch {
+	case !ok && !(quiet && matched):
+		return exitError
+	case matched:
+		return exitMatch
+	default:
+		return exitNoMatch
+	}
+}
+
+// searchSingle searches one file, writing matches straight to out and
+// errors to stderr. A large file is split across up to opts.parallelism
+// goroutines. It reports whether the file matched and whether it was
+// searched without error.
+func searchSingle(m matcher, path string, opts searchOptions, out *output, stderr io.Writer) (matched, ok bool) {
+	s := newSearcher(m, opts)
+	matched, err := s.searchPath(path, true, out)
+	if err != nil {
+		out.Flush()
+		fmt.Fprintln(stderr, "Error reading file:", err)
+		return matched, false
+	}
+	return matched, true
+}
+
+// watchedPipe reports whether output should be line buffered because
+// standard input, among paths, is a pipe and stdout is a terminal: someone
+// is watching the lines of something like `tail -f` as they arrive.
+func watchedPipe(paths []string, stdout io.Writer) bool {
+	out, ok := stdout.(*os.File)
+	if !ok || !isTerminal(out) {
+		return false
+	}
+	for _, path := range paths {
+		if path == stdinName {
+			fi, err := os.Stdin.Stat()
+			return err == nil && fi.Mode()&os.ModeNamedPipe != 0
+		}
+	}
+	return false
+}
+
+func isDir(path string) bool {
+	fi, err := os.Stat(path)
+	return err == nil && fi.IsDir()
+}
+
+// loadPatterns collects the patterns given with -e and those read from -f
+// files. As in grep, a pattern containing newlines stands for one pattern
+// per line.
+func loadPatterns(exprs, files []string) ([][]byte, error) {
+	var patterns [][]byte
+	for _, e := range exprs {
+		for _, p := range strings.Split(e, "\n") {
+			patterns = append(patterns, []byte(p))
+		}
+	}
+	for _, file := range files {
+		data, err := os.ReadFile(file)
+		if err != nil {
+			return nil, err
+		}
+		if len(data) == 0 {
+			continue
 		}
+		data = bytes.TrimSuffix(data, newline)
+		patterns = append(patterns, bytes.Split(data, newline)...)
 	}
+	return patterns, nil
 }
@@ -0,0 +1,145 @@
+package main
+
+import "bytes"
+
+// matcher finds the patterns being searched for in a buffer. Patterns
+// never contain a newline, so a match always lies within a single line.
+// Implementations are immutable once built and safe to share between
+// goroutines.
+type matcher interface {
+	// find returns the offset of a match in b lying on the first line of
+	// b that contains one, or -1 if nothing in b matches.
+	find(b []byte) int
+}
+
+// newMatcher returns the fastest matcher for patterns: a literalMatcher
+// for a single pattern and an Aho-Corasick automaton for several.
+func newMatcher(patterns [][]byte) matcher {
+	if len(patterns) == 1 {
+		return newLiteralMatcher(patterns[0])
+	}
+	return newAhoCorasick(patterns)
+}
+
+// byteFrequencies ranks every byte by how common it is in typical text,
+// source code and logs, from 0 (rarest) to 255 (most common). It is used
+// to pick the byte of a pattern that a prefilter scan should look for.
+var byteFrequencies = [256]uint8{
+	157, 28, 27, 20, 21, 19, 18, 17, 22, 219, 241, 25, 26, 158, 16, 15, // 0x00
+	14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 24, 3, 2, 1, 0, // 0x10
+	255, 176, 230, 178, 175, 172, 177, 183, 222, 221, 213, 171, 233, 225, 232, 223, // 0x20
+	220, 218, 217, 200, 199, 198, 197, 196, 195, 194, 226, 216, 180, 224, 179, 170, // 0x30
+	174, 210, 190, 203, 202, 212, 191, 189, 188, 209, 161, 163, 204, 192, 206, 207, // 0x40
+	193, 159, 205, 208, 211, 201, 165, 164, 160, 162, 187, 182, 169, 181, 166, 227, // 0x50
+	167, 252, 234, 243, 244, 254, 239, 237, 246, 250, 185, 229, 245, 240, 249, 251, // 0x60
+	238, 186, 247, 248, 253, 242, 231, 236, 228, 235, 184, 215, 173, 214, 168, 23, // 0x70
+	150, 154, 153, 152, 139, 138, 137, 136, 135, 134, 133, 132, 131, 130, 129, 128, // 0x80
+	127, 126, 125, 124, 123, 122, 121, 120, 119, 118, 117, 116, 115, 114, 113, 112, // 0x90
+	147, 111, 110, 109, 108, 107, 106, 105, 104, 148, 103, 102, 101, 100, 99, 98, // 0xa0
+	97, 96, 95, 94, 93, 92, 91, 90, 89, 88, 87, 86, 146, 85, 84, 83, // 0xb0
+	82, 81, 80, 149, 79, 78, 77, 76, 75, 74, 73, 72, 71, 70, 69, 68, // 0xc0
+	67, 66, 65, 64, 63, 62, 61, 60, 59, 58, 57, 56, 55, 54, 53, 52, // 0xd0
+	51, 50, 151, 155, 49, 143, 144, 142, 141, 140, 48, 47, 46, 45, 44, 145, // 0xe0
+	43, 42, 41, 40, 39, 38, 37, 36, 35, 34, 33, 32, 31, 30, 29, 156, // 0xf0
+}
+
+const (
+	// commonByteRank is the rank at and above which even the rarest byte
+	// of a pattern is so frequent that a rare-byte prefilter would stop
+	// on almost every position; such patterns go straight to bytes.Index.
+	commonByteRank = 240
+
+	// prefilterMaxMisses is the number of candidates that may fail
+	// verification before the prefilter's effectiveness is checked.
+	prefilterMaxMisses = 64
+
+	// prefilterMinSkip is the minimum average number of bytes the
+	// prefilter must skip per failed candidate to keep being used.
+	prefilterMinSkip = 16
+)
+
+// literalMatcher finds a fixed string. It picks the best strategy for the
+// pattern when it is built:
+//
+//   - single bytes are found with bytes.IndexByte;
+//   - patterns made only of very common bytes, such as "the", use
+//     bytes.Index, which already searches for short needles with
+//     vectorised code;
+//   - everything else scans for the pattern's rarest byte with
+//     bytes.IndexByte (a vectorised memchr), checks a second rare byte,
+//     and only then compares the whole pattern. Long identifiers and
+//     patterns with upper-case letters or punctuation typically skip
+//     most of the input this way.
+type literalMatcher struct {
+	pattern []byte
+
+	// rare1 and rare2 are the two rarest bytes of the pattern, found at
+	// offsets rare1At and rare2At. prefilter is false when the pattern is
+	// searched for with bytes.Index instead.
+	rare1, rare2     byte
+	rare1At, rare2At int
+	prefilter        bool
+}
+
+func newLiteralMatcher(pattern []byte) *literalMatcher {
+	m := &literalMatcher{pattern: pattern}
+	if len(pattern) < 2 {
+		return m
+	}
+
+	m.rare1At, m.rare2At = -1, -1
+	for i, b := range pattern {
+		switch {
+		case m.rare1At < 0 || byteFrequencies[b] < byteFrequencies[m.rare1]:
+			m.rare2, m.rare2At = m.rare1, m.rare1At
+			m.rare1, m.rare1At = b, i
+		case b != m.rare1 && (m.rare2At < 0 || byteFrequencies[b] < byteFrequencies[m.rare2]):
+			m.rare2, m.rare2At = b, i
+		}
+	}
+	if m.rare2At < 0 {
+		// Every byte of the pattern is the same.
+		m.rare2, m.rare2At = m.rare1, m.rare1At
+	}
+	m.prefilter = byteFrequencies[m.rare1] < commonByteRank
+	return m
+}
+
+// find returns the offset of the first occurrence of the pattern in b, or
+// -1 if there is none.
+func (m *literalMatcher) find(b []byte) int {
+	switch {
+	case len(m.pattern) == 0:
+		return 0
+	case len(m.pattern) == 1:
+		return bytes.IndexByte(b, m.pattern[0])
+	case !m.prefilter:
+		return bytes.Index(b, m.pattern)
+	}
+
+	n := len(m.pattern)
+	misses := 0
+	for pos := 0; pos+n <= len(b); {
+		i := bytes.IndexByte(b[pos+m.rare1At:len(b)-n+m.rare1At+1], m.rare1)
+		if i < 0 {
+			return -1
+		}
+		start := pos + i
+		if b[start+m.rare2At] == m.rare2 && bytes.Equal(b[start:start+n], m.pattern) {
+			return start
+		}
+		pos = start + 1
+
+		// When the rare byte keeps turning up without the pattern around
+		// it, the prefilter costs more than it saves; finish the search
+		// with bytes.Index instead.
+		misses++
+		if misses >= prefilterMaxMisses && pos < misses*prefilterMinSkip {
+			if j := bytes.Index(b[pos:], m.pattern); j >= 0 {
+				return pos + j
+			}
+			return -1
+		}
+	}
+	return -1
+}
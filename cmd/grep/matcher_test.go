@@ -0,0 +1,114 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"math/rand"
+	"testing"
+)
+
+// benchHaystack builds a log-like buffer resembling the bench/corpus
+// access.log, with "TODO" on some lines and no rare pattern at all.
+func benchHaystack() []byte {
+	levels := []string{"DEBUG", "INFO", "WARN", "ERROR", "FATAL"}
+	messages := []string{"Request received", "Cache hit", "Query executed", "TODO: investigate", "Retry attempt"}
+	rng := rand.New(rand.NewSource(1))
+	var buf bytes.Buffer
+	for i := 0; buf.Len() < 4<<20; i++ {
+		fmt.Fprintf(&buf, `{"timestamp":"2024-01-%02dT%02d:00:00Z","level":"%s","message":"%s","request_id":"req-%08x","extra":"the quick brown fox jumps over the lazy dog"}`+"\n",
+			i%28+1, i%24, levels[rng.Intn(len(levels))], messages[rng.Intn(len(messages))], rng.Uint32())
+	}
+	return buf.Bytes()
+}
+
+func TestLiteralMatcherFind(t *testing.T) {
+	haystack := benchHaystack()[:64<<10]
+	patterns := []string{"", "T", "TODO", "the", "aaaa", "XYZZY_UNLIKELY_PATTERN", "req-", "\"}\n{", "dog\"}"}
+	for _, p := range patterns {
+		m := newLiteralMatcher([]byte(p))
+		for _, start := range []int{0, 1, 100, len(haystack) - 10} {
+			b := haystack[start:]
+			if got, want := m.find(b), bytes.Index(b, []byte(p)); got != want {
+				t.Errorf("find(%q) at %d = %d, want %d", p, start, got, want)
+			}
+		}
+	}
+}
+
+// benchmarkFindAll finds every occurrence of pattern in the haystack, the
+// way searchLines walks a buffer from match to match.
+func benchmarkFindAll(b *testing.B, pattern string) {
+	benchmarkMatcher(b, newLiteralMatcher([]byte(pattern)))
+}
+
+func benchmarkMatcher(b *testing.B, m matcher) {
+	haystack := benchHaystack()
+	b.SetBytes(int64(len(haystack)))
+	b.ResetTimer()
+	for i := 0; i < b.N; i++ {
+		for rest := haystack; ; {
+			j := m.find(rest)
+			if j < 0 {
+				break
+			}
+			rest = rest[j+1:]
+		}
+	}
+}
+
+// The three pattern classes from bench/config.sh.
+
+func BenchmarkFindCommon(b *testing.B)   { benchmarkFindAll(b, "TODO") }
+func BenchmarkFindRare(b *testing.B)     { benchmarkFindAll(b, "XYZZY_UNLIKELY_PATTERN") }
+func BenchmarkFindFrequent(b *testing.B) { benchmarkFindAll(b, "the") }
+
+// requestIDs returns n distinct request IDs in the format used by the log
+// corpus, none of which occur in benchHaystack.
+func requestIDs(n int) [][]byte {
+	ids := make([][]byte, n)
+	for i := range ids {
+		ids[i] = []byte(fmt.Sprintf("req-zz%06x", i))
+	}
+	return ids
+}
+
+func TestAhoCorasickFind(t *testing.T) {
+	haystack := benchHaystack()[:64<<10]
+	sets := [][]string{
+		{"TODO", "FIXME"},
+		{"the", "he", "e l"},
+		{"dog\"}", "\"}\n{"},
+		{"XYZZY", "req-", "ERROR"},
+		{"absent", "missing"},
+	}
+	for _, set := range sets {
+		var patterns [][]byte
+		for _, p := range set {
+			patterns = append(patterns, []byte(p))
+		}
+		ac := newAhoCorasick(patterns)
+		for _, start := range []int{0, 1, 100, len(haystack) - 10} {
+			b := haystack[start:]
+			// The expected match is the one that ends first.
+			want, wantEnd := -1, len(b)+1
+			for _, p := range patterns {
+				if i := bytes.Index(b, p); i >= 0 && i+len(p) < wantEnd {
+					want, wantEnd = i, i+len(p)
+				}
+			}
+			if got := ac.find(b); got != want {
+				t.Errorf("find(%q) at %d = %d, want %d", set, start, got, want)
+			}
+		}
+	}
+}
+
+// BenchmarkAhoCorasick searches for growing numbers of request IDs; the
+// throughput should stay roughly the same across sizes.
+func BenchmarkAhoCorasick(b *testing.B) {
+	for _, n := range []int{10, 100, 1000, 10000} {
+		b.Run(fmt.Sprint(n), func(b *testing.B) {
+			benchmarkMatcher(b, newAhoCorasick(requestIDs(n)))
+		})
+	}
+}
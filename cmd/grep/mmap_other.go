@@ -0,0 +1,18 @@
+//go:build !(linux || darwin || freebsd || netbsd || openbsd || dragonfly)
+
+package main
+
+import (
+	"errors"
+	"os"
+)
+
+var errMmapUnsupported = errors.New("mmap is not supported on this platform")
+
+func mmapFile(f *os.File, size int64) ([]byte, error) {
+	return nil, errMmapUnsupported
+}
+
+func munmapFile(data []byte) error {
+	return nil
+}
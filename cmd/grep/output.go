@@ -0,0 +1,38 @@
+package main
+
+import (
+	"bufio"
+	"io"
+)
+
+// outputBufferSize is the size of the stdout buffer. Matches are written
+// out in batches of this size instead of one write syscall per line.
+const outputBufferSize = 64 * 1024
+
+// output batches matched lines for the underlying writer. With
+// lineBuffered set it flushes at every line boundary instead, so results
+// show up immediately when someone is watching them.
+type output struct {
+	w            *bufio.Writer
+	lineBuffered bool
+}
+
+func newOutput(w io.Writer, lineBuffered bool) *output {
+	return &output{
+		w:            bufio.NewWriterSize(w, outputBufferSize),
+		lineBuffered: lineBuffered,
+	}
+}
+
+func (o *output) Write(p []byte) (int, error) {
+	n, err := o.w.Write(p)
+	if err == nil && o.lineBuffered && n > 0 && p[n-1] == '\n' {
+		err = o.w.Flush()
+	}
+	return n, err
+}
+
+// Flush writes out any buffered output.
+func (o *output) Flush() error {
+	return o.w.Flush()
+}
@@ -0,0 +1,10 @@
+//go:build !(linux || darwin || freebsd || netbsd || openbsd || dragonfly)
+
+package main
+
+import "os"
+
+// fileOwner cannot tell who owns a file on this platform.
+func fileOwner(fi os.FileInfo) (int, bool) {
+	return 0, false
+}
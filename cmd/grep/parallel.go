@@ -0,0 +1,91 @@
+package main
+
+import (
+	"bytes"
+	"io"
+)
+
+// These are variables so that tests can split small inputs.
+var (
+	// parallelMinSize is the smallest mapped file whose search is split
+	// across goroutines.
+	parallelMinSize = 32 * 1024 * 1024
+
+	// parallelChunkSize is the approximate size of the pieces a large
+	// file is split into. Chunks are extended to the next newline so
+	// that no line is split between two of them.
+	parallelChunkSize = 8 * 1024 * 1024
+)
+
+// chunkResult is the buffered output of searching one chunk and the
+// number of matching lines in it.
+type chunkResult struct {
+	out     *bytes.Buffer
+	matches int
+	err     error
+}
+
+// searchParallel searches data, which must hold whole lines, on up to
+// s.opts.parallelism goroutines. data is cut into newline-aligned chunks that
+// are searched concurrently, and their output is written to w in file
+// order. At most twice as many chunks as goroutines are in flight, which
+// bounds the memory held by buffered output.
+func (s *searcher) searchParallel(data []byte, w io.Writer) error {
+	pending := make(chan chan chunkResult, 2*s.opts.parallelism)
+	stop := make(chan struct{})
+	sem := make(chan struct{}, s.opts.parallelism)
+	// Each chunk gets its own copy of the searcher so that per-search
+	// state is never shared between goroutines. The copies are taken from
+	// this snapshot: s itself is updated below while chunks are searched.
+	chunkSearcher := *s
+	chunkSearcher.matches = 0
+
+	go func() {
+		defer close(pending)
+		for start := 0; start < len(data); {
+			end := start + parallelChunkSize
+			if end >= len(data) {
+				end = len(data)
+			} else if i := bytes.IndexByte(data[end:], '\n'); i >= 0 {
+				end += i + 1
+			} else {
+				end = len(data)
+			}
+
+			result := make(chan chunkResult, 1)
+			select {
+			case pending <- result:
+			case <-stop:
+				return
+			}
+			sem <- struct{}{}
+			go func(chunk []byte) {
+				defer func() { <-sem }()
+				cs := chunkSearcher
+				buf := resultBuffers.Get().(*bytes.Buffer)
+				err := cs.searchLines(chunk, 0, buf)
+				result <- chunkResult{out: buf, matches: cs.matches, err: err}
+			}(data[start:end])
+			start = end
+		}
+	}()
+
+	var err error
+	for result := range pending {
+		r := <-result
+		s.matches += r.matches
+		if err == nil {
+			err = r.err
+		}
+		if err == nil {
+			_, err = w.Write(r.out.Bytes())
+		}
+		r.out.Reset()
+		resultBuffers.Put(r.out)
+		if err != nil && stop != nil {
+			close(stop)
+			stop = nil
+		}
+	}
+	return err
+}
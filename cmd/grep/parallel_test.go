@@ -0,0 +1,119 @@
+package main
+
+import (
+	"bytes"
+	"regexp"
+	"testing"
+)
+
+// setParallelSizes makes searchData split inputs of any size into chunks
+// of about chunk bytes for the rest of the test.
+func setParallelSizes(t *testing.T, chunk int) {
+	minSize, chunkSize := parallelMinSize, parallelChunkSize
+	parallelMinSize, parallelChunkSize = 1, chunk
+	t.Cleanup(func() { parallelMinSize, parallelChunkSize = minSize, chunkSize })
+}
+
+// parallelChunkSizes split the test input at every byte, in the middle of
+// most lines, and not at all.
+var parallelChunkSizes = []int{1, 100, 4096, 1 << 30}
+
+// searchParallelOutput searches haystack in memory on four goroutines and
+// returns the output and the number of matching lines.
+func searchParallelOutput(t *testing.T, patterns []string, regex bool, opts searchOptions, haystack []byte) (string, int) {
+	t.Helper()
+	s := newTestSearcher(t, patterns, regex, opts)
+	s.opts.parallelism = 4
+	var out bytes.Buffer
+	if err := s.searchData(haystack, &out); err != nil && err != errStopSearch {
+		t.Fatal(err)
+	}
+	return out.String(), s.matches
+}
+
+// TestSearchParallel checks that a file searched in chunks gives the
+// output of a plain line-by-line search, in file order, with the matches
+// of all chunks counted, whether or not the file ends in a newline.
+func TestSearchParallel(t *testing.T) {
+	lines := benchHaystack()[:256<<10]
+	lines = lines[:bytes.LastIndexByte(lines, '\n')+1]
+	inputs := map[string][]byte{
+		"whole lines":     lines,
+		"no last newline": append(append([]byte("TODO first\n"), lines...), "last TODO"...),
+	}
+
+	for _, c := range []struct {
+		name     string
+		patterns []string
+		regex    bool
+		opts     searchOptions
+	}{
+		{name: "lines", patterns: []string{"TODO"}},
+		{name: "filename", patterns: []string{"TODO"}, opts: searchOptions{withFilename: true}},
+		{name: "count", patterns: []string{"TODO"}, opts: searchOptions{outputMode: outputCount}},
+		{name: "many", patterns: []string{"TODO", "FATAL", "req-0000"}},
+		{name: "regex", patterns: []string{`"level":"(WARN|ERROR)"|TODO$`}, regex: true},
+		{name: "max-count", patterns: []string{"TODO"}, opts: searchOptions{maxCount: 7}},
+	} {
+		re := regexp.MustCompile(c.patterns[0])
+		match := func(line []byte) bool {
+			line = bytes.TrimSuffix(line, newline)
+			if c.regex {
+				return re.Match(line)
+			}
+			for _, p := range c.patterns {
+				if bytes.Contains(line, []byte(p)) {
+					return true
+				}
+			}
+			return false
+		}
+
+		limit := c.opts.maxCount
+		if limit == 0 {
+			limit = -1
+		}
+		for input, haystack := range inputs {
+			var want bytes.Buffer
+			wantMatches := 0
+			for _, line := range bytes.SplitAfter(haystack, newline) {
+				if len(line) == 0 || !match(line) || wantMatches == limit {
+					continue
+				}
+				wantMatches++
+				if c.opts.outputMode == outputCount {
+					continue
+				}
+				if c.opts.withFilename {
+					want.WriteString("access.log:")
+				}
+				want.Write(line)
+				if line[len(line)-1] != '\n' {
+					want.WriteByte('\n')
+				}
+			}
+
+			for _, chunk := range parallelChunkSizes {
+				setParallelSizes(t, chunk)
+				got, matches := searchParallelOutput(t, c.patterns, c.regex, c.opts, haystack)
+				if got != want.String() || matches != wantMatches {
+					t.Errorf("%s, %s, chunks of %d: %d bytes of output and %d matches, want %d bytes and %d",
+						c.name, input, chunk, len(got), matches, want.Len(), wantMatches)
+				}
+			}
+		}
+	}
+}
+
+// TestSearchParallelContext checks that context output, which is not
+// split into chunks, is unaffected by the parallel search of large files.
+func TestSearchParallelContext(t *testing.T) {
+	haystack := benchHaystack()[:64<<10]
+	haystack = haystack[:bytes.LastIndexByte(haystack, '\n')+1]
+	setParallelSizes(t, 100)
+	opts := searchOptions{withFilename: true, context: true, before: 2, after: 1, maxCount: -1}
+	want := contextLines("access.log", haystack, "FATAL", 2, 1, -1)
+	if got, _ := searchParallelOutput(t, []string{"FATAL"}, false, opts, haystack); got != want {
+		t.Errorf("got %d bytes of output, want %d", len(got), len(want))
+	}
+}
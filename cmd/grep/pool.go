@@ -0,0 +1,115 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"io"
+	"sync"
+)
+
+// fileResult is the output of searching one file, buffered so that
+// concurrent searches never interleave their lines.
+type fileResult struct {
+	seq     int
+	out     *bytes.Buffer
+	matched bool
+	err     error
+
+	// grouped is set when out holds groups of context lines, which are
+	// separated by "--" from those of the files written before.
+	grouped bool
+}
+
+var resultBuffers = sync.Pool{
+	New: func() any { return new(bytes.Buffer) },
+}
+
+// searchPaths searches every file beneath paths with a pool of workers,
+// one searcher each, fed by the walker. Results are written to out as
+// they complete, or in walk order when wopts.ordered is set. In quiet mode
+// the search is abandoned at the first match. Errors are written to
+// stderr. It reports whether any file matched and whether every file was
+// searched without error.
+func searchPaths(m matcher, paths []string, opts searchOptions, wopts walkOptions, workers int, out *output, stderr io.Writer) (matched, ok bool) {
+	// Files are already searched in parallel, so each one is searched on
+	// a single goroutine.
+	opts.parallelism = 1
+
+	jobs := make(chan fileJob, workers)
+	results := make(chan fileResult, workers)
+
+	stop := make(chan struct{})
+	defer close(stop)
+
+	wopts.parallelism = workers
+	go walk(paths, wopts, jobs, stop)
+
+	var wg sync.WaitGroup
+	for i := 0; i < workers; i++ {
+		wg.Add(1)
+		go func() {
+			defer wg.Done()
+			s := newSearcher(m, opts)
+			for job := range jobs {
+				buf := resultBuffers.Get().(*bytes.Buffer)
+				r := fileResult{seq: job.seq, out: buf, err: job.err}
+				if r.err == nil {
+					r.matched, r.err = s.searchPath(job.path, job.explicit, buf)
+					r.grouped = s.withContext()
+				}
+				select {
+				case results <- r:
+				case <-stop:
+					return
+				}
+			}
+		}()
+	}
+	go func() {
+		wg.Wait()
+		close(results)
+	}()
+
+	ok = true
+	grouped := false // whether a group of context lines has been written
+	emit := func(r fileResult) {
+		matched = matched || r.matched
+		if r.err != nil {
+			fmt.Fprintln(stderr, "Error reading file:", r.err)
+			ok = false
+		}
+		// Write errors are sticky in out and reported when it is flushed.
+		if r.grouped && r.out.Len() > 0 {
+			if grouped {
+				out.Write(contextSeparator)
+			}
+			grouped = true
+		}
+		out.Write(r.out.Bytes())
+		r.out.Reset()
+		resultBuffers.Put(r.out)
+	}
+
+	pending := make(map[int]fileResult)
+	next := 0
+	for r := range results {
+		if opts.outputMode == outputQuiet && r.matched {
+			return true, ok
+		}
+		if !wopts.ordered {
+			emit(r)
+			continue
+		}
+		pending[r.seq] = r
+		for {
+			r, found := pending[next]
+			if !found {
+				break
+			}
+			delete(pending, next)
+			emit(r)
+			next++
+		}
+	}
+	return matched, ok
+}
@@ -0,0 +1,7 @@
+//go:build race
+
+package main
+
+// raceEnabled reports whether the race detector is on. It drops sync.Pool
+// items at random, so code that reuses pooled state allocates anyway.
+const raceEnabled = true
@@ -0,0 +1,206 @@
+package main
+
+import (
+	"bytes"
+	"regexp"
+	"regexp/syntax"
+	"strings"
+	"unicode/utf8"
+)
+
+// maxPrefilterLiterals caps the number of alternative literals extracted
+// from a regex. Beyond it the prefilter would match too often to pay for
+// itself.
+const maxPrefilterLiterals = 64
+
+// regexMatcher finds lines matching a regular expression.
+//
+// Running the regex engine over every line is slow, so literals that any
+// match must contain are extracted from the pattern and searched for
+// first with a literal or Aho-Corasick matcher across the whole buffer.
+// The regex only runs on the lines where one of them occurs. Patterns
+// with no usable literal fall back to running the regex line by line.
+type regexMatcher struct {
+	re        *regexp.Regexp
+	prefilter matcher
+}
+
+// newRegexMatcher compiles patterns into a single matcher that matches a
+// line if any of them does. Patterns that turn out to be plain literals
+// skip the regex engine entirely.
+func newRegexMatcher(patterns [][]byte) (matcher, error) {
+	exprs := make([]string, len(patterns))
+	literals := make([][]byte, len(patterns))
+	for i, p := range patterns {
+		if _, err := regexp.Compile(string(p)); err != nil {
+			return nil, err
+		}
+		if lit, ok := literalPattern(string(p)); ok && literals != nil {
+			literals[i] = lit
+		} else {
+			literals = nil
+		}
+		exprs[i] = "(?:" + string(p) + ")"
+	}
+	if literals != nil {
+		return newMatcher(literals), nil
+	}
+
+	expr := strings.Join(exprs, "|")
+	re, err := regexp.Compile(expr)
+	if err != nil {
+		return nil, err
+	}
+	m := &regexMatcher{re: re}
+
+	parsed, err := syntax.Parse(expr, syntax.Perl)
+	if err != nil {
+		return nil, err
+	}
+	if literals := requiredLiterals(parsed.Simplify()); literals != nil {
+		m.prefilter = newMatcher(literals)
+	}
+	return m, nil
+}
+
+// find returns the offset of the start of the first line of b that the
+// regex matches, or -1.
+func (m *regexMatcher) find(b []byte) int {
+	for pos := 0; pos < len(b); {
+		start := pos
+		if m.prefilter != nil {
+			i := m.prefilter.find(b[pos:])
+			if i < 0 {
+				return -1
+			}
+			start = pos + bytes.LastIndexByte(b[pos:pos+i], '\n') + 1
+		}
+		end := len(b)
+		if j := bytes.IndexByte(b[start:], '\n'); j >= 0 {
+			end = start + j
+		}
+		if m.re.Match(b[start:end]) {
+			return start
+		}
+		pos = end + 1
+	}
+	return -1
+}
+
+// requiredLiterals returns a set of literals at least one of which occurs
+// in every match of re, or nil if no useful set can be derived.
+func requiredLiterals(re *syntax.Regexp) [][]byte {
+	switch re.Op {
+	case syntax.OpLiteral:
+		if re.Flags&syntax.FoldCase != 0 {
+			return nil
+		}
+		return [][]byte{runesToBytes(re.Rune)}
+
+	case syntax.OpCapture, syntax.OpPlus:
+		return requiredLiterals(re.Sub[0])
+
+	case syntax.OpRepeat:
+		if re.Min < 1 {
+			return nil
+		}
+		return requiredLiterals(re.Sub[0])
+
+	case syntax.OpConcat:
+		// Adjacent literals are joined so "foo" "bar" yields "foobar";
+		// the best set found in any part of the concatenation is used.
+		var best [][]byte
+		consider := func(set [][]byte) {
+			if betterLiterals(set, best) {
+				best = set
+			}
+		}
+		var lit []byte
+		for _, sub := range re.Sub {
+			if sub.Op == syntax.OpLiteral && sub.Flags&syntax.FoldCase == 0 {
+				lit = append(lit, runesToBytes(sub.Rune)...)
+				continue
+			}
+			if lit != nil {
+				consider([][]byte{lit})
+				lit = nil
+			}
+			consider(requiredLiterals(sub))
+		}
+		if lit != nil {
+			consider([][]byte{lit})
+		}
+		return best
+
+	case syntax.OpAlternate:
+		var set [][]byte
+		for _, sub := range re.Sub {
+			lits := requiredLiterals(sub)
+			if lits == nil {
+				return nil
+			}
+			set = append(set, lits...)
+		}
+		if len(set) > maxPrefilterLiterals {
+			return nil
+		}
+		return set
+	}
+	return nil
+}
+
+// betterLiterals reports whether set is a more selective prefilter than
+// best: its shortest literal is longer, or as long with fewer
+// alternatives.
+func betterLiterals(set, best [][]byte) bool {
+	if set == nil {
+		return false
+	}
+	if best == nil {
+		return shortest(set) > 0
+	}
+	if a, b := shortest(set), shortest(best); a != b {
+		return a > b
+	}
+	return len(set) < len(best)
+}
+
+func shortest(set [][]byte) int {
+	n := -1
+	for _, lit := range set {
+		if n < 0 || len(lit) < n {
+			n = len(lit)
+		}
+	}
+	return n
+}
+
+func runesToBytes(runes []rune) []byte {
+	var b []byte
+	for _, r := range runes {
+		b = utf8.AppendRune(b, r)
+	}
+	return b
+}
+
+// literalPattern returns the string expr matches if it is a plain
+// literal that a substring search finds on exactly the lines the regex
+// matches. Anchors, case folding and newlines all rule that out, although
+// regexp's LiteralPrefix reports "^foo$" and "a\nb" as complete literals.
+func literalPattern(expr string) ([]byte, bool) {
+	re, err := syntax.Parse(expr, syntax.Perl)
+	if err != nil {
+		return nil, false
+	}
+	switch re = re.Simplify(); re.Op {
+	case syntax.OpEmptyMatch:
+		return []byte{}, true
+	case syntax.OpLiteral:
+		lit := runesToBytes(re.Rune)
+		if re.Flags&syntax.FoldCase != 0 || bytes.IndexByte(lit, '\n') >= 0 {
+			return nil, false
+		}
+		return lit, true
+	}
+	return nil, false
+}
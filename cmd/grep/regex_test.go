@@ -0,0 +1,279 @@
+package main
+
+import (
+	"bytes"
+	"fmt"
+	"io"
+	"os"
+	"path/filepath"
+	"regexp"
+	"regexp/syntax"
+	"strings"
+	"testing"
+)
+
+// alternationOf returns an alternation of n literals that the parser
+// cannot factor into a shorter expression.
+func alternationOf(n int) string {
+	words := make([]string, n)
+	for i := range words {
+		words[i] = fmt.Sprintf("%c%cx", 'a'+i%26, 'a'+i/26)
+	}
+	return strings.Join(words, "|")
+}
+
+// requiredLiteralsTests give the literals extracted from each expression
+// after Simplify, or, with raw, as parsed. A nil want means no literal
+// set: the regex has to run on every line.
+var requiredLiteralsTests = []struct {
+	expr string
+	raw  bool
+	want []string
+}{
+	{expr: "foo", want: []string{"foo"}},
+	{expr: "héllo", want: []string{"héllo"}},
+	// Literals next to each other are joined; elsewhere the longest
+	// literal of a concatenation wins, or the first of equal length.
+	{expr: `foo\d+bar`, want: []string{"foo"}},
+	{expr: `x\d+bar`, want: []string{"bar"}},
+	{expr: `\bword\b`, want: []string{"word"}},
+	{expr: `^foo$`, want: []string{"foo"}},
+	{expr: `a.b`, want: []string{"a"}},
+	{expr: `[ab]cd`, want: []string{"cd"}},
+	{expr: `[a]bc`, want: []string{"abc"}},
+	// Usable only to prefilter: no line contains the literal, so the
+	// regex never runs and nothing matches.
+	{expr: `a\nb`, want: []string{"a\nb"}},
+	// A group is not joined with the literals around it.
+	{expr: `ab(cd)ef`, want: []string{"ab"}},
+	{expr: `ab(cde)f`, want: []string{"cde"}},
+	// Case-insensitive literals are of no use to a byte matcher.
+	{expr: `(?i)foo`},
+	{expr: `(?i)123`},
+	{expr: `foo(?i:bar)baz`, want: []string{"foo"}},
+	{expr: `f(?i:o)obar`, want: []string{"obar"}},
+	// Any branch of an alternation may match, so every branch must
+	// contribute a literal, and the set is compared with the other parts
+	// of a concatenation as a whole.
+	{expr: `a|bc|def`, want: []string{"a", "bc", "def"}},
+	{expr: `x(foo|bar)`, want: []string{"foo", "bar"}},
+	{expr: `(foo|bar)bazqux`, want: []string{"bazqux"}},
+	{expr: `(ab|cd)(efg|hij)`, want: []string{"efg", "hij"}},
+	{expr: `"level":"(WARN|ERROR)"`, want: []string{`"level":"`}},
+	{expr: `foo|(?i)bar`},
+	{expr: `foo|b*`},
+	{expr: alternationOf(maxPrefilterLiterals), want: strings.Split(alternationOf(maxPrefilterLiterals), "|")},
+	{expr: alternationOf(maxPrefilterLiterals + 1)},
+	// A repeated literal occurs in a match only if it is repeated at
+	// least once.
+	{expr: `(abc)+`, want: []string{"abc"}},
+	{expr: `(abc)*`},
+	{expr: `(abc)?`},
+	{expr: `a{2,3}`, want: []string{"aa"}},
+	{expr: `a{2,3}`, raw: true, want: []string{"a"}},
+	{expr: `(abc){2}`, raw: true, want: []string{"abc"}},
+	{expr: `(abc){0,2}`, raw: true},
+	{expr: `(abc){0,2}`},
+	{expr: ``},
+	{expr: `(?s).`},
+}
+
+func TestRequiredLiterals(t *testing.T) {
+	for _, c := range requiredLiteralsTests {
+		re, err := syntax.Parse(c.expr, syntax.Perl)
+		if err != nil {
+			t.Fatal(err)
+		}
+		if !c.raw {
+			re = re.Simplify()
+		}
+		got := requiredLiterals(re)
+		if (got == nil) != (c.want == nil) || !equalLiterals(got, c.want) {
+			t.Errorf("requiredLiterals(%q) (raw %v) = %q, want %q", c.expr, c.raw, got, c.want)
+		}
+	}
+}
+
+func equalLiterals(got [][]byte, want []string) bool {
+	if len(got) != len(want) {
+		return false
+	}
+	for i := range got {
+		if string(got[i]) != want[i] {
+			return false
+		}
+	}
+	return true
+}
+
+func TestIndexLiterals(t *testing.T) {
+	for _, c := range []struct {
+		patterns []string
+		extended bool
+		want     []string
+	}{
+		{[]string{"a.b", "(x"}, false, []string{"a.b", "(x"}},
+		{[]string{"foo"}, true, []string{"foo"}},
+		{[]string{"foo", `ba[rz]\d`}, true, []string{"foo", "ba"}},
+		{[]string{"foo", "(?i)bar"}, true, nil},
+		{[]string{"(x"}, true, nil},
+	} {
+		var patterns [][]byte
+		for _, p := range c.patterns {
+			patterns = append(patterns, []byte(p))
+		}
+		got := indexLiterals(patterns, c.extended)
+		if (got == nil) != (c.want == nil) || !equalLiterals(got, c.want) {
+			t.Errorf("indexLiterals(%q, %v) = %q, want %q", c.patterns, c.extended, got, c.want)
+		}
+	}
+}
+
+// regexCorpus has lines a prefilter could get wrong: matches at the ends
+// of lines and of the buffer, case variants, multibyte characters, empty
+// lines, a literal split across two lines and a last line with no newline.
+const regexCorpus = "foo\n\nFOO bar\ncafé TODO\nx\ntodo\nfooba\n\nxxy\nfoo bar\nx foo bar\na\nb\nCache hit\nbarfoo\nlast foo"
+
+// regexMatcherTests are the pattern sets TestRegexMatcherLines runs. literal
+// is whether newRegexMatcher should skip the regex engine, and prefilter
+// whether it should narrow the regex down to the lines with a literal.
+var regexMatcherTests = []struct {
+	patterns  []string
+	literal   bool
+	prefilter bool
+}{
+	{[]string{"TODO"}, true, false},
+	{[]string{"TODO", "Retry"}, true, false},
+	{[]string{`a\.b`, `\Q"}\E`}, true, false},
+	{[]string{""}, true, false},
+	{[]string{"", "foo"}, true, false},
+	// Anchors and newlines make a literal regex more than a substring.
+	{[]string{"^foo$"}, false, true},
+	{[]string{`\Afoo\z`}, false, true},
+	{[]string{`^foo bar$`, "TODO"}, false, true},
+	{[]string{`a\nb`}, false, true},
+	{[]string{"(?i)foo"}, false, false},
+	{[]string{"T.DO"}, false, true},
+	{[]string{"(?i)todo"}, false, false},
+	{[]string{"(?i:QUICK) brown"}, false, true},
+	{[]string{`"level":"(WARN|ERROR)"`}, false, true},
+	{[]string{`req-[0-9a-f]{8}`}, false, true},
+	{[]string{`req-0+[1-9]`}, false, true},
+	{[]string{`(FATAL|DEBUG).*Retry`}, false, true},
+	{[]string{`^\{"timestamp"`, `^foo`}, false, true},
+	{[]string{`dog"\}$`, `foo$`}, false, true},
+	{[]string{`\bfox\b`}, false, true},
+	{[]string{`2024-01-(0[1-9]|1[0-2])T`}, false, true},
+	{[]string{`Cache (hit|miss)`}, false, true},
+	{[]string{`x+y`}, false, true},
+	{[]string{`fo[xo]`, `caf.`}, false, true},
+	{[]string{`(?:ab|cd)*`}, false, false},
+	{[]string{`[A-Z]{5}`}, false, false},
+	{[]string{`lazy|jumps|absent`}, false, true},
+	{[]string{"FATAL", "req-0[0-9]"}, false, true},
+	{[]string{"FATAL", "[0-9]{3}"}, false, false},
+}
+
+// matchingLines returns the offsets of the lines of b that m matches,
+// found the way the searcher walks a buffer.
+func matchingLines(m matcher, b []byte) []int {
+	var starts []int
+	for pos := 0; pos < len(b); {
+		i := m.find(b[pos:])
+		if i < 0 {
+			break
+		}
+		start := pos + bytes.LastIndexByte(b[pos:pos+i], '\n') + 1
+		starts = append(starts, start)
+		end := bytes.IndexByte(b[pos+i:], '\n')
+		if end < 0 {
+			break
+		}
+		pos += i + end + 1
+	}
+	return starts
+}
+
+// TestRegexMatcherLines checks that newRegexMatcher matches the lines the
+// regexp package matches, with any of the patterns, one line at a time.
+func TestRegexMatcherLines(t *testing.T) {
+	haystack := benchHaystack()[:256<<10]
+	haystack = haystack[:bytes.LastIndexByte(haystack, '\n')+1]
+	for _, c := range regexMatcherTests {
+		var patterns [][]byte
+		var res []*regexp.Regexp
+		for _, p := range c.patterns {
+			patterns = append(patterns, []byte(p))
+			res = append(res, regexp.MustCompile(p))
+		}
+		m, err := newRegexMatcher(patterns)
+		if err != nil {
+			t.Fatal(err)
+		}
+		rm, isRegex := m.(*regexMatcher)
+		if isRegex == c.literal || isRegex && (rm.prefilter != nil) != c.prefilter {
+			t.Errorf("%q: regex %v, prefilter %v; want regex %v, prefilter %v",
+				c.patterns, isRegex, isRegex && rm.prefilter != nil, !c.literal, c.prefilter)
+		}
+
+		for _, corpus := range [][]byte{[]byte(regexCorpus), haystack} {
+			var want []int
+			for start := 0; start < len(corpus); {
+				end := bytes.IndexByte(corpus[start:], '\n')
+				if end < 0 {
+					end = len(corpus)
+				} else {
+					end += start
+				}
+				for _, re := range res {
+					if re.Match(corpus[start:end]) {
+						want = append(want, start)
+						break
+					}
+				}
+				start = end + 1
+			}
+			got := matchingLines(m, corpus)
+			if fmt.Sprint(got) != fmt.Sprint(want) {
+				t.Errorf("%q on %d bytes: %d matching lines, want %d (first difference at line offset %d)",
+					c.patterns, len(corpus), len(got), len(want), firstDifference(got, want))
+			}
+		}
+	}
+}
+
+// TestRegexLiteralAnchors checks that a regex made of a literal and
+// anchors or a newline is not searched for as a plain string.
+func TestRegexLiteralAnchors(t *testing.T) {
+	file := filepath.Join(t.TempDir(), "f")
+	if err := os.WriteFile(file, []byte("foo bar\nx foo bar\na\nb\n"), 0o644); err != nil {
+		t.Fatal(err)
+	}
+	for _, c := range []struct {
+		pattern string
+		status  int
+		want    string
+	}{
+		{"^foo bar$", exitMatch, "foo bar\n"},
+		{`\Afoo bar\z`, exitMatch, "foo bar\n"},
+		{"foo bar", exitMatch, "foo bar\nx foo bar\n"},
+		{`a\nb`, exitNoMatch, ""},
+	} {
+		var stdout bytes.Buffer
+		if status := run([]string{"-E", c.pattern, file}, &stdout, io.Discard, nil); status != c.status || stdout.String() != c.want {
+			t.Errorf("-E %q: exit status %d, output %q; want %d, %q", c.pattern, status, stdout.String(), c.status, c.want)
+		}
+	}
+}
+
+func firstDifference(a, b []int) int {
+	for i := range a {
+		if i >= len(b) || a[i] != b[i] {
+			return a[i]
+		}
+	}
+	if len(b) > len(a) {
+		return b[len(a)]
+	}
+	return -1
+}
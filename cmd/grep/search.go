@@ -0,0 +1,516 @@
+package main
+
+import (
+	"bytes"
+	"errors"
+	"fmt"
+	"io"
+	"os"
+	"strconv"
+	"sync/atomic"
+)
+
+// readBufferSize is the initial size of the reusable read buffer. It grows
+// while reads keep filling it, up to maxReadBufferSize, so a fast file or
+// pipe is read in fewer, larger reads while a slow one such as `tail -f`
+// keeps a small buffer. Beyond that it only grows when a single line does
+// not fit, so peak memory is bounded by the longest line rather than by
+// the size of the input.
+const readBufferSize = 64 * 1024
+
+// maxReadBufferSize is the size up to which the read buffer follows the
+// size of reads.
+const maxReadBufferSize = 1024 * 1024
+
+// stdinName is the path that stands for standard input on the command line
+// and stdinLabel the name it is reported under, as in grep.
+const (
+	stdinName  = "-"
+	stdinLabel = "(standard input)"
+)
+
+// mmapMinSize is the smallest regular file that is searched through a
+// memory map. Below it, setting up and tearing down the mapping costs more
+// than copying the data through the read buffer.
+const mmapMinSize = 4 * 1024 * 1024
+
+// binarySniffSize is how much of the start of a file is checked for NUL
+// bytes to decide whether it is binary.
+const binarySniffSize = 64 * 1024
+
+var newline = []byte{'\n'}
+
+// errStopSearch is returned by the search loops when the rest of a file
+// does not need to be read. searchPath treats it as success.
+var errStopSearch = errors.New("search stopped")
+
+// binaryMode says what to do with a file whose first block contains a NUL
+// byte.
+type binaryMode int
+
+const (
+	// binaryAuto uses binaryMatches for files named on the command line
+	// and binarySkip for files found while walking a directory.
+	binaryAuto binaryMode = iota
+	// binaryMatches prints "Binary file X matches" instead of the
+	// matching lines and stops at the first match.
+	binaryMatches
+	// binarySkip stops reading the file as soon as it looks binary.
+	binarySkip
+	// binaryText searches binary files like any other.
+	binaryText
+)
+
+// outputMode says what is reported about the matching lines.
+type outputMode int
+
+const (
+	// outputLines prints every matching line.
+	outputLines outputMode = iota
+	// outputCount prints the number of matching lines per file (-c).
+	outputCount
+	// outputFilesWithMatches prints the name of each file with a match
+	// and stops reading it at the first one (-l).
+	outputFilesWithMatches
+	// outputQuiet prints nothing and stops at the first match (-q).
+	outputQuiet
+)
+
+// searchStats counts the work done by all searchers, for --stats.
+type searchStats struct {
+	filesSearched atomic.Int64
+	filesBinary   atomic.Int64
+	bytesSearched atomic.Int64
+	bytesSkipped  atomic.Int64
+}
+
+func (st *searchStats) print(w io.Writer) {
+	fmt.Fprintf(w, "%d files searched\n", st.filesSearched.Load())
+	fmt.Fprintf(w, "%d files detected as binary\n", st.filesBinary.Load())
+	fmt.Fprintf(w, "%d bytes searched\n", st.bytesSearched.Load())
+	fmt.Fprintf(w, "%d bytes skipped\n", st.bytesSkipped.Load())
+}
+
+// searchOptions control how a searcher treats each file.
+type searchOptions struct {
+	// parallelism is the number of goroutines a single large file may be
+	// searched on.
+	parallelism int
+
+	// withFilename prefixes every matched line with the file's path.
+	withFilename bool
+
+	binaryMode binaryMode
+	outputMode outputMode
+
+	// before and after are the numbers of context lines to print around
+	// each match (-B, -A).
+	before, after int
+
+	// context is set when -A, -B or -C was given, even as 0: as in grep,
+	// groups of lines that are not adjacent are then separated by "--".
+	context bool
+
+	// maxCount stops the search of a file after that many matching lines
+	// (-m); it is negative when there is no limit.
+	maxCount int
+
+	// decompress searches the decompressed contents of compressed files
+	// (-z).
+	decompress bool
+
+	// cache, if not nil, supplies file contents kept by `grep serve`.
+	cache *fileCache
+
+	// stats, if not nil, accumulates counters for --stats.
+	stats *searchStats
+}
+
+// searcher scans input line by line through a fixed-size buffer that is
+// reused across reads. Bytes after the last newline of a read are carried
+// over to the front of the buffer, so a line that straddles two reads is
+// still searched as a whole.
+type searcher struct {
+	matcher matcher
+	opts    searchOptions
+	buf     []byte
+
+	// The fields below describe the file being searched.
+
+	// name is the file's path as given or found by the walker.
+	name string
+
+	// prefix is written before every matched line, e.g. "path:" when
+	// searching more than one file, and contextPrefix ("path-") before
+	// every context line.
+	prefix, contextPrefix []byte
+
+	// binaryMode is opts.binaryMode resolved for this file.
+	binaryMode binaryMode
+
+	// binary is set once the file has been found to be binary and is
+	// being searched only to report whether it matches.
+	binary bool
+
+	// scanned counts the bytes of the file that were searched.
+	scanned int64
+
+	// matches counts the matching lines found in the file.
+	matches int
+
+	// base is the offset in the file of the chunk passed to searchLines.
+	base int64
+
+	// printedTo is the offset in the file just past the last line printed
+	// with context, or -1 if none has been. Context lines are never
+	// printed twice, and "--" separates groups that are not adjacent.
+	printedTo int64
+
+	// afterLeft is the number of after-context lines still to print,
+	// carried over from one chunk to the next.
+	afterLeft int
+
+	// stoppedAt is the offset, in the chunk passed to searchLines, just
+	// past the line at which it last stopped early.
+	stoppedAt int
+
+	// scratch is reused to format counts without allocating.
+	scratch []byte
+}
+
+func newSearcher(m matcher, opts searchOptions) *searcher {
+	return &searcher{
+		matcher: m,
+		opts:    opts,
+		buf:     make([]byte, readBufferSize),
+	}
+}
+
+// searchPath opens and searches the file at path, or searches its
+// contents in the cache if they are there. A path of "-" is standard
+// input. explicit says whether the path was named on the command line
+// rather than found by the walker. It reports whether the file contained a
+// match.
+func (s *searcher) searchPath(path string, explicit bool, w io.Writer) (bool, error) {
+	var err error
+	if path == stdinName {
+		s.reset(stdinLabel, explicit)
+		err = s.searchFile(os.Stdin, w)
+	} else if data, ok := s.cachedFile(path); ok {
+		s.reset(path, explicit)
+		err = s.searchCached(data, w)
+	} else {
+		var f *os.File
+		if f, err = os.Open(path); err != nil {
+			return false, err
+		}
+		defer f.Close()
+		s.reset(path, explicit)
+		err = s.searchFile(f, w)
+	}
+	if err == errStopSearch {
+		err = nil
+	}
+	if err == nil && s.opts.outputMode == outputCount {
+		s.scratch = append(append(s.scratch[:0], s.prefix...), strconv.Itoa(s.matches)...)
+		s.scratch = append(s.scratch, '\n')
+		_, err = w.Write(s.scratch)
+	}
+	return s.matches > 0, err
+}
+
+// reset prepares the searcher for the file at path.
+func (s *searcher) reset(path string, explicit bool) {
+	s.name = path
+	s.prefix = s.prefix[:0]
+	s.contextPrefix = s.contextPrefix[:0]
+	if s.opts.withFilename {
+		s.prefix = append(append(s.prefix, path...), ':')
+		s.contextPrefix = append(append(s.contextPrefix, path...), '-')
+	}
+	s.binaryMode = s.opts.binaryMode
+	if s.binaryMode == binaryAuto {
+		if explicit {
+			s.binaryMode = binaryMatches
+		} else {
+			s.binaryMode = binarySkip
+		}
+	}
+	s.binary = false
+	s.scanned = 0
+	s.matches = 0
+	s.base = 0
+	s.printedTo = -1
+	s.afterLeft = 0
+}
+
+// cachedFile returns the contents of the file at path from the cache, if
+// the searcher has one and the file is worth caching. Compressed files
+// are always read through searchFile.
+func (s *searcher) cachedFile(path string) ([]byte, bool) {
+	if s.opts.cache == nil || s.opts.decompress {
+		return nil, false
+	}
+	return s.opts.cache.readFile(path)
+}
+
+// searchCached searches data, the cached contents of the file.
+func (s *searcher) searchCached(data []byte, w io.Writer) error {
+	if s.opts.maxCount == 0 {
+		return nil
+	}
+	if s.opts.stats != nil {
+		defer s.recordStats(int64(len(data)))
+	}
+	return s.searchData(data, w)
+}
+
+// recordStats adds the file, of the given size or -1 if unknown, to the
+// counters for --stats.
+func (s *searcher) recordStats(size int64) {
+	st := s.opts.stats
+	st.filesSearched.Add(1)
+	st.bytesSearched.Add(s.scanned)
+	if size > s.scanned {
+		st.bytesSkipped.Add(size - s.scanned)
+	}
+}
+
+// searchFile searches f in place through a read-only memory map when it is
+// a large regular file, splitting the search across goroutines when the
+// file is big enough to keep several cores busy. Pipes, devices, files
+// that report no size (such as those under /proc), small files and files
+// that cannot be mapped are read through the buffer instead, as are
+// compressed files with -z.
+func (s *searcher) searchFile(f *os.File, w io.Writer) error {
+	if s.opts.maxCount == 0 {
+		return nil
+	}
+
+	var size int64 = -1
+	if fi, err := f.Stat(); err == nil && fi.Mode().IsRegular() {
+		size = fi.Size()
+	}
+	if s.opts.stats != nil {
+		defer func() { s.recordStats(size) }()
+	}
+
+	if s.opts.decompress {
+		r, err := openDecompressed(f, size >= 0)
+		if err != nil {
+			return err
+		}
+		if r != nil {
+			defer r.Close()
+			// The size of the decompressed data is not known.
+			size = -1
+			return s.search(r, w)
+		}
+	}
+
+	if data := mapLargeFile(f, size); data != nil {
+		defer munmapFile(data)
+		return s.searchData(data, w)
+	}
+	return s.search(f, w)
+}
+
+// searchData searches data, the whole contents of the file in memory,
+// splitting the search across goroutines when it is big enough.
+func (s *searcher) searchData(data []byte, w io.Writer) error {
+	s.scanned = int64(min(len(data), binarySniffSize))
+	if err := s.checkBinary(data[:s.scanned]); err != nil {
+		return err
+	}
+	s.scanned = int64(len(data))
+	if s.opts.parallelism > 1 && len(data) >= parallelMinSize && s.splittable() {
+		return s.searchParallel(data, w)
+	}
+	err := s.searchLines(data, 0, w)
+	if err == errStopSearch {
+		s.scanned = int64(s.stoppedAt)
+	}
+	return err
+}
+
+// mapLargeFile returns f mapped into memory, or nil if f should be read
+// through the buffer instead. size is the size of f if it is a regular
+// file and -1 otherwise.
+func mapLargeFile(f *os.File, size int64) []byte {
+	if size < mmapMinSize || int64(int(size)) != size {
+		return nil
+	}
+	data, err := mmapFile(f, size)
+	if err != nil {
+		return nil
+	}
+	return data
+}
+
+// splittable reports whether the current file may be searched as
+// independent chunks: every match must be reported on its own, without
+// context lines, a match limit or an early stop.
+func (s *searcher) splittable() bool {
+	return !s.binary && s.opts.maxCount < 0 && !s.withContext() &&
+		(s.opts.outputMode == outputLines || s.opts.outputMode == outputCount)
+}
+
+// checkBinary sniffs the first block of a file for a NUL byte and, if it
+// finds one, applies the file's binary mode. It returns errStopSearch if
+// the rest of the file should not be searched.
+func (s *searcher) checkBinary(head []byte) error {
+	if s.binaryMode == binaryText || bytes.IndexByte(head, 0) < 0 {
+		return nil
+	}
+	if st := s.opts.stats; st != nil {
+		st.filesBinary.Add(1)
+	}
+	if s.binaryMode == binarySkip {
+		return errStopSearch
+	}
+	s.binary = true
+	return nil
+}
+
+// search reads r to the end and writes every line containing a match to
+// w. The buffer grows, for this and later files, while reads fill all the
+// space they are given.
+//
+// When context lines are requested, the lines that may still be needed as
+// before-context of a match in the next read are kept at the front of the
+// buffer along with the partial last line, instead of being discarded.
+func (s *searcher) search(r io.Reader, w io.Writer) error {
+	n, from := 0, 0
+	first := true
+	for {
+		space := len(s.buf) - n
+		m, err := r.Read(s.buf[n:])
+		full := m == space
+		n += m
+		s.scanned += int64(m)
+		eof := err == io.EOF
+		if err != nil && !eof {
+			return err
+		}
+
+		if first && (n > 0 || eof) {
+			first = false
+			if err := s.checkBinary(s.buf[:min(n, binarySniffSize)]); err != nil {
+				return err
+			}
+		}
+
+		end := n
+		if !eof {
+			end = bytes.LastIndexByte(s.buf[:n], '\n') + 1
+		}
+		if err := s.searchLines(s.buf[:end], from, w); err != nil {
+			return err
+		}
+		if eof {
+			return nil
+		}
+
+		keep := end
+		if s.withContext() {
+			keep = s.beforeContextStart(s.buf[:end], end)
+		}
+		n = copy(s.buf, s.buf[keep:n])
+		s.base += int64(keep)
+		from = end - keep
+		if n == len(s.buf) || full && len(s.buf) < maxReadBufferSize {
+			grown := make([]byte, 2*len(s.buf))
+			copy(grown, s.buf)
+			s.buf = grown
+		}
+	}
+}
+
+// searchLines writes the lines of chunk that contain a match to w,
+// starting the search at offset from; the lines before it have already
+// been searched and are only there as possible before-context. The final
+// line of chunk may lack a trailing newline.
+//
+// The matcher runs across the whole chunk rather than line by line; line
+// boundaries are only looked up around a hit, so chunks without a match
+// are never split into lines at all.
+func (s *searcher) searchLines(chunk []byte, from int, w io.Writer) error {
+	if s.withContext() {
+		return s.searchContext(chunk, from, w)
+	}
+	size := len(chunk)
+	chunk = chunk[from:]
+	for len(chunk) > 0 {
+		i := s.matcher.find(chunk)
+		if i < 0 {
+			return nil
+		}
+		start := bytes.LastIndexByte(chunk[:i], '\n') + 1
+		end := len(chunk)
+		if j := bytes.IndexByte(chunk[i:], '\n'); j >= 0 {
+			end = i + j + 1
+		}
+		if err := s.emit(w, chunk[start:end]); err != nil {
+			s.stoppedAt = size - len(chunk) + end
+			return err
+		}
+		chunk = chunk[end:]
+	}
+	return nil
+}
+
+// emit reports a matched line according to the output mode. It returns
+// errStopSearch once nothing more needs to be known about the file,
+// including when the -m limit has been reached.
+func (s *searcher) emit(w io.Writer, line []byte) error {
+	s.matches++
+	if err := s.report(w, line); err != nil {
+		return err
+	}
+	if s.matches == s.opts.maxCount {
+		return errStopSearch
+	}
+	return nil
+}
+
+// report writes what the output mode says to write about a matched line.
+func (s *searcher) report(w io.Writer, line []byte) error {
+	switch s.opts.outputMode {
+	case outputCount:
+		return nil
+	case outputFilesWithMatches:
+		s.scratch = append(append(s.scratch[:0], s.name...), '\n')
+		if _, err := w.Write(s.scratch); err != nil {
+			return err
+		}
+		return errStopSearch
+	case outputQuiet:
+		return errStopSearch
+	}
+	if s.binary {
+		if _, err := fmt.Fprintf(w, "Binary file %s matches\n", s.name); err != nil {
+			return err
+		}
+		return errStopSearch
+	}
+	return s.writeLine(w, s.prefix, line)
+}
+
+// writeLine writes line to w after prefix, terminating it with a newline
+// if it does not already end in one.
+func (s *searcher) writeLine(w io.Writer, prefix, line []byte) error {
+	if len(prefix) > 0 {
+		if _, err := w.Write(prefix); err != nil {
+			return err
+		}
+	}
+	if _, err := w.Write(line); err != nil {
+		return err
+	}
+	if len(line) == 0 || line[len(line)-1] != '\n' {
+		if _, err := w.Write(newline); err != nil {
+			return err
+		}
+	}
+	return nil
+}
@@ -0,0 +1,407 @@
+package main
+
+import (
+	"bufio"
+	"bytes"
+	"fmt"
+	"io"
+	"os"
+	"path/filepath"
+	"strings"
+	"testing"
+)
+
+// searchConfigs are the ways of searching a file whose per-line cost must
+// not include an allocation.
+//
+// The regex engine keeps its matching state in a sync.Pool, with no way to
+// hold it per searcher, so regex configs allocate nothing only while the
+// pool keeps its items: not under the race detector.
+var searchConfigs = []struct {
+	name     string
+	patterns []string
+	regex    bool
+	opts     searchOptions
+}{
+	{name: "lines", patterns: []string{"TODO"}},
+	{name: "frequent", patterns: []string{"the"}},
+	{name: "rare", patterns: []string{"XYZZY_UNLIKELY_PATTERN"}},
+	{name: "filename", patterns: []string{"TODO"}, opts: searchOptions{withFilename: true}},
+	{name: "count", patterns: []string{"TODO"}, opts: searchOptions{outputMode: outputCount}},
+	{name: "max-count", patterns: []string{"TODO"}, opts: searchOptions{maxCount: 1000}},
+	{name: "context", patterns: []string{"TODO"}, opts: searchOptions{before: 2, after: 2}},
+	{name: "many", patterns: []string{"TODO", "FATAL", "req-0000"}},
+	{name: "regex", patterns: []string{`"level":"(WARN|ERROR)"`}, regex: true},
+}
+
+// newTestSearcher returns a searcher for patterns, ready to search a file
+// found by the walker.
+func newTestSearcher(tb testing.TB, patterns []string, regex bool, opts searchOptions) *searcher {
+	tb.Helper()
+	var ps [][]byte
+	for _, p := range patterns {
+		ps = append(ps, []byte(p))
+	}
+	m := newMatcher(ps)
+	if regex {
+		var err error
+		if m, err = newRegexMatcher(ps); err != nil {
+			tb.Fatal(err)
+		}
+	}
+	opts.parallelism = 1
+	if opts.maxCount == 0 {
+		opts.maxCount = -1
+	}
+	s := newSearcher(m, opts)
+	s.reset("access.log", false)
+	return s
+}
+
+// searchAll searches haystack as a file read through the buffer and,
+// with mapped set, as a file in memory, the way a memory-mapped or cached
+// file is.
+func searchAll(s *searcher, r *bytes.Reader, haystack []byte, mapped bool, w io.Writer) error {
+	s.reset(s.name, false)
+	var err error
+	if mapped {
+		err = s.searchData(haystack, w)
+	} else {
+		r.Reset(haystack)
+		err = s.search(r, w)
+	}
+	if err == errStopSearch {
+		err = nil
+	}
+	return err
+}
+
+// TestSearchAllocs checks that searching allocates nothing once the
+// searcher's buffers have grown to fit, however many lines match.
+func TestSearchAllocs(t *testing.T) {
+	haystack := benchHaystack()[:1<<20]
+	for _, c := range searchConfigs {
+		if c.regex && raceEnabled {
+			t.Logf("%s: skipped under the race detector, which empties the regexp package's pools", c.name)
+			continue
+		}
+		for _, mapped := range []bool{false, true} {
+			s := newTestSearcher(t, c.patterns, c.regex, c.opts)
+			r := bytes.NewReader(nil)
+			w := bufio.NewWriterSize(io.Discard, outputBufferSize)
+			search := func() {
+				if err := searchAll(s, r, haystack, mapped, w); err != nil {
+					t.Fatal(err)
+				}
+			}
+			search()
+			if s.matches == 0 && c.name != "rare" {
+				t.Fatalf("%s: no matches", c.name)
+			}
+			if allocs := testing.AllocsPerRun(10, search); allocs != 0 {
+				t.Errorf("%s (mapped %v): %v allocations per search of %d matching lines, want 0",
+					c.name, mapped, allocs, s.matches)
+			}
+		}
+	}
+}
+
+// TestSearchLines checks the lines found by the search loop against a
+// plain line-by-line search.
+func TestSearchLines(t *testing.T) {
+	haystack := benchHaystack()[:256<<10]
+	haystack = haystack[:bytes.LastIndexByte(haystack, '\n')+1]
+	for _, c := range searchConfigs {
+		if c.regex || c.opts.outputMode != outputLines || c.opts.maxCount != 0 || c.opts.before != 0 {
+			continue
+		}
+		var want bytes.Buffer
+		for _, line := range bytes.SplitAfter(haystack, newline) {
+			for _, p := range c.patterns {
+				if bytes.Contains(line, []byte(p)) {
+					if c.opts.withFilename {
+						want.WriteString("access.log:")
+					}
+					want.Write(line)
+					break
+				}
+			}
+		}
+		for _, mapped := range []bool{false, true} {
+			s := newTestSearcher(t, c.patterns, c.regex, c.opts)
+			var got bytes.Buffer
+			if err := searchAll(s, bytes.NewReader(nil), haystack, mapped, &got); err != nil {
+				t.Fatal(err)
+			}
+			if !bytes.Equal(got.Bytes(), want.Bytes()) {
+				t.Errorf("%s (mapped %v): got %d bytes of output, want %d", c.name, mapped, got.Len(), want.Len())
+			}
+		}
+	}
+}
+
+// BenchmarkSearch measures the whole search loop, from reading the file
+// to writing matched lines, for each configuration. Run with -benchmem:
+// allocs/op should be 0.
+func BenchmarkSearch(b *testing.B) {
+	haystack := benchHaystack()
+	for _, c := range searchConfigs {
+		for _, mapped := range []bool{false, true} {
+			name := c.name + "/read"
+			if mapped {
+				name = c.name + "/mmap"
+			}
+			b.Run(name, func(b *testing.B) {
+				s := newTestSearcher(b, c.patterns, c.regex, c.opts)
+				r := bytes.NewReader(nil)
+				w := bufio.NewWriterSize(io.Discard, outputBufferSize)
+				b.SetBytes(int64(len(haystack)))
+				b.ReportAllocs()
+				b.ResetTimer()
+				for i := 0; i < b.N; i++ {
+					if err := searchAll(s, r, haystack, mapped, w); err != nil {
+						b.Fatal(err)
+					}
+				}
+			})
+		}
+	}
+}
+
+// runTest is a command line and the output and exit status expected of
+// it. Arguments starting with "./" name files in the test directory, which
+// the output shows in the same form; "|" stands for a newline in want.
+type runTest struct {
+	args   []string
+	want   string
+	status int
+}
+
+// checkRunTests writes files to a new directory and checks tests against
+// it.
+func checkRunTests(t *testing.T, files map[string]string, tests []runTest) {
+	t.Helper()
+	dir := t.TempDir()
+	for name, content := range files {
+		path := filepath.Join(dir, name)
+		if err := os.MkdirAll(filepath.Dir(path), 0o755); err != nil {
+			t.Fatal(err)
+		}
+		if err := os.WriteFile(path, []byte(content), 0o644); err != nil {
+			t.Fatal(err)
+		}
+	}
+	for _, c := range tests {
+		args := append([]string{"-sort"}, c.args...)
+		for i, arg := range args {
+			if strings.HasPrefix(arg, "./") {
+				args[i] = filepath.Join(dir, arg)
+			}
+		}
+		var stdout bytes.Buffer
+		status := run(args, &stdout, io.Discard, nil)
+		got := strings.ReplaceAll(stdout.String(), dir+string(filepath.Separator), "./")
+		if want := strings.ReplaceAll(c.want, "|", "\n"); got != want || status != c.status {
+			t.Errorf("%q: exit status %d, output %q; want %d, %q", c.args, status, got, c.status, want)
+		}
+	}
+}
+
+// runTestFiles hold matches for "alpha" in a text file and in a binary
+// file, whose NUL byte is on the first line.
+var runTestFiles = map[string]string{
+	"text.txt": "alpha\nbeta\nalpha beta\n",
+	"bin.dat":  "alpha\x00\nbeta\nalpha\n",
+	"two.txt":  "beta\nalpha\n",
+}
+
+// TestBinaryModes checks the binary file modes against GNU grep 3.8, which
+// prints its "binary file matches" message to stderr instead.
+func TestBinaryModes(t *testing.T) {
+	checkRunTests(t, runTestFiles, []runTest{
+		// A file named on the command line is reported as a match.
+		{[]string{"alpha", "./bin.dat"}, "Binary file ./bin.dat matches|", exitMatch},
+		{[]string{"gamma", "./bin.dat"}, "", exitNoMatch},
+		{[]string{"-binary-files", "binary", "alpha", "./bin.dat"}, "Binary file ./bin.dat matches|", exitMatch},
+		{[]string{"-binary-files", "without-match", "alpha", "./bin.dat"}, "", exitNoMatch},
+		{[]string{"-I", "alpha", "./bin.dat"}, "", exitNoMatch},
+		{[]string{"-binary-files", "text", "alpha", "./bin.dat"}, "alpha\x00|alpha|", exitMatch},
+		{[]string{"-a", "alpha", "./bin.dat"}, "alpha\x00|alpha|", exitMatch},
+		{[]string{"-binary-files", "nonsense", "alpha", "./bin.dat"}, "", exitError},
+		// Text files are unaffected.
+		{[]string{"-I", "alpha", "./text.txt"}, "alpha|alpha beta|", exitMatch},
+		// Files found by -r are skipped unless a mode is given.
+		{[]string{"-r", "alpha", "./"}, "./text.txt:alpha|./text.txt:alpha beta|./two.txt:alpha|", exitMatch},
+		{[]string{"-r", "-binary-files", "binary", "alpha", "./"},
+			"Binary file ./bin.dat matches|./text.txt:alpha|./text.txt:alpha beta|./two.txt:alpha|", exitMatch},
+		{[]string{"-r", "-a", "-e", "alpha", "./"},
+			"./bin.dat:alpha\x00|./bin.dat:alpha|./text.txt:alpha|./text.txt:alpha beta|./two.txt:alpha|", exitMatch},
+		// Only the message is suppressed: counts and names are as for text.
+		{[]string{"-c", "alpha", "./text.txt", "./bin.dat"}, "./text.txt:2|./bin.dat:2|", exitMatch},
+		{[]string{"-l", "alpha", "./bin.dat"}, "./bin.dat|", exitMatch},
+	})
+}
+
+// TestOutputModes checks -c, -l and -q, including the exit status when a
+// file cannot be read, against GNU grep 3.8.
+func TestOutputModes(t *testing.T) {
+	checkRunTests(t, runTestFiles, []runTest{
+		{[]string{"-c", "alpha", "./text.txt"}, "2|", exitMatch},
+		{[]string{"-c", "gamma", "./text.txt"}, "0|", exitNoMatch},
+		{[]string{"-c", "-e", "alpha", "-e", "beta", "./text.txt", "./two.txt"}, "./text.txt:3|./two.txt:2|", exitMatch},
+		// Binary files found by -r are skipped, and counted as by grep -I.
+		{[]string{"-c", "-r", "beta", "./"}, "./bin.dat:0|./text.txt:2|./two.txt:1|", exitMatch},
+		{[]string{"-l", "alpha", "./text.txt", "./two.txt"}, "./text.txt|./two.txt|", exitMatch},
+		{[]string{"-l", "alpha beta", "./text.txt", "./two.txt"}, "./text.txt|", exitMatch},
+		{[]string{"-l", "gamma", "./text.txt"}, "", exitNoMatch},
+		{[]string{"-r", "-l", "alpha", "./"}, "./text.txt|./two.txt|", exitMatch},
+		{[]string{"-q", "alpha", "./text.txt"}, "", exitMatch},
+		{[]string{"-q", "gamma", "./text.txt"}, "", exitNoMatch},
+		// An error is an error, unless -q found a match anyway.
+		{[]string{"alpha", "./missing.txt", "./text.txt"}, "./text.txt:alpha|./text.txt:alpha beta|", exitError},
+		{[]string{"-c", "alpha", "./missing.txt", "./text.txt"}, "./text.txt:2|", exitError},
+		{[]string{"-l", "alpha", "./missing.txt", "./text.txt"}, "./text.txt|", exitError},
+		{[]string{"-q", "alpha", "./missing.txt", "./text.txt"}, "", exitMatch},
+		{[]string{"-q", "gamma", "./missing.txt", "./text.txt"}, "", exitError},
+	})
+}
+
+func TestExitStatus(t *testing.T) {
+	for _, c := range []struct {
+		matched, ok, quiet bool
+		want               int
+	}{
+		{true, true, false, exitMatch},
+		{false, true, false, exitNoMatch},
+		{true, false, false, exitError},
+		{false, false, false, exitError},
+		{true, true, true, exitMatch},
+		{false, true, true, exitNoMatch},
+		{true, false, true, exitMatch},
+		{false, false, true, exitError},
+	} {
+		if got := exitStatus(c.matched, c.ok, c.quiet); got != c.want {
+			t.Errorf("exitStatus(matched %v, ok %v, quiet %v) = %d, want %d", c.matched, c.ok, c.quiet, got, c.want)
+		}
+	}
+}
+
+// TestMaxCount checks -m without context options against GNU grep 3.8.
+func TestMaxCount(t *testing.T) {
+	checkRunTests(t, runTestFiles, []runTest{
+		{[]string{"-m", "1", "alpha", "./text.txt"}, "alpha|", exitMatch},
+		{[]string{"-m", "2", "alpha", "./text.txt"}, "alpha|alpha beta|", exitMatch},
+		{[]string{"-m", "5", "alpha", "./text.txt"}, "alpha|alpha beta|", exitMatch},
+		{[]string{"-m", "0", "alpha", "./text.txt"}, "", exitNoMatch},
+		// The limit applies to each file.
+		{[]string{"-m", "1", "alpha", "./text.txt", "./two.txt"}, "./text.txt:alpha|./two.txt:alpha|", exitMatch},
+		{[]string{"-m", "1", "-r", "beta", "./"}, "./text.txt:beta|./two.txt:beta|", exitMatch},
+		{[]string{"-m", "1", "-c", "alpha", "./text.txt", "./bin.dat"}, "./text.txt:1|./bin.dat:1|", exitMatch},
+		{[]string{"-m", "1", "-l", "alpha", "./text.txt"}, "./text.txt|", exitMatch},
+		{[]string{"-m", "1", "alpha", "./bin.dat"}, "Binary file ./bin.dat matches|", exitMatch},
+	})
+}
+
+// TestMaxCountStopsReading checks that -m stops reading a file once the
+// limit is reached, whether the file is read or memory-mapped.
+func TestMaxCountStopsReading(t *testing.T) {
+	dir := t.TempDir()
+	for _, size := range []int{mmapMinSize / 2, 2 * mmapMinSize} {
+		file := filepath.Join(dir, "big.log")
+		data := append([]byte("needle\n"), bytes.Repeat([]byte("hay\n"), size/4)...)
+		if err := os.WriteFile(file, data, 0o644); err != nil {
+			t.Fatal(err)
+		}
+		var stdout, stderr bytes.Buffer
+		status := run([]string{"-m", "1", "-stats", "needle", file}, &stdout, &stderr, nil)
+		var searched int
+		for _, line := range strings.Split(stderr.String(), "\n") {
+			if n, err := fmt.Sscanf(line, "%d bytes searched", &searched); err == nil && n == 1 {
+				break
+			}
+		}
+		if status != exitMatch || stdout.String() != "needle\n" || searched == 0 || searched >= len(data)/2 {
+			t.Errorf("%d bytes: exit status %d, output %q, %d bytes searched", len(data), status, stdout.String(), searched)
+		}
+	}
+}
+
+// setStdin makes f standard input for the rest of the test.
+func setStdin(t *testing.T, f *os.File) {
+	stdin := os.Stdin
+	os.Stdin = f
+	t.Cleanup(func() { os.Stdin = stdin })
+}
+
+// stdinLongLines has lines longer than the read buffer starts out, matches
+// at both ends of a long line and a last line with no newline.
+var stdinLongLines = "alpha\n" + strings.Repeat("x", 3*readBufferSize) + "alpha\n" +
+	"beta\n" + "alpha" + strings.Repeat("y", readBufferSize+1) + "\n" +
+	strings.Repeat("z", 2*readBufferSize) + "\n" + "beta alpha"
+
+// TestStdin checks that standard input is searched when no file is named
+// and when it is named as "-", from a pipe and from a redirected file,
+// with lines that do not fit in the first read buffer.
+func TestStdin(t *testing.T) {
+	file := filepath.Join(t.TempDir(), "two.txt")
+	if err := os.WriteFile(file, []byte(runTestFiles["two.txt"]), 0o644); err != nil {
+		t.Fatal(err)
+	}
+	longAlpha := "alpha\n" + strings.Repeat("x", 3*readBufferSize) + "alpha\n" +
+		"alpha" + strings.Repeat("y", readBufferSize+1) + "\n" + "beta alpha\n"
+
+	for _, c := range []struct {
+		input string
+		args  []string
+		want  string
+	}{
+		{runTestFiles["text.txt"], []string{"alpha"}, "alpha\nalpha beta\n"},
+		{runTestFiles["text.txt"], []string{"alpha", "-"}, "alpha\nalpha beta\n"},
+		{runTestFiles["text.txt"], []string{"-c", "beta", "-", file}, "(standard input):2\n" + file + ":1\n"},
+		{runTestFiles["text.txt"], []string{"-l", "alpha", file, "-"}, file + "\n(standard input)\n"},
+		{runTestFiles["text.txt"], []string{"gamma"}, ""},
+		{"", []string{"-c", "alpha"}, "0\n"},
+		{stdinLongLines, []string{"alpha"}, longAlpha},
+		{stdinLongLines, []string{"-c", "-E", "^(alpha|beta)"}, "4\n"},
+		{stdinLongLines, []string{"-B", "1", "beta"}, strings.Join(strings.SplitAfter(stdinLongLines, "\n")[1:3], "") + "--\n" +
+			strings.Repeat("z", 2*readBufferSize) + "\nbeta alpha\n"},
+		{stdinLongLines, []string{"-m", "2", "-E", "y{10}$|^beta"}, "beta\nalpha" + strings.Repeat("y", readBufferSize+1) + "\n"},
+	} {
+		want := exitMatch
+		if c.want == "" || c.want == "0\n" {
+			want = exitNoMatch
+		}
+		for _, source := range []string{"pipe", "file"} {
+			var stdin *os.File
+			if source == "pipe" {
+				r, w, err := os.Pipe()
+				if err != nil {
+					t.Fatal(err)
+				}
+				go func(input string) {
+					io.WriteString(w, input)
+					w.Close()
+				}(c.input)
+				stdin = r
+			} else {
+				path := filepath.Join(t.TempDir(), "stdin")
+				if err := os.WriteFile(path, []byte(c.input), 0o644); err != nil {
+					t.Fatal(err)
+				}
+				f, err := os.Open(path)
+				if err != nil {
+					t.Fatal(err)
+				}
+				stdin = f
+			}
+			setStdin(t, stdin)
+			var stdout bytes.Buffer
+			status := run(c.args, &stdout, io.Discard, nil)
+			stdin.Close()
+			if got := stdout.String(); status != want || got != c.want {
+				t.Errorf("%q from a %s: exit status %d, %d bytes of output %.40q; want %d, %d bytes %.40q",
+					c.args, source, status, len(got), got, want, len(c.want), c.want)
+			}
+		}
+	}
+}
@@ -0,0 +1,332 @@
+package main
+
+import (
+	"bufio"
+	"encoding/binary"
+	"encoding/json"
+	"errors"
+	"flag"
+	"fmt"
+	"io"
+	"io/fs"
+	"net"
+	"os"
+	"os/signal"
+	"path/filepath"
+	"strings"
+	"sync"
+	"syscall"
+)
+
+// socketEnv names the environment variable that turns the command into a
+// thin client of the `grep serve` daemon listening on that socket. If the
+// daemon cannot be reached the search runs locally as usual.
+const socketEnv = "MYGREP_SOCKET"
+
+// serveRequest is what a client sends: its command-line arguments and the
+// directory relative paths in them are relative to.
+type serveRequest struct {
+	Args []string `json:"args"`
+	Dir  string   `json:"dir"`
+}
+
+// The daemon answers with frames of a kind byte, a 4-byte big-endian
+// length and a payload. The last frame carries the exit status as a 4-byte
+// big-endian integer, or is an empty frameLocal frame asking the client to
+// run the search itself.
+const (
+	frameStdout byte = 'o'
+	frameStderr byte = 'e'
+	frameExit   byte = 'x'
+	frameLocal  byte = 'l'
+)
+
+// exitLocal is returned by run under `grep serve`, before searching
+// anything, for a search that reads standard input.
+const exitLocal = -1
+
+// defaultSocket is the socket `grep serve` listens on when none is given:
+// in $XDG_RUNTIME_DIR, which only its user may enter, or else in a
+// directory of the user's own beneath the temporary directory.
+func defaultSocket() string {
+	dir := os.Getenv("XDG_RUNTIME_DIR")
+	if dir == "" {
+		dir = filepath.Join(os.TempDir(), fmt.Sprintf("mygrep-%d", os.Getuid()))
+	}
+	return filepath.Join(dir, "mygrep.sock")
+}
+
+// runServe runs `grep serve [socket]`, which answers searches from thin
+// clients until it is interrupted. Directory listings and file contents
+// stay cached in memory between searches, so a repeated search over the
+// same tree costs a stat per file and directory rather than a walk and a
+// read, and no process startup.
+func runServe(args []string, stderr io.Writer) int {
+	flags := flag.NewFlagSet("serve", flag.ContinueOnError)
+	flags.SetOutput(stderr)
+	cacheSize := flags.Int64("cache-size", 1<<30, "keep at most `bytes` of file contents and directory listings in memory")
+	maxFileSize := flags.Int64("max-file-size", 64<<20, "do not cache files larger than `bytes`")
+	flags.Usage = func() {
+		fmt.Fprintln(stderr, "Usage: grep serve [options] [socket]")
+		flags.PrintDefaults()
+	}
+	if err := flags.Parse(args); err != nil {
+		if errors.Is(err, flag.ErrHelp) {
+			return exitMatch
+		}
+		return exitError
+	}
+	socket := defaultSocket()
+	if flags.NArg() > 0 {
+		socket = flags.Arg(0)
+	}
+
+	ln, err := listenUnix(socket)
+	if err != nil {
+		fmt.Fprintln(stderr, "Error listening:", err)
+		return exitError
+	}
+	sigs := make(chan os.Signal, 1)
+	signal.Notify(sigs, os.Interrupt, syscall.SIGTERM)
+	go func() {
+		<-sigs
+		ln.Close()
+	}()
+	fmt.Fprintf(stderr, "Listening on %s; set %s=%s to search through it\n", socket, socketEnv, socket)
+
+	srv := &server{cache: newFileCache(*cacheSize, *maxFileSize)}
+	return srv.accept(ln, stderr)
+}
+
+// listenUnix listens on the Unix socket at path, replacing a stale socket
+// left behind by a daemon that is no longer running.
+//
+// Only the current user may connect. Socket file permissions are applied
+// after the socket is created, and some systems ignore them, so the socket
+// must be in a directory that only its owner, the current user, may enter.
+// The directory is created if it does not exist.
+func listenUnix(path string) (net.Listener, error) {
+	dir := filepath.Dir(path)
+	if err := os.Mkdir(dir, 0o700); err != nil && !errors.Is(err, fs.ErrExist) {
+		return nil, err
+	}
+	if err := checkPrivateDir(dir); err != nil {
+		return nil, err
+	}
+	if conn, err := net.Dial("unix", path); err == nil {
+		conn.Close()
+		return nil, fmt.Errorf("%s: a server is already listening", path)
+	}
+	if fi, err := os.Lstat(path); err == nil && fi.Mode()&os.ModeSocket != 0 {
+		os.Remove(path)
+	}
+	ln, err := net.Listen("unix", path)
+	if err != nil {
+		return nil, err
+	}
+	if err := os.Chmod(path, 0o600); err != nil {
+		ln.Close()
+		return nil, err
+	}
+	return ln, nil
+}
+
+// checkPrivateDir returns an error unless dir is a directory, not a
+// symbolic link, owned by the current user and closed to everyone else.
+func checkPrivateDir(dir string) error {
+	fi, err := os.Lstat(dir)
+	if err != nil {
+		return err
+	}
+	if !fi.IsDir() {
+		return fmt.Errorf("%s: not a directory", dir)
+	}
+	uid, ok := fileOwner(fi)
+	if !ok {
+		// Permissions do not follow the Unix model here.
+		return nil
+	}
+	if uid != os.Getuid() {
+		return fmt.Errorf("%s: owned by uid %d, not the current user", dir, uid)
+	}
+	if fi.Mode().Perm()&0o077 != 0 {
+		return fmt.Errorf("%s: accessible to other users (mode %#o); the socket must be in a private directory", dir, fi.Mode().Perm())
+	}
+	return nil
+}
+
+// checkPeer returns an error if the process at the other end of conn runs
+// as another user. Where the platform cannot tell, the private directory
+// the socket is in keeps other users out.
+func checkPeer(conn net.Conn) error {
+	uc, ok := conn.(*net.UnixConn)
+	if !ok {
+		return fmt.Errorf("not a Unix socket connection")
+	}
+	uid, err := peerUID(uc)
+	switch {
+	case errors.Is(err, errors.ErrUnsupported):
+		return nil
+	case err != nil:
+		return fmt.Errorf("reading peer credentials: %w", err)
+	case uid != os.Getuid():
+		return fmt.Errorf("peer runs as uid %d, not the current user", uid)
+	}
+	return nil
+}
+
+// server runs the searches requested by clients, one at a time: each runs
+// in the client's working directory, and every search already uses all
+// CPUs.
+type server struct {
+	mu    sync.Mutex
+	cache *fileCache
+}
+
+// accept serves the connections made to ln until it is closed, refusing
+// any from another user.
+func (srv *server) accept(ln net.Listener, stderr io.Writer) int {
+	for {
+		conn, err := ln.Accept()
+		if err != nil {
+			if errors.Is(err, net.ErrClosed) {
+				return exitMatch
+			}
+			fmt.Fprintln(stderr, "Error accepting connection:", err)
+			return exitError
+		}
+		if err := checkPeer(conn); err != nil {
+			fmt.Fprintln(stderr, "Refusing connection:", err)
+			conn.Close()
+			continue
+		}
+		go srv.serve(conn)
+	}
+}
+
+func (srv *server) serve(conn net.Conn) {
+	defer conn.Close()
+	var req serveRequest
+	if err := json.NewDecoder(conn).Decode(&req); err != nil {
+		return
+	}
+	fw := &frameWriter{w: conn}
+	status := srv.run(req, frameStream{fw, frameStdout}, frameStream{fw, frameStderr})
+	if status == exitLocal {
+		fw.writeFrame(frameLocal, nil)
+		return
+	}
+	fw.writeFrame(frameExit, binary.BigEndian.AppendUint32(nil, uint32(status)))
+}
+
+func (srv *server) run(req serveRequest, stdout, stderr io.Writer) int {
+	srv.mu.Lock()
+	defer srv.mu.Unlock()
+	if err := os.Chdir(req.Dir); err != nil {
+		fmt.Fprintln(stderr, "Error changing directory:", err)
+		return exitError
+	}
+	srv.cache.dir = req.Dir
+	return run(req.Args, stdout, stderr, srv.cache)
+}
+
+// frameWriter writes frames to a client connection. It is shared by the
+// streams of one search, which may write from several goroutines.
+type frameWriter struct {
+	mu  sync.Mutex
+	w   io.Writer
+	hdr [5]byte
+}
+
+func (fw *frameWriter) writeFrame(kind byte, p []byte) error {
+	fw.mu.Lock()
+	defer fw.mu.Unlock()
+	fw.hdr[0] = kind
+	binary.BigEndian.PutUint32(fw.hdr[1:], uint32(len(p)))
+	bufs := net.Buffers{fw.hdr[:], p}
+	_, err := bufs.WriteTo(fw.w)
+	return err
+}
+
+// frameStream is the stdout or stderr of a search run for a client.
+type frameStream struct {
+	fw   *frameWriter
+	kind byte
+}
+
+func (s frameStream) Write(p []byte) (int, error) {
+	if err := s.fw.writeFrame(s.kind, p); err != nil {
+		return 0, err
+	}
+	return len(p), nil
+}
+
+// runRemote runs the command with args on the daemon listening on socket,
+// copying its output to stdout and stderr, and returns its exit status.
+// It reports false, having done nothing, if the search should run locally
+// instead: the daemon is not running, or the search reads this process's
+// own standard input, which the daemon cannot read. It also runs locally,
+// with a warning, rather than send the search to a socket or daemon that
+// belongs to another user.
+func runRemote(socket string, args []string, stdout, stderr io.Writer) (int, bool) {
+	for _, arg := range args {
+		if arg == "-" || arg == "/dev/stdin" || strings.HasPrefix(arg, "/dev/fd/") || strings.HasPrefix(arg, "/proc/self/") {
+			return 0, false
+		}
+	}
+	dir, err := os.Getwd()
+	if err != nil {
+		return 0, false
+	}
+	fi, err := os.Lstat(socket)
+	if err != nil || fi.Mode()&os.ModeSocket == 0 {
+		return 0, false
+	}
+	if uid, ok := fileOwner(fi); ok && uid != os.Getuid() {
+		fmt.Fprintf(stderr, "Not using %s: owned by uid %d, not the current user\n", socket, uid)
+		return 0, false
+	}
+	conn, err := net.Dial("unix", socket)
+	if err != nil {
+		return 0, false
+	}
+	defer conn.Close()
+	if err := checkPeer(conn); err != nil {
+		fmt.Fprintf(stderr, "Not using %s: %v\n", socket, err)
+		return 0, false
+	}
+	if err := json.NewEncoder(conn).Encode(serveRequest{Args: args, Dir: dir}); err != nil {
+		return 0, false
+	}
+
+	r := bufio.NewReaderSize(conn, outputBufferSize)
+	var hdr [5]byte
+	for {
+		if _, err := io.ReadFull(r, hdr[:]); err != nil {
+			fmt.Fprintln(stderr, "Error reading from server:", err)
+			return exitError, true
+		}
+		n := int64(binary.BigEndian.Uint32(hdr[1:]))
+		switch hdr[0] {
+		case frameStdout:
+			if _, err := io.CopyN(stdout, r, n); err != nil {
+				fmt.Fprintln(stderr, "Error writing output:", err)
+				return exitError, true
+			}
+		case frameStderr:
+			io.CopyN(stderr, r, n)
+		case frameExit:
+			var status [4]byte
+			if _, err := io.ReadFull(r, status[:]); err != nil {
+				fmt.Fprintln(stderr, "Error reading from server:", err)
+				return exitError, true
+			}
+			return int(binary.BigEndian.Uint32(status[:])), true
+		case frameLocal:
+			return 0, false
+		default:
+			fmt.Fprintln(stderr, "Error reading from server: unexpected frame")
+			return exitError, true
+		}
+	}
+}
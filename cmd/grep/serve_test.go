@@ -0,0 +1,128 @@
+package main
+
+import (
+	"bytes"
+	"io"
+	"os"
+	"path/filepath"
+	"testing"
+	"time"
+)
+
+// TestServeCache checks that searches through the serve cache see files
+// changed since the last search, whether their size, their mtime or the
+// directory listing changed.
+func TestServeCache(t *testing.T) {
+	dir := t.TempDir()
+	a, b := filepath.Join(dir, "a.txt"), filepath.Join(dir, "b.txt")
+	// Entries modified within racyWindow are never cached, so the files
+	// and the directory are dated well in the past.
+	old := time.Now().Add(-time.Hour)
+	write := func(path, content string, mtime time.Time) {
+		t.Helper()
+		if err := os.WriteFile(path, []byte(content), 0o644); err != nil {
+			t.Fatal(err)
+		}
+		for _, p := range []string{path, dir} {
+			if err := os.Chtimes(p, mtime, mtime); err != nil {
+				t.Fatal(err)
+			}
+		}
+	}
+
+	steps := []struct {
+		name  string
+		apply func()
+		want  string
+	}{
+		{"first search", func() { write(a, "needle one\n", old) },
+			a + ":needle one\n"},
+		{"same size, new mtime", func() { write(a, "needle two\n", old.Add(time.Second)) },
+			a + ":needle two\n"},
+		{"new size, same mtime", func() { write(a, "needle three\n", old.Add(time.Second)) },
+			a + ":needle three\n"},
+		{"new file", func() { write(b, "needle four\n", old.Add(2*time.Second)) },
+			a + ":needle three\n" + b + ":needle four\n"},
+	}
+	cache := newFileCache(1<<20, 1<<20)
+	for _, step := range steps {
+		step.apply()
+		// The second search is answered from the cache filled by the first.
+		for i := 0; i < 2; i++ {
+			var stdout, stderr bytes.Buffer
+			status := run([]string{"-r", "-sort", "-no-index", "needle", dir}, &stdout, &stderr, cache)
+			if status != exitMatch || stderr.Len() > 0 {
+				t.Fatalf("%s: exit status %d, stderr %q", step.name, status, stderr.String())
+			}
+			if got := stdout.String(); got != step.want {
+				t.Errorf("%s (search %d): got %q, want %q", step.name, i+1, got, step.want)
+			}
+		}
+		if len(cache.entries) == 0 {
+			t.Fatalf("%s: nothing was cached", step.name)
+		}
+	}
+}
+
+// TestServeRemote checks that a search run through `grep serve` writes the
+// same output and error messages and exits with the same status as one run
+// locally.
+func TestServeRemote(t *testing.T) {
+	dir := t.TempDir()
+	file := filepath.Join(dir, "a.txt")
+	if err := os.WriteFile(file, bytes.Repeat([]byte("a needle\nhay\n"), 10000), 0o644); err != nil {
+		t.Fatal(err)
+	}
+	socket := filepath.Join(dir, "run", "mygrep.sock")
+	ln, err := listenUnix(socket)
+	if err != nil {
+		t.Fatal(err)
+	}
+	srv := &server{cache: newFileCache(1<<20, 1<<20)}
+	done := make(chan int)
+	go func() { done <- srv.accept(ln, io.Discard) }()
+	defer func() {
+		ln.Close()
+		<-done
+	}()
+
+	for _, args := range [][]string{
+		{"needle", file},
+		{"-c", "needle", file},
+		{"-C", "1", "-m", "3", "needle", file},
+		{"nothing", file},
+		{"needle", file, filepath.Join(dir, "missing.txt")},
+	} {
+		var wantOut, wantErr, gotOut, gotErr bytes.Buffer
+		want := run(args, &wantOut, &wantErr, nil)
+		got, ok := runRemote(socket, args, &gotOut, &gotErr)
+		if !ok {
+			t.Fatalf("%q: not run through the server", args)
+		}
+		if got != want || !bytes.Equal(gotOut.Bytes(), wantOut.Bytes()) || gotErr.String() != wantErr.String() {
+			t.Errorf("%q: got status %d, %d bytes of output, stderr %q; want status %d, %d bytes, stderr %q",
+				args, got, gotOut.Len(), gotErr.String(), want, wantOut.Len(), wantErr.String())
+		}
+	}
+
+	// Standard input is this process's, so the search runs locally.
+	if _, ok := runRemote(socket, []string{"needle", "-"}, io.Discard, io.Discard); ok {
+		t.Error("a search of standard input was run through the server")
+	}
+	if _, ok := runRemote(socket, []string{"needle"}, io.Discard, io.Discard); ok {
+		t.Error("a search with no file was run through the server")
+	}
+}
+
+// TestListenUnixPrivateDir checks that the server refuses to listen in a
+// directory other users may enter.
+func TestListenUnixPrivateDir(t *testing.T) {
+	dir := t.TempDir()
+	if err := os.Chmod(dir, 0o755); err != nil {
+		t.Fatal(err)
+	}
+	if ln, err := listenUnix(filepath.Join(dir, "mygrep.sock")); err == nil {
+		ln.Close()
+		t.Fatal("listening in a directory open to other users")
+	}
+}
@@ -0,0 +1,180 @@
+package main
+
+import (
+	"io"
+	"os"
+	"path/filepath"
+	"sync"
+)
+
+// fileJob is a file to be searched. seq numbers jobs in the order the
+// walker produced them; explicit marks paths named on the command line;
+// err carries a failure to read a directory so it is reported in the same
+// place as errors from searching files.
+type fileJob struct {
+	seq      int
+	path     string
+	explicit bool
+	err      error
+}
+
+// walkOptions control which files the walker lists and in what order.
+type walkOptions struct {
+	// ordered reads directories one at a time in lexical order and
+	// numbers jobs in that order, which makes output deterministic.
+	ordered bool
+
+	// parallelism is the number of directory reads in flight at once in
+	// unordered mode.
+	parallelism int
+
+	// indexLiterals, if not nil, are literals one of which every matching
+	// line contains. Beneath a root with a trigram index, files the index
+	// shows contain none of them are not listed.
+	indexLiterals [][]byte
+
+	// noIgnore searches the directories and files that would otherwise be
+	// skipped: those in skippedDirs and those excluded by ignore files.
+	noIgnore bool
+
+	// filter, if not nil, selects the files found in directories by name.
+	// Files named on the command line are searched regardless.
+	filter *nameFilter
+
+	// cache, if not nil, supplies directory listings kept by `grep serve`.
+	cache *fileCache
+
+	// stderr receives warnings, such as about an unreadable index.
+	stderr io.Writer
+}
+
+// walker lists the files beneath a set of roots and sends them on jobs.
+//
+// In ordered mode directories are read one at a time in lexical order and
+// jobs are numbered in that order, which makes output deterministic. In
+// unordered mode every directory is read in its own goroutine, with at
+// most `parallelism` directory reads in flight at once.
+type walker struct {
+	jobs     chan<- fileJob
+	stop     <-chan struct{}
+	cache    *fileCache
+	readFile func(string) ([]byte, error)
+	stderr   io.Writer
+	noIgnore bool
+	filter   *nameFilter
+	ordered  bool
+	seq      int
+	sem      chan struct{}
+	wg       sync.WaitGroup
+}
+
+// walk sends every file beneath roots on jobs and closes jobs when done.
+// Roots that are not directories, and "-" for standard input, are sent as
+// they are. The walk is abandoned once stop is closed.
+func walk(roots []string, opts walkOptions, jobs chan<- fileJob, stop <-chan struct{}) {
+	w := &walker{
+		jobs:     jobs,
+		stop:     stop,
+		cache:    opts.cache,
+		readFile: readIgnoreFile(opts.cache),
+		stderr:   opts.stderr,
+		noIgnore: opts.noIgnore,
+		filter:   opts.filter,
+		ordered:  opts.ordered,
+		sem:      make(chan struct{}, opts.parallelism),
+	}
+	for _, root := range roots {
+		if root == stdinName {
+			w.send(fileJob{path: root, explicit: true})
+			continue
+		}
+		fi, err := os.Stat(root)
+		if err != nil || !fi.IsDir() {
+			w.send(fileJob{path: root, explicit: true})
+			continue
+		}
+		index := openIndexFilter(root, opts.indexLiterals, opts.stderr)
+		if w.ordered {
+			w.walkDir(root, index, nil)
+		} else {
+			w.wg.Add(1)
+			go w.walkDir(root, index, nil)
+		}
+	}
+	w.wg.Wait()
+	close(jobs)
+}
+
+// send queues job, reporting false if the walk has been stopped.
+func (w *walker) send(job fileJob) bool {
+	if w.ordered {
+		job.seq = w.seq
+		w.seq++
+	}
+	select {
+	case w.jobs <- job:
+		return true
+	case <-w.stop:
+		return false
+	}
+}
+
+// walkDir sends the regular files in dir and descends into its
+// subdirectories. Symbolic links and special files such as FIFOs are
+// skipped, as are trigram index files, files whose names the filter
+// rejects, and the files index, if not nil, rules out.
+//
+// Unless ignoring is turned off, the rules of the ignore files in dir are
+// added to those of its parents in ignore, and every entry is checked
+// against them by name before anything else is done with it, so ignored
+// directories are never opened.
+func (w *walker) walkDir(dir string, index *indexFilter, ignore *ignoreLevel) {
+	if !w.ordered {
+		defer w.wg.Done()
+		w.sem <- struct{}{}
+	}
+	entries, err := w.cache.readDir(dir)
+	if !w.ordered {
+		<-w.sem
+	}
+	if err != nil && !w.send(fileJob{path: dir, err: err}) {
+		return
+	}
+
+	if !w.noIgnore {
+		ignore = readIgnoreLevel(ignore, dir, entries, w.readFile, w.stderr)
+	}
+	for _, e := range entries {
+		path := filepath.Join(dir, e.Name())
+		if !w.noIgnore && w.ignored(path, e, ignore) {
+			continue
+		}
+		switch {
+		case e.IsDir():
+			if w.ordered {
+				w.walkDir(path, index, ignore)
+			} else {
+				w.wg.Add(1)
+				go w.walkDir(path, index, ignore)
+			}
+		case e.Type().IsRegular():
+			// The name filter comes first: the index check stats the file.
+			if e.Name() == indexFileName || !w.filter.match(e.Name()) || index != nil && index.skip(path, e) {
+				continue
+			}
+			if !w.send(fileJob{path: path}) {
+				return
+			}
+		}
+	}
+}
+
+// ignored reports whether the entry e at path is excluded by the default
+// skip list or by the ignore rules in effect.
+func (w *walker) ignored(path string, e os.DirEntry, ignore *ignoreLevel) bool {
+	isDir := e.IsDir()
+	if isDir && skippedDirs[e.Name()] {
+		return true
+	}
+	return ignore.ignored(path, e.Name(), isDir)
+}